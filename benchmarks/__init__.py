@@ -0,0 +1 @@
+"""Benchmarks & profiling scripts. Run them from the repo root, as modules (ie. python -m benchmarks.bench_suite), so the ocrfixr package is found without installing it."""
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Speed & agreement of fill-mask backends (see ocrfixr/backends.py) on a fixed corpus.
+# Every backend spellchecks the same lines. The first backend is the reference, and each of the others is scored on how often its accepted fixes match the reference's.
+# Backends are given as backend:model, ie.
+#   python -m benchmarks.bench_backends book.txt transformers:bert-base-uncased onnx:/models/bert-onnx transformers:/models/distilbert-base-uncased
+# Options: --lines N (default 1000), --batch-size N (default 32), --fp32 (run onnx models at full precision), --report out.json
+
+import sys
+import json
+import time
+import argparse
+from ocrfixr import resources
+from ocrfixr.backends import create
+from ocrfixr.cache import PredictionCache
+from ocrfixr.spellcheck import fix_batch
+
+
+def load_lines(path, n_lines):
+    with open(path, 'r', encoding = 'utf-8') as f:
+        lines = f.read().split("\n")
+    return([line for line in lines if line.strip() != ""][:n_lines])
+
+
+# Accepted fixes for each line, plus the time BERT & the rest of spellcheck took
+def run(spec, lines, batch_size, quantized):
+    backend, model = spec.split(":", 1)
+    start = time.perf_counter()
+    unmasker = create(backend, model, quantized = quantized)
+    load_time = time.perf_counter() - start
+
+    resources.override("unmasker", unmasker)
+    # no cached predictions - every backend has to do all of its own work
+    resources.override("bert_cache", PredictionCache(spec, resources.BERT_TOP_K, maxsize = 0))
+    start = time.perf_counter()
+    results = fix_batch(lines, batch_size = batch_size, return_fixes = "T")
+    run_time = time.perf_counter() - start
+    fixes = [r[1] if isinstance(r, list) else {} for r in results]
+    return({"backend": spec, "load_seconds": round(load_time, 3), "seconds": round(run_time, 3),
+            "lines_per_second": round(len(lines) / run_time, 1), "fixes": sum(len(f) for f in fixes)}, fixes)
+
+
+# How often the candidate's accepted fixes match the reference's (misread --> same replacement), line by line
+def agreement(reference, candidate, lines):
+    same = 0
+    total = 0
+    differences = []
+    for line, ref, cand in zip(lines, reference, candidate):
+        keys = set(ref) | set(cand)
+        total += len(keys)
+        for k in sorted(keys):
+            if ref.get(k) == cand.get(k):
+                same += 1
+            else:
+                differences.append({"line": line, "misread": k, "reference": ref.get(k), "candidate": cand.get(k)})
+    return({"agreement": round(same / total, 4) if total else 1.0, "fixes_compared": total, "differences": differences})
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compare fill-mask backends on a fixed corpus.')
+    parser.add_argument('corpus')
+    parser.add_argument('backends', nargs = '+', help = 'backend:model - the first is the reference')
+    parser.add_argument('--lines', type = int, default = 1000)
+    parser.add_argument('--batch-size', type = int, default = 32, dest = 'batch_size')
+    parser.add_argument('--fp32', action = 'store_const', const = False, default = True, dest = 'quantized')
+    parser.add_argument('--report', default = None)
+    args = parser.parse_args()
+
+    lines = load_lines(args.corpus, args.lines)
+    # warm up the dictionaries & symspell suggestions, so the first backend isn't charged for them
+    resources.override("unmasker", lambda texts, batch_size = 1: [[]] * len(texts) if len(texts) > 1 else [])
+    fix_batch(lines, batch_size = args.batch_size)
+
+    report = {"lines": len(lines), "batch_size": args.batch_size, "backends": []}
+    reference = None
+    print("%-50s %8s %8s %10s %7s %10s" % ("backend", "load s", "run s", "lines/s", "fixes", "agreement"))
+    for spec in args.backends:
+        stats, fixes = run(spec, lines, args.batch_size, args.quantized)
+        if reference is None:
+            reference = fixes
+            stats["agreement"] = 1.0
+        else:
+            stats.update(agreement(reference, fixes, lines))
+        report["backends"].append(stats)
+        print("%-50s %8.2f %8.2f %10.1f %7d %10.2f%%" % (spec[-50:], stats["load_seconds"], stats["seconds"], stats["lines_per_second"], stats["fixes"], 100 * stats["agreement"]))
+
+    for stats in report["backends"][1:]:
+        if stats["differences"]:
+            print("\n---- {} differs from {} on {} fixes, for example:".format(stats["backend"], args.backends[0], len(stats["differences"])))
+            for d in stats["differences"][:10]:
+                print("  {misread!r}: {reference!r} vs {candidate!r}   ({line})".format(**d))
+
+    if args.report:
+        with open(args.report, 'w', encoding = 'utf-8') as f:
+            json.dump(report, f, indent = 2)
+        print("\n---- Report has been written to " + args.report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Speed vs. accuracy of spellcheck's context_window & multi_mask options, on a fixed corpus.
+# The corpus is rebuilt into whole paragraphs (lines joined up to a blank line, capped at --paragraph-words), so BERT gets the long inputs these options are meant for.
+# Every setting spellchecks the same paragraphs. The first (full paragraph, one mask per input) is the reference, and the others are scored on how often their accepted fixes match it.
+#   python -m benchmarks.bench_context_window book.txt --windows full,64,32,16,8 --multi-mask 20
+# The model comes from OCRFIXR_BACKEND / OCRFIXR_MODEL, as usual (see ocrfixr/backends.py)
+# Options: --paragraphs N (default 300), --paragraph-words N (default 250), --batch-size N (default 32), --report out.json
+
+import sys
+import json
+import time
+import argparse
+from ocrfixr import resources
+from ocrfixr.cache import PredictionCache
+from ocrfixr.spellcheck import fix_batch
+from benchmarks.bench_backends import agreement
+
+
+def load_paragraphs(path, n_paragraphs, max_words):
+    with open(path, 'r', encoding = 'utf-8') as f:
+        blocks = f.read().split("\n\n")
+    paragraphs = []
+    for block in blocks:
+        words = block.split()
+        for start in range(0, len(words), max_words):
+            paragraphs.append(" ".join(words[start:start + max_words]))
+    return([p for p in paragraphs if p != ""][:n_paragraphs])
+
+
+# Counts what is sent to BERT, on the way through to the real unmasker
+class Recorder:
+    def __init__(self, unmasker):
+        self.unmasker = unmasker
+        self.inputs = 0
+        self.masks = 0
+        self.words = 0
+
+    def __call__(self, texts, batch_size = 1, **kwargs):
+        self.inputs += len(texts)
+        self.masks += sum(t.count("[MASK]") for t in texts)
+        self.words += sum(len(t.split()) for t in texts)
+        return(self.unmasker(texts, batch_size = batch_size, **kwargs))
+
+
+def run(paragraphs, window, multi_mask, batch_size, unmasker):
+    recorder = Recorder(unmasker)
+    resources.override("unmasker", recorder)
+    # no cached predictions - every setting has to do all of its own work
+    resources.override("bert_cache", PredictionCache("bench", resources.BERT_TOP_K, maxsize = 0))
+    start = time.perf_counter()
+    results = fix_batch(paragraphs, batch_size = batch_size, return_fixes = "T", context_window = window, multi_mask = multi_mask)
+    run_time = time.perf_counter() - start
+    fixes = [r[1] if isinstance(r, list) else {} for r in results]
+    return({"context_window": window, "multi_mask": multi_mask, "seconds": round(run_time, 3),
+            "bert_inputs": recorder.inputs, "masks": recorder.masks,
+            "mean_input_words": round(recorder.words / recorder.inputs, 1) if recorder.inputs else 0,
+            "fixes": sum(len(f) for f in fixes)}, fixes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Compare context window sizes (and multi-mask inputs) on a fixed corpus.')
+    parser.add_argument('corpus')
+    parser.add_argument('--windows', default = 'full,64,32,16,8', help = 'comma-separated words either side of the mask ("full" = whole paragraph)')
+    parser.add_argument('--multi-mask', type = int, default = None, dest = 'multi_mask', help = 'also run every window with masks this many words apart sharing an input')
+    parser.add_argument('--paragraphs', type = int, default = 300)
+    parser.add_argument('--paragraph-words', type = int, default = 250, dest = 'paragraph_words')
+    parser.add_argument('--batch-size', type = int, default = 32, dest = 'batch_size')
+    parser.add_argument('--report', default = None)
+    args = parser.parse_args()
+
+    paragraphs = load_paragraphs(args.corpus, args.paragraphs, args.paragraph_words)
+    windows = [None if w.strip() == "full" else int(w) for w in args.windows.split(",")]
+    settings = [(w, None) for w in windows]
+    if args.multi_mask is not None:
+        settings += [(w, args.multi_mask) for w in windows]
+    if settings[0] != (None, None):
+        settings.insert(0, (None, None))
+
+    unmasker = resources.get("unmasker")
+    # warm up the dictionaries & symspell suggestions, so the first setting isn't charged for them
+    resources.override("unmasker", lambda texts, batch_size = 1: [[]] * len(texts) if len(texts) > 1 else [])
+    fix_batch(paragraphs, batch_size = args.batch_size)
+
+    report = {"paragraphs": len(paragraphs), "batch_size": args.batch_size, "settings": []}
+    reference = None
+    print("%8s %6s %8s %8s %7s %11s %7s %10s" % ("window", "multi", "run s", "inputs", "masks", "input words", "fixes", "agreement"))
+    for window, multi_mask in settings:
+        stats, fixes = run(paragraphs, window, multi_mask, args.batch_size, unmasker)
+        if reference is None:
+            reference = fixes
+            stats["agreement"] = 1.0
+        else:
+            stats.update(agreement(reference, fixes, paragraphs))
+        report["settings"].append(stats)
+        print("%8s %6s %8.2f %8d %7d %11.1f %7d %10.2f%%" % (window or "full", multi_mask or "-", stats["seconds"], stats["bert_inputs"], stats["masks"],
+                                                          stats["mean_input_words"], stats["fixes"], 100 * stats["agreement"]))
+
+    if args.report:
+        with open(args.report, 'w', encoding = 'utf-8') as f:
+            json.dump(report, f, indent = 2)
+        print("\n---- Report has been written to " + args.report)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# How find-replace scales with the number of fixes: one re.sub per fix (the old _MULTI_REPLACE) vs. the single-pass trie engine in ocrfixr/replace.py
+# Usage: python -m benchmarks.bench_replace [words_in_text]
+
+import re
+import sys
+import time
+import random
+from ocrfixr.replace import multi_replace
+
+
+def sequential_replace(text, fixes):
+    for i, j in fixes.items():
+        text = re.sub("\\b" + re.escape(i) + "\\b", j, text)
+    return(text)
+
+
+def best_of(func, *args, repeat = 3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return(min(times))
+
+
+def main():
+    n_words = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    r = random.Random(0)
+    vocab = ["".join(r.choice("abcdefghijklmnopqrstuvwxyz") for i in range(r.randint(3, 9))) for n in range(20000)]
+    text = " ".join(r.choice(vocab) for n in range(n_words))
+
+    print("text: {:,} words / {:,} chars".format(n_words, len(text)))
+    print("{:>8} {:>14} {:>14} {:>9}".format("fixes", "re.sub loop", "single pass", "speedup"))
+    for n_fixes in [1, 10, 100, 1000, 5000]:
+        fixes = {k: k.upper() for k in r.sample(vocab, n_fixes)}
+        assert multi_replace(text, fixes, word_boundary = True) == sequential_replace(text, fixes)
+        old = best_of(sequential_replace, text, fixes, repeat = 1 if n_fixes >= 1000 else 3)
+        new = best_of(multi_replace, text, fixes, True)
+        print("{:>8} {:>13.4f}s {:>13.4f}s {:>8.1f}x".format(n_fixes, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
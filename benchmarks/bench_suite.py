@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Reproducible benchmark suite: throughput, latency, peak memory & accuracy of spellcheck.fix, unsplit.fix and the CLI, on synthetic OCR-noise corpora of several sizes (see corpus.py).
+#   python -m benchmarks.bench_suite --sizes 5000,50000 --out results.json
+#   python -m benchmarks.bench_suite --sizes 5000,50000 --compare results.json      # after a change: compare against the earlier results, exit 1 on a regression
+#
+# For each target & corpus size:
+#   words_per_sec       - corpus words / seconds spent checking (model & dictionary loading is timed separately, as load_seconds). Each target is run --repeat times, from cold caches each time, and the fastest run is kept
+#   latency_ms          - p50 / p90 / p99 / max time per call: per paragraph for spellcheck & unsplit, per block of lines for the CLI
+#   peak_rss_mb         - peak resident memory of the process running the target (each target runs in its own process), and of any workers it started
+#   precision / recall  - of the fixes made, against the errors injected into the corpus: a fix counts if it is the right fix for the right word, in the right paragraph (spellcheck) or line (CLI)
+#
+# --model stub (the default) runs offline, with stub_model.py standing in for BERT - see there for what its numbers mean. --model real uses the model set up as usual (OCRFIXR_BACKEND / OCRFIXR_MODEL).
+# Results are stored as JSON, with the commit they were run on, so runs can be compared between commits.
+
+import os
+import re
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("spellcheck", "unsplit", "cli")
+SUITE_VERSION = 1
+# runs shorter than this are too noisy to call a throughput change a regression
+MIN_SECONDS = 1.0
+
+
+def percentiles(ms):
+    ms = sorted(ms)
+    if len(ms) == 0:
+        return({})
+    pick = lambda q: round(ms[min(len(ms) - 1, int(len(ms) * q))], 3)
+    return({"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(ms[-1], 3)})
+
+
+def accuracy(found, expected):
+    hits = len(found & expected)
+    return({"fixes": len(found), "expected": len(expected), "correct": hits,
+            "precision": round(hits / len(found), 4) if found else None,
+            "recall": round(hits / len(expected), 4) if expected else None})
+
+
+def peak_rss_mb():
+    import resource
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return({"peak_rss_mb": round(own, 1), "workers_peak_rss_mb": round(children, 1)})
+
+
+
+### Targets (each run in a process of its own, see run_target)
+# ------------------------------------------------------
+
+def bench_spellcheck(corpus, options):
+    from ocrfixr import spellcheck
+    paragraphs = corpus.paragraphs()
+    # the paragraph each line is in
+    starts = {}
+    for start, text in paragraphs:
+        for n in range(len(text.split("\n"))):
+            starts[start + n] = start
+
+    found = set()
+    latency = []
+    for start, text in paragraphs:
+        began = time.perf_counter()
+        fixes = spellcheck(text, return_fixes = "T", batch_size = options["batch_size"]).fix()[1]
+        latency.append((time.perf_counter() - began) * 1000)
+        found.update((start, misread, fix) for (misread, fix) in fixes)
+    expected = set((starts[number], misread, fix) for number, misread, fix in corpus.fixes)
+    return(dict(calls = len(latency), seconds = sum(latency) / 1000, latency_ms = percentiles(latency), **accuracy(found, expected)))
+
+
+def bench_unsplit(corpus, options):
+    from ocrfixr import unsplit
+    found = set()
+    latency = []
+    for start, text in corpus.book_paragraphs():
+        began = time.perf_counter()
+        fixes = unsplit(text + "\n", return_fixes = "T").fix()[1]
+        latency.append((time.perf_counter() - began) * 1000)
+        # a fix here is a split word merged back into one (not kept hyphenated, or flagged with -*)
+        found.update((split, merged.strip()) for split, merged in fixes.items() if merged.strip() == split.replace("-\n", ""))
+    return(dict(calls = len(latency), seconds = sum(latency) / 1000, latency_ms = percentiles(latency), **accuracy(found, set(corpus.splits))))
+
+
+class _Blocks:
+    def __init__(self):
+        self.latency = []
+        self._last = time.perf_counter()
+
+    # called by check_book as each block of lines is written out
+    def update(self, n):
+        now = time.perf_counter()
+        self.latency.append((now - self._last) * 1000)
+        self._last = now
+
+
+def bench_cli(corpus, options):
+    from ocrfixr.run_ocrfixr import check_book
+    with tempfile.TemporaryDirectory() as tmp:
+        book = os.path.join(tmp, "book.txt")
+        out = os.path.join(tmp, "suggestions.txt")
+        with open(book, 'w', encoding = 'utf-8') as f:
+            f.write(corpus.book)
+        blocks = _Blocks()
+        began = time.perf_counter()
+        check_book(book, out, {"context_fl": "F", "ignored_words": [], "batch_size": options["batch_size"], "pack_tokens": None, "overlap": 0},
+                   workers = options["workers"], progress = blocks, merge_split = True)
+        seconds = time.perf_counter() - began
+        with open(out, encoding = 'utf-8') as f:
+            suggestions = f.read().splitlines()
+    found = set()
+    for s in suggestions:
+        match = re.match("^([0-9]+):\\S* Suggest '(.*)' for '(.*)'$", s)
+        if match is not None:
+            found.add((int(match.group(1)), match.group(3), match.group(2)))
+    return(dict(calls = len(blocks.latency), seconds = seconds, latency_ms = percentiles(blocks.latency), **accuracy(found, set(corpus.fixes))))
+
+
+# Empty the in-memory caches, so every repeat starts from the same place
+def _clear_caches():
+    from ocrfixr import resources
+    resources.get("symspell_cache").clear()
+    resources.get("metaphone_cache").clear()
+    resources.get("bert_cache").memory.clear()
+
+
+def run_target(target, corpus_path, options):
+    from benchmarks.corpus import Corpus
+    from ocrfixr import resources
+    with open(corpus_path, encoding = 'utf-8') as f:
+        corpus = Corpus.from_json(json.load(f))
+    began = time.perf_counter()
+    if options["model"] == "stub":
+        from benchmarks import stub_model
+        stub_model.install(corpus.clean)
+    resources.preload()
+    load_seconds = time.perf_counter() - began
+
+    bench = {"unsplit": bench_unsplit, "spellcheck": bench_spellcheck, "cli": bench_cli}[target]
+    result = None
+    for n in range(options["repeat"]):
+        _clear_caches()
+        run = bench(corpus, options)
+        if result is None or run["seconds"] < result["seconds"]:
+            result = run
+    result.update({"target": target, "words": corpus.words, "lines": len(corpus.lines), "load_seconds": round(load_seconds, 3)})
+    result["words_per_sec"] = round(corpus.words / result["seconds"], 1)
+    result["seconds"] = round(result["seconds"], 3)
+    result.update(peak_rss_mb())
+    return(result)
+
+
+
+### Running & comparing
+# ------------------------------------------------------
+
+def _commit():
+    try:
+        return(subprocess.run(["git", "rev-parse", "HEAD"], cwd = HERE, capture_output = True, text = True, check = True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return(None)
+
+
+def _model_name(model):
+    if model == "stub":
+        return("stub")
+    from ocrfixr.backends import model_id
+    return(model_id())
+
+
+def run_suite(sizes, targets, options, seed = 0):
+    from benchmarks.corpus import make_corpus
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            corpus = make_corpus(size, seed)
+            path = os.path.join(tmp, "corpus_{}.json".format(size))
+            with open(path, 'w', encoding = 'utf-8') as f:
+                json.dump(corpus.to_json(), f)
+            for target in targets:
+                print("---- {} on {:,} words....".format(target, corpus.words), file = sys.stderr)
+                command = [sys.executable, "-m", "benchmarks.bench_suite", "--run", target, path, "--model", options["model"],
+                           "--workers", str(options["workers"]), "--repeat", str(options["repeat"])] + (["--batch-size", str(options["batch_size"])] if options["batch_size"] else [])
+                done = subprocess.run(command, cwd = os.path.dirname(HERE), capture_output = True, text = True)
+                if done.returncode != 0:
+                    raise RuntimeError("{} failed:\n{}".format(target, done.stderr))
+                result = json.loads(done.stdout.strip().split("\n")[-1])
+                result["size"] = size
+                results.append(result)
+    return({"suite": SUITE_VERSION, "commit": _commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "model": _model_name(options["model"]), "seed": seed,
+            "settings": {"workers": options["workers"], "batch_size": options["batch_size"], "repeat": options["repeat"]}, "results": results})
+
+
+def print_results(report):
+    print("{:<12} {:>9} {:>12} {:>10} {:>10} {:>10} {:>10} {:>10}".format("target", "words", "words/s", "p50 ms", "p99 ms", "RSS MB", "precision", "recall"))
+    for r in report["results"]:
+        print("{:<12} {:>9,} {:>12,.0f} {:>10.2f} {:>10.2f} {:>10.1f} {:>10} {:>10}".format(
+            r["target"], r["words"], r["words_per_sec"], r["latency_ms"].get("p50", 0), r["latency_ms"].get("p99", 0), r["peak_rss_mb"],
+            "-" if r["precision"] is None else "{:.3f}".format(r["precision"]), "-" if r["recall"] is None else "{:.3f}".format(r["recall"])))
+
+
+# Compare against an earlier report, run by run. A regression is throughput down by more than tolerance (on runs of at least MIN_SECONDS), or precision / recall down at all
+def compare(old, new, tolerance = 0.1):
+    before = {(r["target"], r["size"]): r for r in old["results"]}
+    regressions = []
+    print("\ncompared with {} ({}):".format((old.get("commit") or "?")[:10], old.get("created")))
+    print("{:<12} {:>9} {:>14} {:>14} {:>12} {:>12}".format("target", "words", "words/s", "RSS MB", "precision", "recall"))
+    for r in new["results"]:
+        o = before.get((r["target"], r["size"]))
+        if o is None:
+            continue
+        change = r["words_per_sec"] / o["words_per_sec"] - 1
+        delta = lambda key: None if r[key] is None or o[key] is None else r[key] - o[key]
+        print("{:<12} {:>9,} {:>+13.1%} {:>+14.1f} {:>12} {:>12}".format(r["target"], r["words"], change, r["peak_rss_mb"] - o["peak_rss_mb"],
+              "-" if delta("precision") is None else "{:+.4f}".format(delta("precision")), "-" if delta("recall") is None else "{:+.4f}".format(delta("recall"))))
+        if change < -tolerance and min(r["seconds"], o["seconds"]) >= MIN_SECONDS:
+            regressions.append("{} ({:,} words): throughput {:+.1%}".format(r["target"], r["words"], change))
+        for key in ("precision", "recall"):
+            if delta(key) is not None and delta(key) < 0:
+                regressions.append("{} ({:,} words): {} {:+.4f}".format(r["target"], r["words"], key, delta(key)))
+    if old.get("model") != new.get("model") or old.get("settings") != new.get("settings"):
+        print("!!!! the two runs used different models or settings")
+    return(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark spellcheck, unsplit & the CLI on synthetic OCR-noise corpora.')
+    parser.add_argument('--sizes', default = '5000,50000', help = 'corpus sizes to run, in words (comma-separated)')
+    parser.add_argument('--targets', default = ','.join(TARGETS), help = 'which of spellcheck, unsplit & cli to run')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--model', default = 'stub', choices = ['stub', 'real'], help = 'stub (offline, see stub_model.py) or the real model')
+    parser.add_argument('--batch-size', type = int, default = None, dest = 'batch_size')
+    parser.add_argument('--workers', type = int, default = 1, help = 'worker processes for the CLI target')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'run each target this many times, and keep the fastest')
+    parser.add_argument('--out', default = None, help = 'write the results to this JSON file')
+    parser.add_argument('--compare', default = None, help = 'compare against the results in this JSON file, and exit 1 on a regression')
+    parser.add_argument('--tolerance', type = float, default = 0.1, help = 'how far throughput can drop before --compare calls it a regression (default 0.1 = 10%%)')
+    parser.add_argument('--run', nargs = 2, default = None, metavar = ('TARGET', 'CORPUS'), help = argparse.SUPPRESS)
+    args = parser.parse_args()
+    options = {"model": args.model, "batch_size": args.batch_size, "workers": args.workers, "repeat": args.repeat}
+
+    if args.run is not None:
+        print(json.dumps(run_target(args.run[0], args.run[1], options)))
+        return(0)
+
+    report = run_suite([int(x) for x in args.sizes.split(",")], [t for t in args.targets.split(",") if t in TARGETS], options, args.seed)
+    print_results(report)
+    if args.out is not None:
+        with open(args.out, 'w', encoding = 'utf-8') as f:
+            json.dump(report, f, indent = 2)
+        print("---- Results have been written to " + args.out)
+    if args.compare is not None:
+        with open(args.compare, encoding = 'utf-8') as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for r in regressions:
+            print("!!!! regression: " + r)
+        return(1 if regressions else 0)
+    return(0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
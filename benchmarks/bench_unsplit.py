@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Throughput of unsplit on whole books with lots of split words: the original word-by-word engine (split the text into words, regex-match every word, decide each split word on its own, then find-replace) vs. the single-scan engine in ocrfixr/unsplit.py
+# Books are synthetic (see corpus.py), with as many lines ending in a split word as the corpus allows, and a page marker every 40 lines as in a PG book.
+# Usage: python -m benchmarks.bench_unsplit [words ...]
+
+import re
+import sys
+import time
+from ocrfixr import unsplit, resources
+from ocrfixr.replace import multi_replace
+from benchmarks.corpus import make_corpus
+
+
+PAGE_LINES = 40
+
+
+def word_by_word_unsplit(text):
+    word_set = resources.get("word_set")
+    common_words = resources.get("common_words")
+    tokens = [l.strip() for l in re.split(" |(?<!-)\n", text)]
+    fixes = {}
+    for i in [x for x in tokens if re.match(".+[^-](-\n).+", x)]:
+        W0 = i.replace("-\n", "")
+        W1 = re.findall(".*(?=-\n)", i)[0]
+        W2 = re.findall("(?<=-\n).*", i)[0]
+        if "--File" in W2 or W2.isdigit():
+            fixes[i] = i.replace("-\n", "-*\n") + " "
+        elif W0 in word_set and (W0 in common_words or not all([W1 in word_set, W2 in word_set])):
+            fixes[i] = W0 + "\n"
+        elif W0 in word_set:
+            fixes[i] = i.replace("-\n", "-*") + "\n"
+        elif all([W1 in word_set, W2 in word_set]) or any(filter(str.isdigit, W1)) or (W1.istitle() == False and W2.istitle() == True):
+            fixes[i] = i.replace("-\n", "-") + "\n"
+        else:
+            fixes[i] = W0 + "\n"
+    return(multi_replace(text, fixes, trailing_space = True))
+
+
+def new_unsplit(text):
+    return(unsplit(text).fix())
+
+
+def make_book(n_words):
+    corpus = make_corpus(n_words, seed = 0, rates = {"split": 1.0})
+    lines = corpus.book.split("\n")
+    book = []
+    for n in range(0, len(lines), PAGE_LINES):
+        book.append("-----File: {:04d}.png".format(n // PAGE_LINES + 1) + "-" * 50)
+        book.extend(lines[n:n + PAGE_LINES])
+    return("\n".join(book), len(corpus.splits))
+
+
+def best_of(func, text, repeat = 3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        times.append(time.perf_counter() - start)
+    return(min(times))
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [100000, 1000000]
+    resources.get("word_set")
+    resources.get("common_words")
+    print("{:>10} {:>10} {:>9} {:>14} {:>14} {:>9}".format("words", "MB", "splits", "word-by-word", "single scan", "speedup"))
+    for n_words in sizes:
+        book, n_splits = make_book(n_words)
+        assert new_unsplit(book) == word_by_word_unsplit(book)
+        old = best_of(word_by_word_unsplit, book)
+        new = best_of(new_unsplit, book)
+        print("{:>10,} {:>10.1f} {:>9,} {:>13.3f}s {:>13.3f}s {:>8.1f}x".format(n_words, len(book.encode("utf-8")) / 1e6, n_splits, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Memory & lookup latency of the SCOWL word lists: a Python set of str (how they used to be loaded) vs. the PackedWordSet mapped from the prebuilt index (ocrfixr/index.py)
+# Usage: python -m benchmarks.bench_word_set [lookups]
+# Builds the index in the cache dir first if there isn't an up-to-date one (see README - OCRFIXR_CACHE_DIR)
+
+import sys
+import time
+import random
+import tracemalloc
+from ocrfixr import index
+
+
+# Python heap allocated by func, and whatever it returns (kept alive so it isn't freed before it is measured)
+def allocated(func):
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return(size, result)
+
+
+def per_lookup(words, sample, repeat = 5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for w in sample:
+            w in words
+        times.append(time.perf_counter() - start)
+    return(min(times) / len(sample) * 1e9)
+
+
+def main():
+    n_lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    if index.open_index() is None:
+        print("---- Building the index....")
+        index.load_symspell()
+    mapped = index.open_index()
+
+    print("{:<14} {:>14} {:>14} {:>14} {:>14}".format("list", "set (KB)", "packed (KB)", "mapped (KB)", "words"))
+    lists = {}
+    for name, path in (("word_set", index.word_list_path()), ("common_words", index.common_list_path())):
+        set_size, words = allocated(lambda: set(path.read_text(encoding = "utf-8").split()))
+        packed_size, packed = allocated(lambda: getattr(mapped, name)())
+        # the mapped pages are shared between every process using the index, and only read in as they are touched
+        on_disk = sum(mapped.header["sections"][name + part][1] for part in ("_blob", "_offsets", "_table"))
+        assert packed == words
+        lists[name] = (words, packed)
+        print("{:<14} {:>14,.0f} {:>14,.1f} {:>14,.0f} {:>14,}".format(name, set_size / 1024, packed_size / 1024, on_disk / 1024, len(words)))
+
+    # OCR text is mostly real words, with some garbage mixed in
+    r = random.Random(0)
+    words, packed = lists["word_set"]
+    vocab = sorted(words)
+    hits = [r.choice(vocab) for n in range(n_lookups)]
+    misses = [w[:-1] + r.choice("1lvnrq^") for w in hits]
+
+    print("\n{:<14} {:>14} {:>14}".format("ns / lookup", "set", "packed"))
+    for name, sample in (("hits", hits), ("misses", misses)):
+        print("{:<14} {:>14.0f} {:>14.0f}".format(name, per_lookup(words, sample), per_lookup(packed, sample)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Synthetic OCR-noise corpus for the benchmark suite (bench_suite.py): clean, book-like text with known OCR errors injected into it, so fixes can be scored against the truth.
+#   corpus = make_corpus(20000, seed = 0)
+#   corpus.book        --> the noisy book, wrapped into lines, with words split across lines ("dis-\nplayed")
+#   corpus.lines       --> the noisy lines without the split words (what the book looks like once unsplit has merged them back)
+#   corpus.fixes       --> every injected error: (line number, misread, what it should be)
+#   corpus.splits      --> every split word: (the split as it appears in the book, the word it should merge back into)
+# The same size & seed always give the same corpus (for the same Python version), so runs can be compared between commits.
+#
+# Clean text: sentences of common words (SCOWL 20 & 70), drawn by their frequency in the symspell dictionary - not real prose, but it has the word mix of real prose.
+# Noise, injected into lowercase words only (OCRfixr leaves capitalized words alone):
+#   scanno     - a common scanno from Scannos_Common.txt (the --> tbe)
+#   stealth    - a stealth scanno from Scannos_Stealth.txt, a real word standing in for another (and --> arid)
+#   confusion  - a look-alike character swap (flew --> flevv, modern --> rnodern), that doesn't make a real word
+#   mashup     - two words run together (an hour --> anhour)
+#   split      - the last word of a line split across the line break with a hyphen (displayed --> dis-\nplayed)
+
+import re
+import sys
+import json
+import random
+import argparse
+from ocrfixr import resources, index
+
+
+RATES = {"scanno": 0.01, "stealth": 0.005, "confusion": 0.02, "mashup": 0.005, "split": 0.2}
+
+# clean piece --> how the OCR misreads it
+CONFUSIONS = [("w", "vv"), ("m", "rn"), ("rn", "m"), ("h", "li"), ("e", "c"), ("d", "cl"), ("u", "n"), ("n", "u"), ("i", "l"), ("l", "1"), ("o", "0"), ("f", "t")]
+
+LINE_WIDTH = 70
+VOCAB_SIZE = 6000
+
+
+class Corpus:
+    def __init__(self, lines, book, fixes, splits, clean, seed):
+        self.lines = lines
+        self.book = book
+        self.fixes = fixes
+        self.splits = splits
+        self.clean = clean
+        self.seed = seed
+
+    @property
+    def words(self):
+        return(sum(len(line.split()) for line in self.clean))
+
+    # Paragraphs of the noisy lines (without split words): (first line number, text), for running spellcheck a paragraph at a time
+    def paragraphs(self):
+        return(_paragraphs(self.lines))
+
+    # Paragraphs of the book itself (with split words), for running unsplit a paragraph at a time
+    def book_paragraphs(self):
+        return(_paragraphs(self.book.split("\n")))
+
+    def to_json(self):
+        return({"seed": self.seed, "lines": self.lines, "book": self.book, "fixes": self.fixes, "splits": self.splits, "clean": self.clean})
+
+    @classmethod
+    def from_json(cls, data):
+        return(cls(data["lines"], data["book"], [tuple(x) for x in data["fixes"]], [tuple(x) for x in data["splits"]], data["clean"], data["seed"]))
+
+
+# Blank lines separate paragraphs. Line numbers start at 1, as in the CLI output
+def _paragraphs(lines):
+    paragraphs = []
+    start = None
+    for number, line in enumerate(lines + [""], 1):
+        if line == "" and start is not None:
+            paragraphs.append((start, "\n".join(lines[start - 1:number - 1])))
+            start = None
+        elif line != "" and start is None:
+            start = number
+    return(paragraphs)
+
+
+def _vocabulary():
+    word_set = resources.get("word_set")
+    common_words = resources.get("common_words")
+    # keep scannos out of the clean text, so the only scannos are the ones injected
+    scannos = set(resources.get("common_scannos")) | set(resources.get("stealth_scannos"))
+    counts = []
+    with open(str(index.dictionary_path()), encoding = "utf-8") as f:
+        for line in f:
+            word, count = line.split()
+            if word.isalpha() and word in word_set and word in common_words and word not in scannos:
+                counts.append((word, int(count)))
+    counts = sorted(counts, key = lambda x: -x[1])[:VOCAB_SIZE]
+    return([w for w, c in counts], [c for w, c in counts])
+
+
+def _inverse(mapping):
+    inverse = {}
+    for scanno, word in sorted(mapping.items()):
+        if scanno.islower() and word.islower():
+            inverse.setdefault(word, []).append(scanno)
+    return(inverse)
+
+
+def _confuse(word, rng, word_set):
+    options = [(m.start(), clean, noisy) for clean, noisy in CONFUSIONS for m in re.finditer(re.escape(clean), word)]
+    rng.shuffle(options)
+    for start, clean, noisy in options:
+        misread = word[:start] + noisy + word[start + len(clean):]
+        if misread not in word_set:
+            return(misread)
+    return(None)
+
+
+# Pieces of text, each with what it should read as: (clean, noisy, kind of noise or None)
+def _units(n_words, rng, rates):
+    vocab, weights = _vocabulary()
+    cum_weights = []
+    total = 0
+    for w in weights:
+        total += w
+        cum_weights.append(total)
+    word_set = resources.get("word_set")
+    scannos = _inverse(resources.get("common_scannos"))
+    stealth = _inverse(resources.get("stealth_scannos"))
+
+    paragraphs = []
+    words = 0
+    while words < n_words:
+        units = []
+        for s in range(rng.randint(2, 7)):
+            sentence = rng.choices(vocab, cum_weights = cum_weights, k = rng.randint(6, 18))
+            words += len(sentence)
+            n = 0
+            while n < len(sentence):
+                word = sentence[n]
+                end = "" if n < len(sentence) - 1 else rng.choices([".", "?", "!"], [85, 8, 7])[0]
+                if end == "" and rng.random() < 0.08:
+                    end = ","
+                noisy = None
+                kind = None
+                roll = rng.random()
+                if n == 0:
+                    word = word.capitalize()
+                elif roll < rates["scanno"] and word in scannos:
+                    noisy, kind = rng.choice(scannos[word]), "scanno"
+                elif roll < rates["scanno"] + rates["stealth"] and word in stealth:
+                    noisy, kind = rng.choice(stealth[word]), "stealth"
+                elif roll < rates["scanno"] + rates["stealth"] + rates["mashup"] and end == "" and n < len(sentence) - 2:
+                    # run this word & the next together
+                    following = sentence[n + 1]
+                    units.append(("{} {}".format(word, following), word + following, "mashup"))
+                    n += 2
+                    continue
+                elif roll < rates["scanno"] + rates["stealth"] + rates["mashup"] + rates["confusion"] and len(word) >= 4:
+                    noisy = _confuse(word, rng, word_set)
+                    kind = "confusion" if noisy is not None else None
+                units.append((word + end, (noisy or word) + end, kind))
+                n += 1
+        paragraphs.append(units)
+    return(paragraphs)
+
+
+def make_corpus(n_words, seed = 0, rates = None):
+    rates = dict(RATES, **(rates or {}))
+    rng = random.Random(seed)
+    clean = []
+    lines = []
+    fixes = []
+    for units in _units(n_words, rng, rates):
+        if lines:
+            clean.append("")
+            lines.append("")
+        line_clean = []
+        line_noisy = []
+        for unit in units:
+            if line_noisy and len(" ".join(line_noisy)) + 1 + len(unit[1]) > LINE_WIDTH:
+                clean.append(" ".join(line_clean))
+                lines.append(" ".join(line_noisy))
+                line_clean = []
+                line_noisy = []
+            if unit[2] is not None:
+                fixes.append((len(lines) + 1, unit[1].rstrip(".,?!"), unit[0].rstrip(".,?!")))
+            line_clean.append(unit[0])
+            line_noisy.append(unit[1])
+        clean.append(" ".join(line_clean))
+        lines.append(" ".join(line_noisy))
+
+    # split the last word of some lines across the line break - only clean, plain words (not on lines with noise), so merging them back gives exactly the noisy lines again
+    book = list(lines)
+    splits = []
+    noisy_lines = {number for number, misread, fix in fixes}
+    for n in range(len(book) - 1):
+        words = book[n].split(" ")
+        last = words[-1]
+        if book[n + 1] == "" or n + 1 in noisy_lines or not (last.isalpha() and last.islower() and len(last) >= 6) or rng.random() >= rates["split"]:
+            continue
+        cut = rng.randint(2, len(last) - 3)
+        book[n] = " ".join(words[:-1] + [last[:cut] + "-"])
+        book[n + 1] = last[cut:] + " " + book[n + 1]
+        splits.append((last[:cut] + "-\n" + last[cut:], last))
+        # don't split the next line's last word too - it may be the piece that was just moved there
+        noisy_lines.add(n + 2)
+    return(Corpus(lines, "\n".join(book) + "\n", fixes, splits, clean, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Write a synthetic OCR-noise corpus (see benchmarks/corpus.py).')
+    parser.add_argument('words', type = int)
+    parser.add_argument('output', help = 'JSON file for the corpus & its truth')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--book', default = None, help = 'also write the noisy book itself to this text file')
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.words, args.seed)
+    with open(args.output, 'w', encoding = 'utf-8') as f:
+        json.dump(corpus.to_json(), f)
+    if args.book is not None:
+        with open(args.book, 'w', encoding = 'utf-8') as f:
+            f.write(corpus.book)
+    print("{:,} words, {:,} lines, {:,} errors, {:,} split words".format(corpus.words, len(corpus.lines), len(corpus.fixes), len(corpus.splits)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Profile of the document-level misread index (spellcheck.MisreadIndex) on a full book, run through the CLI's check_lines the way `ocrfixr` runs it.
+#   per line - every line gets its own index, so nothing is shared between lines (how OCRfixr worked before the index)
+#   per book - one index for the whole book, so each unique token & misread is only sorted out once
+# BERT is the same work either way, so a first pass fills the prediction cache, and both timed passes are served from it - the times compare just the work the index saves.
+#   python -m benchmarks.profile_misread_index book.txt --top 15 --profile out.prof
+# The model comes from OCRFIXR_BACKEND / OCRFIXR_MODEL, as usual (see ocrfixr/backends.py)
+
+import sys
+import time
+import pstats
+import cProfile
+import argparse
+from ocrfixr import resources
+from ocrfixr.backends import model_id
+from ocrfixr.cache import PredictionCache
+from ocrfixr.spellcheck import MisreadIndex
+from ocrfixr.run_ocrfixr import check_lines, read_blocks, split_lines, CHUNK_SIZE
+
+
+def per_line(q):
+    suggestions = []
+    for line in q:
+        suggestions.extend(check_lines([line]))
+    return(suggestions)
+
+
+def per_book(q, index):
+    suggestions = []
+    for start in range(0, len(q), CHUNK_SIZE):
+        suggestions.extend(check_lines(q[start:start + CHUNK_SIZE], index = index))
+    return(suggestions)
+
+
+def timed(func, *args, profile = None):
+    profiler = cProfile.Profile() if profile is not None else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    result = func(*args)
+    if profiler is not None:
+        profiler.disable()
+    return(result, time.perf_counter() - start, profiler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Profile the document-level misread index on a full book.')
+    parser.add_argument('book')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'time each run this many times, and keep the fastest')
+    parser.add_argument('--top', type = int, default = 0, help = 'print the N functions with the most time of their own, for each run')
+    parser.add_argument('--profile', default = None, help = 'write the per-book cProfile stats to this file')
+    args = parser.parse_args()
+
+    lines = list(split_lines(read_blocks(args.book)))
+    q = ['%d:  %s' % (number + 1, line) for (number, line) in enumerate(lines)]
+    resources.preload()
+    resources.override("bert_cache", PredictionCache(model_id(), resources.BERT_TOP_K, maxsize = 10 ** 7))
+    print("---- Filling the BERT cache ({} lines)....".format(len(q)))
+    per_book(q, MisreadIndex())
+
+    profile = args.top > 0 or args.profile is not None
+    line_result, line_time, line_profile = timed(per_line, q, profile = profile if args.top > 0 else None)
+    index = MisreadIndex()
+    book_result, book_time, book_profile = timed(per_book, q, index, profile = profile)
+    for n in range(args.repeat - 1):
+        line_time = min(line_time, timed(per_line, q)[1])
+        index = MisreadIndex()
+        book_time = min(book_time, timed(per_book, q, index)[1])
+    if book_result != line_result:
+        print("!!!! per-book suggestions differ from per-line suggestions")
+
+    stats = index.stats()
+    print("\n%-10s %10s %12s" % ("index", "seconds", "lines/s"))
+    print("%-10s %10.2f %12.1f" % ("per line", line_time, len(q) / line_time))
+    print("%-10s %10.2f %12.1f" % ("per book", book_time, len(q) / book_time))
+    print("\nspeedup: %.2fx   suggestions: %d (same for both: %s)" % (line_time / book_time, len(book_result), book_result == line_result))
+    print("tokens: {tokens} ({unique_tokens} unique)   misreads: {misreads} ({unique_misreads} unique)   misreads sorted out: {plans}".format(**stats))
+
+    for name, profiler in (("per line", line_profile), ("per book", book_profile)):
+        if profiler is not None and args.top > 0:
+            print("\n---- {}: top {} functions by own time".format(name, args.top))
+            pstats.Stats(profiler).sort_stats("tottime").print_stats(args.top)
+    if args.profile is not None:
+        book_profile.dump_stats(args.profile)
+        print("---- Profile has been written to " + args.profile)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
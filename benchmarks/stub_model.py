@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Stand-in for BERT, so the benchmark suite (bench_suite.py) runs offline, in seconds, with no model download.
+# It answers like the fill-mask pipeline (see ocrfixr/backends.py), from the clean text of a synthetic corpus (corpus.py):
+#   the word that really stands at the [MASK] (found from the two words either side of it) comes first, then the corpus' most common words as filler.
+# So with the stub, precision & recall measure everything around the model (misread filters, symspell, the homophone check...) as if BERT always knew the right word - an upper bound, not a prediction of real accuracy.
+# Throughput with the stub is the cost of OCRfixr itself, without the model's.
+#   install(corpus.clean)
+
+import re
+from collections import Counter
+from ocrfixr import resources
+from ocrfixr.cache import PredictionCache
+
+
+def _normalize(word):
+    return(word.strip(".,?!;:\"'").lower())
+
+
+class OracleUnmasker:
+    def __init__(self, clean_lines, top_k = resources.BERT_TOP_K):
+        self.top_k = top_k
+        words = [_normalize(w) for line in clean_lines for w in line.split()]
+        counts = Counter(words)
+        self.filler = [w for w, c in counts.most_common(top_k)]
+        # the words on either side --> the word between them, most to least specific
+        self._contexts = [{}, {}, {}]
+        for n, word in enumerate(words):
+            left = tuple(words[max(0, n - 2):n])
+            right = tuple(words[n + 1:n + 3])
+            for table, key in zip(self._contexts, [(left, right), (left[-1:], right[:1]), (left[-1:],)]):
+                table.setdefault(key, Counter())[word] += 1
+
+    def _guess(self, words, n):
+        left = tuple(_normalize(w) for w in words[max(0, n - 2):n])
+        right = tuple(_normalize(w) for w in words[n + 1:n + 3])
+        for table, key in zip(self._contexts, [(left, right), (left[-1:], right[:1]), (left[-1:],)]):
+            if key in table:
+                return(table[key].most_common(1)[0][0])
+        return(None)
+
+    def _predict(self, text):
+        words = text.split()
+        predictions = []
+        for n in [n for n, w in enumerate(words) if "[MASK]" in w]:
+            guess = self._guess(words, n)
+            ranked = ([guess] if guess else []) + [w for w in self.filler if w != guess]
+            predictions.append([{"token_str": w, "score": 1 / (rank + 2)} for rank, w in enumerate(ranked[:self.top_k])])
+        return(predictions[0] if len(predictions) == 1 else predictions)
+
+    def __call__(self, inputs, batch_size = 1, **kwargs):
+        if isinstance(inputs, str):
+            return(self._predict(inputs))
+        results = [self._predict(t) for t in inputs]
+        return(results[0] if len(results) == 1 else results)
+
+    # spellcheck's score_candidates mode: each word's rank & score in the same ranking
+    def score(self, texts, candidates, batch_size = 1):
+        results = []
+        for text, words in zip(texts, candidates):
+            found = self._predict(text)
+            masks = found if len(found) > 0 and isinstance(found[0], list) else [found]
+            scored = []
+            for mask in masks:
+                ranks = {x["token_str"]: (rank, x["score"]) for rank, x in enumerate(mask)}
+                scored.append({w: ranks.get(w, (None, 0.0)) for w in words})
+            results.append(scored[0] if len(scored) == 1 else scored)
+        return(results)
+
+
+# Counts words & punctuation as tokens - roughly what WordPiece does for clean text, so long paragraphs are split at about the same places
+class WordTokenizer:
+    mask_token = "[MASK]"
+
+    def num_special_tokens_to_add(self):
+        return(2)
+
+    def __call__(self, texts, add_special_tokens = True):
+        extra = 2 if add_special_tokens else 0
+        return({"input_ids": [[0] * (len(re.findall("\\w+|[^\\w\\s]", t)) + extra) for t in texts]})
+
+
+# Swap the stub in for the model & its tokenizer, with a fresh in-memory prediction cache (so nothing the stub predicts ends up in a real on-disk cache)
+def install(clean_lines):
+    resources.override("unmasker", OracleUnmasker(clean_lines))
+    resources.override("tokenizer", WordTokenizer())
+    resources.override("bert_cache", PredictionCache("stub", resources.BERT_TOP_K))
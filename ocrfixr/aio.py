@@ -0,0 +1,105 @@
+"""asyncio API, for running OCRfixr inside an event loop without blocking it."""
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from . import batcher
+
+
+# spellcheck(...).fix() is synchronous, and a long page can take seconds - long enough to stall every other task on the event loop.
+# afix runs the same call on a bounded pool of threads, so the loop stays free:
+#   result = await afix(text, return_fixes = "T")
+# The result is exactly what spellcheck(text, ...).fix() returns for the same options.
+#
+# - at most max_concurrency texts are checked at once; other callers wait their turn (without holding a thread)
+# - BERT calls from every text being checked are merged into shared batches by a MicroBatcher (see batcher.py)
+# - cancelling a caller that is still waiting for its turn drops its work. A text that is already being checked can't be stopped part way, so it runs to the end in its thread and the result is thrown away - its slot is only handed on once it has finished, so the concurrency limit always holds.
+#
+# Call configure() before the first afix to change the limits, and shutdown() when done.
+
+_settings = {"max_concurrency": 4, "batch_window": 0.005, "max_batch": 32}
+_executor = None
+_executor_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def configure(max_concurrency = 4, batch_window = 0.005, max_batch = 32):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            raise RuntimeError("configure() must be called before the first afix, or after shutdown()")
+        _settings.update(max_concurrency = max_concurrency, batch_window = batch_window, max_batch = max_batch)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers = _settings["max_concurrency"], thread_name_prefix = "ocrfixr-aio")
+        return(_executor)
+
+
+# asyncio semaphores belong to one event loop, so keep one per loop
+def _get_semaphore(loop):
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(_settings["max_concurrency"])
+    return(semaphore)
+
+
+# These run in a worker thread. The batcher is installed there rather than on the loop, since the first call loads the model
+def _spellcheck_fix(text, options):
+    from .spellcheck import spellcheck
+    batcher.install(max_batch = _settings["max_batch"], max_wait = _settings["batch_window"])
+    return(spellcheck(text, **options).fix())
+
+
+def _unsplit_fix(text, options):
+    from .unsplit import unsplit
+    return(unsplit(text, **options).fix())
+
+
+async def _run(func, text, options):
+    loop = asyncio.get_running_loop()
+    semaphore = _get_semaphore(loop)
+    await semaphore.acquire()
+    try:
+        future = _get_executor().submit(func, text, options)
+    except BaseException:
+        semaphore.release()
+        raise
+
+    # release the slot when the thread is actually done (or the work was cancelled before it started), not when the caller stops waiting
+    def release(f):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # the loop has already closed
+            pass
+    future.add_done_callback(release)
+    return(await asyncio.wrap_future(future))
+
+
+# async version of spellcheck(text, **options).fix()
+async def afix(text, **options):
+    if options.get("interactive", "F") == "T":
+        raise ValueError("interactive mode needs a terminal, and can't be used with afix")
+    return(await _run(_spellcheck_fix, text, options))
+
+
+# async version of unsplit(text, **options).fix()
+async def aunsplit(text, **options):
+    return(await _run(_unsplit_fix, text, options))
+
+
+# Wait for running work to finish, then stop the threads & batcher. afix can be used again afterwards (with new settings, if configure() is called first)
+def shutdown():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait = True)
+    from . import resources
+    if resources.is_loaded("unmasker") and isinstance(resources.get("unmasker"), batcher.MicroBatcher):
+        batcher.uninstall(resources.get("unmasker"))
@@ -0,0 +1,258 @@
+"""Inference backends for the fill-mask step (BERT context suggestions)."""
+import os
+import inspect
+import argparse
+
+from . import resources
+
+
+# Everything that calls the unmasker (spellcheck._SUGGEST_BERT, the MicroBatcher) only relies on the fill-mask pipeline's call signature:
+#   unmasker([masked texts], batch_size = n)  -->  for each text, a list of {"token_str", "score", ...}, best first (unwrapped to just the one list for a single text)
+# A text with several [MASK]s (spellcheck's multi_mask option) gets back one such list per mask, in order.
+# so any backend that answers the same way can stand in for it.
+#
+# The backends here can also score a given set of words at the [MASK] (used by spellcheck's score_candidates mode):
+#   unmasker.score([masked texts], [[words] for each text], batch_size = n)  -->  for each text, {word: (rank, score)} - or a list of those, one per mask, for a text with several [MASK]s
+# rank is the word's position in the full-vocabulary ranking (0 = best, None if the word isn't a single token), and score is its softmax probability - the same "score" the pipeline reports.
+# A word is in the pipeline's top k exactly when its rank is < k.
+#
+# Backends (chosen with OCRFIXR_BACKEND, with the model set by OCRFIXR_MODEL):
+#   transformers - (default) the transformers fill-mask pipeline, exactly as before. OCRFIXR_MODEL can be a model name or a local directory, ie. a smaller distilled checkpoint (distilbert-base-uncased) saved with save_pretrained
+#   onnx         - ONNX Runtime on CPU, with the model directory made by `python -m ocrfixr.backends export`. Runs the int8-quantized copy of the model by default (set OCRFIXR_ONNX_QUANTIZED=0 for full precision). Needs: pip install onnxruntime
+#
+# The onnx backend only ever reads local files. On hosts with no network, point OCRFIXR_MODEL at a local directory for the transformers backend too, and set HF_HUB_OFFLINE=1.
+
+BACKENDS = ("transformers", "onnx")
+ONNX_MODEL = "model.onnx"
+ONNX_QUANTIZED = "model.int8.onnx"
+
+
+def _settings():
+    backend = os.environ.get("OCRFIXR_BACKEND") or "transformers"
+    if backend not in BACKENDS:
+        raise ValueError("OCRFIXR_BACKEND must be one of: " + ", ".join(BACKENDS))
+    model = os.environ.get("OCRFIXR_MODEL") or resources.BERT_MODEL
+    quantized = os.environ.get("OCRFIXR_ONNX_QUANTIZED", "1") != "0"
+    return(backend, model, quantized)
+
+
+# Name for the model behind the current settings, without loading it. Cached BERT predictions are keyed on this, so switching model or backend never hands back another model's predictions
+def model_id():
+    backend, model, quantized = _settings()
+    if backend == "transformers":
+        return(model)
+    return("onnx:{}:{}".format(os.path.abspath(model), ONNX_QUANTIZED if quantized else ONNX_MODEL))
+
+
+# Backend for the current settings (used by the unmasker resource)
+def load_backend(top_k = None):
+    backend, model, quantized = _settings()
+    return(create(backend, model, top_k = top_k or resources.BERT_TOP_K, quantized = quantized))
+
+
+# Just the tokenizer for the current settings, without loading the model (see chunker.py)
+def load_tokenizer():
+    from transformers import AutoTokenizer
+    backend, model, quantized = _settings()
+    return(AutoTokenizer.from_pretrained(model, local_files_only = backend == "onnx"))
+
+
+def create(backend, model, top_k = None, quantized = True):
+    top_k = top_k or resources.BERT_TOP_K
+    if backend == "transformers":
+        return(TransformersBackend(model, top_k))
+    if backend == "onnx":
+        return(OnnxBackend(model, top_k, quantized = quantized))
+    raise ValueError("unknown backend: " + backend)
+
+
+# spellcheck writes its masks as [MASK] - swap in the model's own mask token if it uses a different one (ie. <mask>)
+def _with_mask_token(texts, mask_token):
+    if mask_token == "[MASK]":
+        return(texts)
+    return([t.replace("[MASK]", mask_token) for t in texts])
+
+
+
+# For each word, the vocab ids that decode to it (the same decode the pipeline uses for "token_str")
+def _vocab_index(tokenizer):
+    ids = list(range(len(tokenizer)))
+    index = {}
+    for i, word in zip(ids, tokenizer.batch_decode([[i] for i in ids])):
+        index.setdefault(word, []).append(i)
+    return(index)
+
+
+# Rank & probability of each word, from one row of [MASK] logits (numpy). A word made of several vocab ids takes the best of them
+def _score_row(row, words, index):
+    import numpy as np
+    shifted = row - row.max()
+    probs = np.exp(shifted) / np.exp(shifted).sum()
+    scores = {}
+    for word in words:
+        best = None
+        for i in index.get(word, ()):
+            rank = int((row > row[i]).sum())
+            if best is None or rank < best[0]:
+                best = (rank, float(probs[i]))
+        scores[word] = best if best is not None else (None, 0.0)
+    return(scores)
+
+
+class _Scoring:
+    _index = None
+
+    def vocab_index(self):
+        if self._index is None:
+            self._index = _vocab_index(self.tokenizer)
+        return(self._index)
+
+    # See the note at the top of the file
+    def score(self, texts, candidates, batch_size = 1):
+        import numpy as np
+        texts = _with_mask_token(list(texts), self.mask_token)
+        index = self.vocab_index()
+        batch_size = max(1, batch_size or 1)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            chunk = texts[start:start + batch_size]
+            ids, logits = self._logits(chunk)
+            for n, words in enumerate(candidates[start:start + batch_size]):
+                scores = [_score_row(logits[n][position], words, index) for position in np.flatnonzero(ids[n] == self.tokenizer.mask_token_id)]
+                results.append(scores[0] if len(scores) == 1 else scores)
+        return(results)
+
+
+
+class TransformersBackend(_Scoring):
+    def __init__(self, model = resources.BERT_MODEL, top_k = resources.BERT_TOP_K):
+        from transformers import logging, pipeline
+        logging.set_verbosity_error()
+        self.name = model
+        self.pipeline = pipeline('fill-mask', model=model, top_k=top_k)
+        self.tokenizer = self.pipeline.tokenizer
+        self.mask_token = self.tokenizer.mask_token
+
+    def _logits(self, texts):
+        import torch
+        encoded = self.tokenizer(texts, padding=True, return_tensors="pt").to(self.pipeline.model.device)
+        with torch.no_grad():
+            logits = self.pipeline.model(**encoded).logits
+        return(encoded["input_ids"].cpu().numpy(), logits.float().cpu().numpy())
+
+    def __call__(self, texts, batch_size = 1, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        return(self.pipeline(_with_mask_token(texts, self.mask_token), batch_size = batch_size, **kwargs))
+
+
+
+class OnnxBackend(_Scoring):
+    def __init__(self, path, top_k = resources.BERT_TOP_K, quantized = True, threads = None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("the onnx backend needs onnxruntime (pip install onnxruntime)") from None
+        from transformers import AutoTokenizer
+
+        model_file = os.path.join(path, ONNX_QUANTIZED if quantized else ONNX_MODEL)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError("no {} in {} - make one with: python -m ocrfixr.backends export <model> {}".format(os.path.basename(model_file), path, path))
+
+        self.name = model_file
+        self.top_k = top_k
+        self.tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+        self.mask_token = self.tokenizer.mask_token
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _logits(self, texts):
+        import numpy as np
+        encoded = self.tokenizer(texts, padding=True, return_tensors="np")
+        logits = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self.input_names})[0]
+        return(encoded["input_ids"], logits)
+
+    def _predict(self, texts):
+        import numpy as np
+        input_ids, logits = self._logits(texts)
+
+        results = []
+        for ids, row in zip(input_ids, logits):
+            masks = []
+            for position in np.flatnonzero(ids == self.tokenizer.mask_token_id):
+                scores = row[position] - row[position].max()
+                probs = np.exp(scores) / np.exp(scores).sum()
+                top = np.argsort(-probs, kind="stable")[:self.top_k]
+                masks.append([{"score": float(probs[i]), "token": int(i), "token_str": self.tokenizer.decode([int(i)])} for i in top])
+            # like the pipeline: one list for a single [MASK], a list per mask otherwise
+            results.append(masks[0] if len(masks) == 1 else masks)
+        return(results)
+
+    # Same return shape as the fill-mask pipeline (except that "sequence" - the filled-in text - is left out)
+    def __call__(self, texts, batch_size = 1, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = _with_mask_token(texts, self.mask_token)
+        batch_size = max(1, batch_size or 1)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            results.extend(self._predict(texts[start:start + batch_size]))
+        if len(results) == 1:
+            return(results[0])
+        return(results)
+
+
+
+# Export a fill-mask model (name or local directory) to ONNX in output_dir, with its tokenizer, plus a dynamically int8-quantized copy
+def export_onnx(model, output_dir, quantize = True, opset = 17):
+    import torch
+    from transformers import AutoModelForMaskedLM, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    lm = AutoModelForMaskedLM.from_pretrained(model, attn_implementation="eager")
+    lm.eval()
+    lm.config.return_dict = False
+
+    # trace with a padded batch, so the attention mask is part of the graph
+    sample = tokenizer(["the birds [MASK] down south", "but were quickly [MASK] by border patrol agents"], padding=True, return_tensors="pt")
+    # ONNX inputs come in the order of the model's forward() arguments
+    names = [n for n in inspect.signature(lm.forward).parameters if n in sample]
+    axes = {n: {0: "batch", 1: "sequence"} for n in names + ["logits"]}
+    path = os.path.join(output_dir, ONNX_MODEL)
+    with torch.no_grad():
+        torch.onnx.export(lm, ({n: sample[n] for n in names},), path, input_names=names, output_names=["logits"],
+                          dynamic_axes=axes, opset_version=opset, dynamo=False)
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(path, os.path.join(output_dir, ONNX_QUANTIZED), weight_type=QuantType.QInt8)
+    return(output_dir)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m ocrfixr.backends',
+                                     description = 'Prepare models for the OCRfixr inference backends.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    export = commands.add_parser('export', help = 'export a fill-mask model to ONNX (plus an int8-quantized copy)')
+    export.add_argument('model',
+                        help = 'model name or local directory (ie. bert-base-uncased, or a distilled checkpoint)')
+    export.add_argument('output',
+                        help = 'directory to write the ONNX model & tokenizer to')
+    export.add_argument('--no-quantize', action = 'store_const', const = False, default = True, dest = 'quantize',
+                        help = 'option to skip writing the int8-quantized copy')
+    args = parser.parse_args()
+
+    print("---- Exporting {} to ONNX....".format(args.model))
+    export_onnx(args.model, args.output, quantize = args.quantize)
+    print("---- Model has been written to " + args.output)
+    print("---- To use it: OCRFIXR_BACKEND=onnx OCRFIXR_MODEL={} ocrfixr ...".format(args.output))
+
+
+if __name__ == '__main__':
+    main()
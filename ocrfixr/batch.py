@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Spellcheck a whole directory (or manifest) of books in one run."""
+import os
+import glob
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from tqdm import tqdm
+
+from . import profiling
+from .suggestions import read_binary, BINARY_MAGIC
+from .run_ocrfixr import check_book, frequent_misspells, _init_worker, _worker_options, _worker_profile, _merge_worker_profile
+
+
+# Running ocrfixr once per book pays the model & dictionary load for every book. Here they are loaded once per process, and whole books are handed out to a pool of worker processes.
+# Each book gets its own suggestion file (same format as the ocrfixr command), plus one summary.json for the whole run.
+#
+# Suggestion files are written under a temporary name and only renamed once the book is finished, so an output file that exists is always complete.
+# Re-running the same command skips any book that already has its output (unless --no-resume is given) - an interrupted run just picks up where it left off.
+# Output files are named for their format (SUFFIXES), and an output in some other format (ie. written with another --suffix) is never taken as done.
+
+SUMMARY_NAME = "summary.json"
+PART_SUFFIX = ".part"
+SUFFIXES = {"guiguts": "_suggestions.txt", "jsonl": "_suggestions.jsonl", "binary": "_suggestions.bin"}
+
+
+# Input books: every matching file in a directory, or the files listed in a manifest (one path per line, relative to the manifest; blank lines & # comments are skipped)
+def list_inputs(source, pattern = "*.txt"):
+    if os.path.isdir(source):
+        return(sorted(glob.glob(os.path.join(source, pattern))))
+
+    base = os.path.dirname(os.path.abspath(source))
+    inputs = []
+    with open(source, 'r', encoding = 'utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            inputs.append(os.path.join(base, line))
+    return(inputs)
+
+
+# Output file for each input: <outdir>/<book name><suffix>. Two inputs with the same name would overwrite each other, so that is an error.
+def output_paths(inputs, outdir, suffix = "_suggestions.txt"):
+    outputs = []
+    seen = {}
+    for path in inputs:
+        name = os.path.splitext(os.path.basename(path))[0] + suffix
+        if name in seen:
+            raise ValueError("{} and {} would both be written to {}".format(seen[name], path, name))
+        seen[name] = path
+        outputs.append(os.path.join(outdir, name))
+    return(outputs)
+
+
+# Spellcheck one book into outfile. Returns a summary record for the book - failures are recorded rather than raised, so one bad file doesn't stop the whole run
+def run_book(path, outfile, options, warp10 = False, format = "guiguts"):
+    record = {"input": path, "output": outfile}
+    start = time.time()
+    part = outfile + PART_SUFFIX
+    try:
+        if warp10:
+            options = dict(options, ignored_words = list(options.get("ignored_words") or []) + list(frequent_misspells(path)))
+        n_lines, n_suggestions = check_book(path, part, options, format = format)
+        os.replace(part, outfile)
+        record.update({"status": "done", "lines": n_lines, "suggestions": n_suggestions})
+    except Exception as e:
+        if os.path.exists(part):
+            os.remove(part)
+        record.update({"status": "failed", "error": "{}: {}".format(type(e).__name__, e)})
+    record["seconds"] = round(time.time() - start, 3)
+    return(record)
+
+
+def _run_book_in_worker(job):
+    path, outfile, warp10, format = job
+    return(run_book(path, outfile, _worker_options, warp10, format), _worker_profile())
+
+
+# Was an existing output file written in this format? (an empty file is a text format with no suggestions - binary files always start with BINARY_MAGIC)
+def _written_in(outfile, format):
+    with open(outfile, 'rb') as f:
+        head = f.read(len(BINARY_MAGIC))
+    if head == BINARY_MAGIC:
+        return(format == "binary")
+    if head == b"":
+        return(format != "binary")
+    return(format == ("jsonl" if head.startswith(b"{") else "guiguts"))
+
+
+# Record for a book that already has its output from an earlier run
+def _skipped(path, outfile, format = "guiguts"):
+    if format == "binary":
+        with open(outfile, 'rb') as f:
+            n_suggestions = sum(1 for s in read_binary(f))
+    else:
+        with open(outfile, 'r', encoding = 'utf-8') as f:
+            n_suggestions = sum(1 for line in f)
+    return({"input": path, "output": outfile, "status": "skipped", "suggestions": n_suggestions})
+
+
+# Spellcheck every input book, yielding a summary record for each one as it finishes (in the order they finish)
+# suffix defaults to the one for the format (see SUFFIXES)
+def run_batch(inputs, outdir, options, workers = 1, warp10 = False, resume = True, suffix = None, format = "guiguts"):
+    os.makedirs(outdir, exist_ok = True)
+    jobs = []
+    for path, outfile in zip(inputs, output_paths(inputs, outdir, suffix or SUFFIXES[format])):
+        if resume and os.path.exists(outfile) and _written_in(outfile, format):
+            yield(_skipped(path, outfile, format))
+        else:
+            jobs.append((path, outfile, warp10, format))
+
+    if len(jobs) == 0:
+        return
+    if workers <= 1:
+        # resources are loaded on first use, and kept for every book after that
+        for path, outfile, warp10, format in jobs:
+            yield(run_book(path, outfile, options, warp10, format))
+    else:
+        # each worker loads the resources once, then takes whole books from the pool
+        with Pool(min(workers, len(jobs)), initializer = _init_worker, initargs = (options, profiling.active() is not None)) as pool:
+            for result in pool.imap_unordered(_run_book_in_worker, jobs):
+                yield(_merge_worker_profile(result))
+
+
+# Write summary.json: totals for the run, plus one record per book (in input order). Written to a temp file then renamed, like the suggestion files.
+def write_summary(records, outdir, inputs):
+    order = {path: n for n, path in enumerate(inputs)}
+    records = sorted(records, key = lambda r: order[r["input"]])
+    totals = {status: sum(1 for r in records if r["status"] == status) for status in ("done", "skipped", "failed")}
+    totals["suggestions"] = sum(r.get("suggestions", 0) for r in records)
+    summary = {"books": len(records), "totals": totals, "files": records}
+
+    path = os.path.join(outdir, SUMMARY_NAME)
+    with open(path + PART_SUFFIX, 'w', encoding = 'utf-8') as f:
+        json.dump(summary, f, indent = 2)
+    os.replace(path + PART_SUFFIX, path)
+    return(summary)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'ocrfixr-batch',
+                                     description = 'Provides context-based spellcheck suggestions for a whole directory (or manifest) of texts.')
+    parser.add_argument('source',
+                        help = 'directory of texts, or a manifest file listing one text per line')
+    parser.add_argument('outdir',
+                        help = 'directory to write one suggestion file per text (plus summary.json)')
+    parser.add_argument('--pattern', default = '*.txt', dest = 'pattern',
+                        help = 'which files to pick up from a directory (default: *.txt)')
+    parser.add_argument('--suffix', default = None, dest = 'suffix',
+                        help = 'added to each text name to make its output file name (default: _suggestions.txt, or .jsonl / .bin for those formats)')
+    parser.add_argument('-Warp10', action = 'store_const', const = True,
+                        default = False, dest = 'Warp10',
+                        help = "option to ignore the most common misspells in each text, which are likely correct words.")
+    parser.add_argument('-context', action = 'store_const', const = True,
+                        default = False, dest = 'context',
+                        help = "option to add local context of suggested change.")
+    parser.add_argument('--batch-size', type = int, default = None, dest = 'batch_size',
+                        help = "option to run BERT over the masks from many lines at once, in batches of this size.")
+    parser.add_argument('--workers', type = int, default = 1, dest = 'workers',
+                        help = "option to check this many texts at once, in separate processes. Each one loads its own copy of the model.")
+    parser.add_argument('--cache', default = None, dest = 'cache',
+                        help = "option to keep BERT predictions in this file, shared by every text and worker.")
+    parser.add_argument('--pack-tokens', type = int, default = None, dest = 'pack_tokens',
+                        help = "option to give BERT whole chunks of lines as context, packed up to this many model tokens, instead of one line at a time.")
+    parser.add_argument('--overlap', type = int, default = 0, dest = 'overlap',
+                        help = "with --pack-tokens, how many tokens from the end of each chunk to repeat at the start of the next, as context.")
+    parser.add_argument('--format', default = 'guiguts', choices = ['guiguts', 'jsonl', 'binary'], dest = 'format',
+                        help = "option to write the suggestions as GuiGuts text (the default), JSON lines, or compact binary records (see ocrfixr/suggestions.py).")
+    parser.add_argument('--no-resume', action = 'store_const', const = False,
+                        default = True, dest = 'resume',
+                        help = "option to re-check texts that already have an output file.")
+    parser.add_argument('--profile', default = None, dest = 'profile',
+                        help = "option to time each stage of the run across every text (plus cache hit rates etc.), print a summary at the end, and write the full report to this JSON file.")
+
+    args = parser.parse_args()
+
+    inputs = list_inputs(args.source, args.pattern)
+    print("---- Found {} texts to check....".format(len(inputs)))
+
+    if args.cache is not None:
+        # set before any spellcheck runs, so this process and every worker picks it up when the cache is first loaded
+        os.environ["OCRFIXR_BERT_CACHE"] = args.cache
+    context_fl = "T" if args.context else "F"
+    options = {"context_fl": context_fl, "ignored_words": [], "batch_size": args.batch_size, "pack_tokens": args.pack_tokens, "overlap": args.overlap}
+
+    if args.profile is not None:
+        profiling.start()
+
+    records = []
+    with tqdm(total = len(inputs), unit = " texts") as progress:
+        for record in run_batch(inputs, args.outdir, options, workers = args.workers, warp10 = args.Warp10, resume = args.resume, suffix = args.suffix, format = args.format):
+            records.append(record)
+            if record["status"] == "failed":
+                tqdm.write("---- Could not check {}: {}".format(record["input"], record["error"]))
+            progress.update(1)
+
+    summary = write_summary(records, args.outdir, inputs)
+    totals = summary["totals"]
+    print("---- Checked {done}, skipped {skipped} (already done), failed {failed}. {suggestions} suggestions in total.".format(**totals))
+    print("---- Summary has been written to " + os.path.join(args.outdir, SUMMARY_NAME))
+
+    if args.profile is not None:
+        report = profiling.stop()
+        report.write(args.profile)
+        print(report.table())
+        print("---- Profile has been written to " + args.profile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Merges BERT calls from many threads into shared batches."""
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from . import resources
+
+
+# When several requests are being spellchecked at once (ie. in server.py), each one would send its own handful of masks through BERT.
+# The MicroBatcher stands in for the unmasker: calls from any thread are queued, and a single background thread collects everything that arrives within a short window (or until max_batch masks are waiting) and runs it through the real unmasker in one padded batch.
+# Each caller then gets back just its own predictions, in the same shape the pipeline would have returned them.
+#
+# Only the background thread ever touches the model, so the pipeline itself never has to be thread-safe.
+# Usage: batcher.install() puts one in front of the unmasker resource, for everything in the process to share
+
+class MicroBatcher:
+    def __init__(self, unmasker, max_batch = 32, max_wait = 0.01):
+        self.unmasker = unmasker
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.masks = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._model_lock = threading.Lock()
+        self._thread = threading.Thread(target = self._run, name = "ocrfixr-batcher", daemon = True)
+        self._thread.start()
+
+    # Same call signature as the fill-mask pipeline: a list of masked texts in, a list of predictions out (or just the one prediction, for a single text)
+    def __call__(self, texts, batch_size = None, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        if len(texts) == 0:
+            return([])
+        results = self.submit(texts).result()
+        if single or len(results) == 1:
+            return(results[0])
+        return(results)
+
+    # Queue up masked texts, and return a Future for their predictions (a list, in the same order as texts)
+    def submit(self, texts):
+        if self._closed:
+            raise RuntimeError("MicroBatcher has been closed")
+        future = Future()
+        self._queue.put((list(texts), future))
+        return(future)
+
+    def _collect(self):
+        # wait for the first request, then take anything else that turns up within the window
+        pending = [self._queue.get()]
+        if pending[0] is None:
+            return(None)
+        n_masks = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n_masks < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout = timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                # closing - finish what has already been collected first
+                self._queue.put(None)
+                break
+            pending.append(item)
+            n_masks += len(item[0])
+        return(pending)
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+            # the same masked text often comes from several requests (running headers, common phrases) - only predict it once
+            unique = list(dict.fromkeys(t for texts, future in pending for t in texts))
+            try:
+                with self._model_lock:
+                    predictions = self.unmasker(unique, batch_size = self.max_batch)
+                # the pipeline unwraps single-item lists, so wrap it back up
+                if len(unique) == 1:
+                    predictions = [predictions]
+                found = dict(zip(unique, predictions))
+            except BaseException as e:
+                for texts, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.masks += len(unique)
+            for texts, future in pending:
+                future.set_result([found[t] for t in texts])
+
+    # Candidate scoring (see backends.py) isn't merged across callers - it just waits its turn for the model
+    def score(self, texts, candidates, batch_size = None):
+        with self._model_lock:
+            return(self.unmasker.score(texts, candidates, batch_size = batch_size or self.max_batch))
+
+    def stats(self):
+        return({"batches": self.batches, "masks": self.masks, "mean_batch": round(self.masks / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000})
+
+    # Stop the background thread, once everything already queued has been run
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+
+
+_install_lock = threading.Lock()
+
+
+# Put a MicroBatcher in front of the unmasker resource, loading the model first if needed. If one is already installed, it is returned as is (so the server & async API share one)
+def install(max_batch = 32, max_wait = 0.01):
+    with _install_lock:
+        current = resources.get("unmasker")
+        if isinstance(current, MicroBatcher):
+            return(current)
+        batcher = MicroBatcher(current, max_batch = max_batch, max_wait = max_wait)
+        resources.override("unmasker", batcher)
+        return(batcher)
+
+
+# Stop a batcher, and hand the plain unmasker back if it is still installed
+def uninstall(batcher):
+    with _install_lock:
+        if resources.is_loaded("unmasker") and resources.get("unmasker") is batcher:
+            resources.override("unmasker", batcher.unmasker)
+    batcher.close()
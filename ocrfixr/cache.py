@@ -0,0 +1,192 @@
+"""Caches for repeated work (ie. BERT predictions for the same masked text)."""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+
+# Bounded, thread-safe least-recently-used cache, with hit/miss counters
+class LRUCache:
+    def __init__(self, maxsize = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default = None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return(default)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return(value)
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last = False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return({"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize})
+
+    def __len__(self):
+        return(len(self._data))
+
+    def __contains__(self, key):
+        return(key in self._data)
+
+
+
+# Single-file on-disk cache (SQLite), shared between runs & processes. Once the stored values go over max_bytes, the least recently used entries are dropped.
+class DiskCache:
+    def __init__(self, path, max_bytes = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok = True)
+        # several worker processes can share one cache file - WAL lets readers carry on while another process writes
+        self._db = sqlite3.connect(path, timeout = 30, check_same_thread = False, isolation_level = None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+        self._size = self._total_size()
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _total_size(self):
+        return(self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0])
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # look up in chunks, to stay under SQLite's limit on query parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                query = "SELECT key, value FROM cache WHERE key IN ({})".format(",".join("?" * len(chunk)))
+                for key, value in self._db.execute(query, chunk):
+                    found[key] = json.loads(value)
+            if found:
+                now = time.time()
+                with self._transaction():
+                    self._db.executemany("UPDATE cache SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return(found)
+
+    def put_many(self, items):
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            value = json.dumps(value)
+            rows.append((key, value, len(key) + len(value), now))
+        if not rows:
+            return
+        with self._lock:
+            with self._transaction():
+                self._db.executemany("INSERT OR REPLACE INTO cache (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows)
+            self._size += sum(r[2] for r in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    # Drop least recently used entries until the cache is back down to 90% of max_bytes
+    def _evict(self):
+        # other processes may have written to the file too, so get the real total first
+        self._size = self._total_size()
+        target = int(self.max_bytes * 0.9)
+        if self._size <= self.max_bytes:
+            return
+        dropped = 0
+        with self._transaction():
+            drop = []
+            for key, size in self._db.execute("SELECT key, size FROM cache ORDER BY last_used"):
+                if self._size - dropped <= target:
+                    break
+                drop.append((key,))
+                dropped += size
+            self._db.executemany("DELETE FROM cache WHERE key = ?", drop)
+        self._size -= dropped
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return({"hits": self.hits, "misses": self.misses, "size": count, "bytes": self._size, "max_bytes": self.max_bytes})
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+
+# BERT top-k predictions, keyed on the exact masked text sent to the model. An in-memory LRU sits in front of an optional on-disk cache.
+# Keys include the model name & top_k, so predictions from one model are never handed back for another.
+class PredictionCache:
+    def __init__(self, model, top_k, maxsize = 4096, path = None, max_bytes = 512 * 1024 * 1024):
+        self.namespace = "{}\x00{}\x00".format(model, top_k)
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskCache(path, max_bytes) if path else None
+
+    def key(self, text):
+        return(hashlib.sha1((self.namespace + text).encode("utf-8")).hexdigest())
+
+    # Returns {text: predictions} for every text that was found in the cache
+    def get_many(self, texts):
+        found = {}
+        on_disk = {}
+        for text in texts:
+            key = self.key(text)
+            value = self.memory.get(key)
+            if value is not None:
+                found[text] = value
+            else:
+                on_disk[key] = text
+
+        if self.disk is not None and on_disk:
+            for key, value in self.disk.get_many(on_disk).items():
+                # promote disk hits into memory
+                self.memory.put(key, value)
+                found[on_disk[key]] = value
+        return(found)
+
+    def put_many(self, predictions):
+        items = {self.key(text): value for text, value in predictions.items()}
+        for key, value in items.items():
+            self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put_many(items)
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return(stats)
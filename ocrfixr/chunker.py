@@ -0,0 +1,148 @@
+"""Packs lines of text into chunks that fit the model's input limit, measured in the model's own tokens."""
+import re
+from bisect import bisect_right
+from collections import deque
+
+
+# BERT reads at most 512 tokens per input - WordPiece pieces, not words, and counting the [CLS] & [SEP] it adds itself. OCR junk ("vv^hether", "c0llege") breaks into many pieces, so a limit in words can still overflow.
+# pack_lines measures each line with the model's tokenizer, and packs consecutive lines into chunks as close to the limit as it can:
+#   for chunk in pack_lines([(1, "first line"), (2, "second line"), ...], tokenizer):
+#       chunk.text                 --> the lines, joined up with spaces into a single paragraph
+#       chunk.locate(offset)       --> (line number, column) of that character of chunk.text
+# A line too long for a chunk on its own is split between words, across chunks.
+#
+# overlap (in tokens) repeats the end of each chunk at the start of the next one, so the first lines of a chunk still have the text before them as context.
+# Those repeated lines are only context: chunk.owns(offset) is False for them, since the chunk before already reports on them.
+
+MAX_TOKENS = 512
+
+
+class Chunk:
+    def __init__(self, segments, owned):
+        # segments are (line number, column the piece starts at in that line, text)
+        self.segments = segments
+        # segments before this one are overlap from the previous chunk
+        self.owned = owned
+        self.starts = []
+        offset = 0
+        for number, column, text in segments:
+            self.starts.append(offset)
+            offset += len(text) + 1
+        self.text = " ".join(text for number, column, text in segments)
+
+    def _segment(self, offset):
+        return(bisect_right(self.starts, offset) - 1)
+
+    # Line number & column (within that line) of a character of self.text
+    def locate(self, offset):
+        n = self._segment(offset)
+        number, column, text = self.segments[n]
+        return(number, column + offset - self.starts[n])
+
+    # Whether this chunk reports on the character at offset (False for the overlap at its start)
+    def owns(self, offset):
+        return(self._segment(offset) >= self.owned)
+
+    # Line numbers this chunk reports on, in order
+    def lines(self):
+        return(list(dict.fromkeys(number for number, column, text in self.segments[self.owned:])))
+
+
+
+def _count(tokenizer, texts):
+    if len(texts) == 0:
+        return([])
+    return([len(ids) for ids in tokenizer(texts, add_special_tokens = False)["input_ids"]])
+
+
+# Group the words of a text into runs that each fit in budget tokens: (start, end, tokens) for each run
+def _word_runs(text, tokenizer, budget):
+    words = list(re.finditer("\\S+", text))
+    runs = []
+    start = None
+    size = 0
+    for word, n in zip(words, _count(tokenizer, [w.group() for w in words])):
+        if start is not None and size + n > budget:
+            runs.append((start, end, size))
+            start = None
+            size = 0
+        if start is None:
+            start = word.start()
+        end = word.end()
+        size += n
+    if start is not None:
+        runs.append((start, end, size))
+    return(runs)
+
+
+# Break a line that doesn't fit in a chunk by itself into pieces that do, between words
+def _split_line(number, text, n_tokens, tokenizer, budget):
+    if n_tokens <= budget:
+        return([(number, 0, text, n_tokens)])
+    return([(number, start, text[start:end], size) for start, end, size in _word_runs(text, tokenizer, budget)])
+
+
+# Split a paragraph into pieces that each fit in one model input, between words. The pieces join back up into exactly the original text.
+# A token always covers at least a byte of text, so anything up to the limit in bytes fits without needing the tokenizer (or loading it)
+def split_text(text, tokenizer = None, max_tokens = MAX_TOKENS):
+    if len(text.encode("utf-8")) <= max_tokens - 2:
+        return([text])
+    if tokenizer is None:
+        from . import resources
+        tokenizer = resources.get("tokenizer")
+    budget = max_tokens - tokenizer.num_special_tokens_to_add()
+    if _count(tokenizer, [text])[0] <= budget:
+        return([text])
+    starts = [start for start, end, size in _word_runs(text, tokenizer, budget)]
+    if len(starts) == 0:
+        return([text])
+    starts[0] = 0
+    return([text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])])
+
+
+# lines is a list of (line number, text). Blank lines are skipped - they have nothing to check.
+# max_tokens is the model's limit, including its special tokens
+def pack_lines(lines, tokenizer, max_tokens = MAX_TOKENS, overlap = 0):
+    budget = max_tokens - tokenizer.num_special_tokens_to_add()
+    lines = [(number, text) for number, text in lines if text.strip() != ""]
+
+    pending = deque()
+    for (number, text), n in zip(lines, _count(tokenizer, [text for number, text in lines])):
+        pending.extend(_split_line(number, text, n, tokenizer, budget))
+
+    chunks = []
+    carry = []
+    while pending:
+        segments = list(carry)
+        size = sum(s[3] for s in segments)
+        owned = len(segments)
+        # always take at least one new segment, dropping overlap to make room if need be
+        while segments[:owned] and size + pending[0][3] > budget:
+            size -= segments.pop(0)[3]
+            owned -= 1
+        segments.append(pending.popleft())
+        size += segments[-1][3]
+        while pending and size + pending[0][3] <= budget:
+            segments.append(pending.popleft())
+            size += segments[-1][3]
+
+        # the pieces were measured one at a time - check the joined text too, since tokenizers don't always split the same way mid-sentence
+        while _count(tokenizer, [" ".join(s[2] for s in segments)])[0] > budget:
+            if len(segments) - owned > 1:
+                pending.appendleft(segments.pop())
+            elif owned > 0:
+                segments.pop(0)
+                owned -= 1
+            else:
+                break
+        chunks.append(Chunk([s[:3] for s in segments], owned))
+
+        # the tail of this chunk (up to overlap tokens, in whole segments) is repeated at the start of the next
+        carry = []
+        size = 0
+        for segment in reversed(segments):
+            if size + segment[3] > overlap:
+                break
+            carry.insert(0, segment)
+            size += segment[3]
+    return(chunks)
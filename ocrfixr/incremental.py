@@ -0,0 +1,111 @@
+"""Incremental re-checks: keep each line's suggestions between runs, and only spellcheck the lines that changed."""
+import os
+import json
+import hashlib
+from . import index
+from .suggestions import Suggestion, open_writer
+
+
+# Proofreading happens in rounds, and between two rounds most of the book is untouched. With a state file, a run saves each line's fingerprint & suggestions, and the next run reuses them for every line that hasn't changed:
+#   ocrfixr book.txt suggestions.txt --incremental book.state
+# The output is the same as a full run would give:
+#   - a line is only reused if the exact same line (text *and* line number - BERT sees the number as part of the line) was checked last time. Lines that only moved, because lines were added or removed above them, are checked again. Lines with nothing to fix cost next to nothing to check.
+#   - with --pack-tokens, lines are checked together, a block of whole pages (up to CHUNK_SIZE lines) at a time, so a changed line means checking its whole block again
+#   - anything else that changes the results (options, the ignored words, the model, the dictionaries, the OCRfixr version) starts over with a full run. So does a state file that is missing or can't be read.
+
+STATE_VERSION = 2
+PART_SUFFIX = ".part"
+
+
+# Everything besides the lines themselves that the suggestions depend on
+def setup_key(options):
+    from .backends import model_id
+    pack_tokens = options.get("pack_tokens")
+    key = [STATE_VERSION, index._package_version("OCRfixr"), model_id(), index.source_hash(), options.get("context_fl", "F"),
+           sorted(options.get("ignored_words") or []), pack_tokens, options.get("overlap", 0) if pack_tokens else 0]
+    return(hashlib.sha256(json.dumps(key).encode()).hexdigest())
+
+
+def fingerprint(line):
+    return(hashlib.blake2b(line.encode('utf-8'), digest_size = 8).hexdigest())
+
+
+# Each line's fingerprint & suggestions (Suggestion.to_dict(), with offsets from the start of the line) from one run, in line order
+class State:
+    def __init__(self, setup, lines = None):
+        self.setup = setup
+        self.lines = lines if lines is not None else []
+
+    @classmethod
+    def load(cls, path, setup):
+        try:
+            with open(path, 'r', encoding = 'utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return(cls(setup))
+        if data.get("version") != STATE_VERSION or data.get("setup") != setup:
+            return(cls(setup))
+        return(cls(setup, data["lines"]))
+
+    # The suggestions for line number, if that same line was checked last time (else None)
+    def reuse(self, number, line_fingerprint):
+        if number <= len(self.lines) and self.lines[number - 1][0] == line_fingerprint:
+            return(self.lines[number - 1][1])
+        return(None)
+
+    # Written to a temp file then renamed, so an interrupted run leaves the last state as it was
+    def write(self, path):
+        with open(path + PART_SUFFIX, 'w', encoding = 'utf-8') as f:
+            json.dump({"version": STATE_VERSION, "setup": self.setup, "lines": self.lines}, f)
+        os.replace(path + PART_SUFFIX, path)
+
+
+# Spellcheck the numbered lines ("12:  text") into outfile like run_ocrfixr.check_book, reusing the suggestions in the state file for every line that hasn't changed, then save the new state.
+# Returns the number of lines & suggestions written, and how many lines were checked
+def check_incremental(q, outfile, options, path, workers = 1, progress = None, format = "guiguts"):
+    from .run_ocrfixr import check_chunks, _page_chunks, _line_offsets, CHUNK_SIZE
+    starts = []
+    q = _line_offsets(q, starts)
+    setup = setup_key(options)
+    previous = State.load(path, setup)
+    current = State(setup)
+    packed = bool(options.get("pack_tokens"))
+
+    # Record every line's fingerprint (& the suggestions it keeps), and hand on the lines that need checking, a block at a time
+    # The blocks are the same chunks of whole pages a full run checks (see run_ocrfixr.run_chunks), so in packed mode a changed block is checked just as a full run would
+    def changed():
+        for block in _page_chunks(q, CHUNK_SIZE):
+            start = len(current.lines)
+            fingerprints = [fingerprint(line) for line in block]
+            kept = [previous.reuse(start + n + 1, f) for n, f in enumerate(fingerprints)]
+            if packed and None in kept:
+                kept = [None] * len(block)
+            for line, f, suggestions in zip(block, fingerprints, kept):
+                current.lines.append([f, suggestions])
+            lines = [line for line, suggestions in zip(block, kept) if suggestions is None]
+            if len(lines) > 0:
+                yield(lines)
+
+    # line by line, the changed lines from several blocks can share a chunk
+    chunks = changed() if packed else _page_chunks((line for lines in changed() for line in lines), CHUNK_SIZE)
+    found = {}
+    n_checked = 0
+    for n, result in check_chunks(chunks, options, workers = workers):
+        for suggestion in result:
+            found.setdefault(suggestion.line, []).append(suggestion.to_dict())
+        n_checked += n
+        if progress is not None:
+            progress.update(n)
+
+    n_suggestions = 0
+    with open_writer(outfile, format) as out:
+        for number, entry in enumerate(current.lines, 1):
+            if entry[1] is None:
+                entry[1] = found.get(number, [])
+            suggestions = [Suggestion.from_dict(x) for x in entry[1]]
+            # offsets from the start of the line --> from the start of the book
+            for s in suggestions:
+                s.offset += starts[number - 1]
+            n_suggestions += out.write(suggestions)
+    current.write(path)
+    return(len(current.lines), n_suggestions, n_checked)
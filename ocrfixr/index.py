@@ -0,0 +1,447 @@
+"""Prebuilt, memory-mapped SymSpell index (plus the SCOWL 70 word list)."""
+import os
+import sys
+import json
+import mmap
+import zlib
+from zlib import crc32
+import struct
+import hashlib
+import argparse
+import tempfile
+from array import array
+from collections.abc import Mapping, Set
+import importlib_resources
+
+
+# Building the SymSpell deletes index from the 82k frequency dictionary takes ~4 seconds & a lot of RAM, in every process that needs it.
+# Instead, build it once and write it to disk in a flat binary layout that can be memory-mapped: lookups read straight from the mapped pages, so loading takes milliseconds, and worker processes share one copy of the index through the OS page cache.
+#
+# The file stores a hash of everything it was built from (source files, symspell settings, format version). If any of that changes, the file is treated as stale and rebuilt.
+#
+# Build step (ie. before packaging, so the index ships inside ocrfixr/data): python -m ocrfixr.index
+
+INDEX_VERSION = 4
+MAGIC = b"OCRFXIDX"
+INDEX_NAME = "symspell_index.bin"
+
+# symspell settings - these must match what spellcheck expects
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Layout of the file: MAGIC, header length (uint32), JSON header, then each section (8-byte aligned) in this order
+# (word_set, common_words, the deletes' keys & the metaphone table's words are each stored as a packed set - a blob, offsets & a hash table, see PackedWordSet)
+SECTIONS = ["terms", "counts", "word_set_blob", "word_set_offsets", "word_set_table", "common_words_blob", "common_words_offsets", "common_words_table",
+            "deletes_blob", "deletes_offsets", "deletes_table", "value_offsets", "values",
+            "phonetic_words_blob", "phonetic_words_offsets", "phonetic_words_table", "phonetic_codes_blob", "phonetic_codes_offsets"]
+
+
+def dictionary_path():
+    return(importlib_resources.files("symspellpy") / "frequency_dictionary_en_82_765.txt")
+
+
+def word_list_path():
+    return(importlib_resources.files("ocrfixr") / "data" / "SCOWL_70.txt")
+
+
+def common_list_path():
+    return(importlib_resources.files("ocrfixr") / "data" / "SCOWL_20.txt")
+
+
+def _package_version(name):
+    try:
+        from importlib.metadata import version
+        return(version(name))
+    except Exception:
+        return("unknown")
+
+
+# Hash of everything the index is built from. A mismatch means the index is stale.
+def source_hash():
+    h = hashlib.sha256()
+    h.update(json.dumps([INDEX_VERSION, MAX_EDIT_DISTANCE, PREFIX_LENGTH, sys.byteorder, _package_version("symspellpy"), _package_version("metaphone")]).encode())
+    for path in (dictionary_path(), word_list_path(), common_list_path()):
+        h.update(path.read_bytes())
+    return(h.hexdigest())
+
+
+# Where to look for an index: shipped inside the package first, then the user's cache dir
+def index_paths():
+    from .resources import cache_dir
+    return([str(importlib_resources.files("ocrfixr") / "data" / INDEX_NAME), os.path.join(cache_dir(), INDEX_NAME)])
+
+
+
+### Reading
+# ------------------------------------------------------
+
+# Read-only set of strings, answered straight from a packed buffer (ie. the mapped index file) instead of a Python set:
+#   blob    - the strings, utf-8 encoded & run together, starting at buffer[start]
+#   offsets - where each string starts in the blob, plus where the last one ends
+#   table   - open-addressing hash table (crc32, linear probing) of string number + 1 (0 = empty slot), so each lookup is a couple of probes
+# The strings only become Python objects when they are iterated over, so the SCOWL 70 list costs a few hundred KB of shared, mapped pages rather than ~10 MB of str objects in every process.
+class PackedWordSet(Set):
+    def __init__(self, buffer, start, offsets, table):
+        self._buffer = buffer
+        self._start = start
+        self._offsets = offsets
+        self._table = table
+        self._mask = len(table) - 1
+
+    # Number of the string in the set (its position in the blob), or -1 if it isn't there
+    def find(self, word):
+        kb = word.encode("utf-8", "surrogatepass")
+        buffer = self._buffer
+        offsets = self._offsets
+        table = self._table
+        start = self._start
+        slot = zlib.crc32(kb) & self._mask
+        while True:
+            entry = table[slot]
+            if entry == 0:
+                return(-1)
+            entry -= 1
+            if buffer[start + offsets[entry]:start + offsets[entry + 1]] == kb:
+                return(entry)
+            slot = (slot + 1) & self._mask
+
+    def word(self, entry):
+        return(bytes(self._buffer[self._start + self._offsets[entry]:self._start + self._offsets[entry + 1]]).decode("utf-8"))
+
+    # Same probe loop as find, inlined - this is on the hot path of every word check
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return(False)
+        kb = word.encode("utf-8", "surrogatepass")
+        buffer = self._buffer
+        offsets = self._offsets
+        table = self._table
+        start = self._start
+        mask = self._mask
+        size = len(kb)
+        slot = crc32(kb) & mask
+        entry = table[slot]
+        while entry:
+            end = offsets[entry]
+            if end - offsets[entry - 1] == size and buffer[start + end - size:start + end] == kb:
+                return(True)
+            slot = (slot + 1) & mask
+            entry = table[slot]
+        return(False)
+
+    def __len__(self):
+        return(len(self._offsets) - 1)
+
+    def __iter__(self):
+        for entry in range(len(self)):
+            yield(self.word(entry))
+
+    # set operations (word_set | other...) give back a plain set
+    @classmethod
+    def _from_iterable(cls, it):
+        return(set(it))
+
+
+# Pack strings into the blob, offsets & table of a PackedWordSet
+def pack_words(words):
+    words = list(words)
+    blob = bytearray()
+    offsets = array("I", [0])
+    size = 1
+    while size < 2 * len(words):
+        size *= 2
+    table = array("I", bytes(4 * size))
+    mask = size - 1
+    for entry, word in enumerate(words):
+        kb = word.encode("utf-8")
+        blob += kb
+        offsets.append(len(blob))
+        slot = zlib.crc32(kb) & mask
+        while table[slot] != 0:
+            slot = (slot + 1) & mask
+        table[slot] = entry + 1
+    return(bytes(blob), offsets, table)
+
+
+# Read-only stand-in for SymSpell._deletes (delete string --> list of dictionary words), answered straight from the mapped file.
+# The keys are a PackedWordSet, and each key's words are a run of term numbers in values
+class _MappedDeletes(Mapping):
+    def __init__(self, keys, terms, value_offsets, values):
+        self._keys = keys
+        self._terms = terms
+        self._value_offsets = value_offsets
+        self._values = values
+
+    def __getitem__(self, key):
+        entry = self._keys.find(key) if isinstance(key, str) else -1
+        if entry < 0:
+            raise KeyError(key)
+        terms = self._terms
+        return([terms[i] for i in self._values[self._value_offsets[entry]:self._value_offsets[entry + 1]]])
+
+    def __contains__(self, key):
+        return(key in self._keys)
+
+    def __len__(self):
+        return(len(self._keys))
+
+    def __iter__(self):
+        return(iter(self._keys))
+
+
+# Read-only word --> metaphone code table, answered straight from the mapped file: the words are a PackedWordSet, and word number n's code is bytes offsets[n]:offsets[n + 1] of the codes blob.
+# Only the codes that are asked for become Python strings, rather than a dict of the whole table in every process
+class _MappedCodes(Mapping):
+    def __init__(self, words, codes, offsets):
+        self._words = words
+        self._codes = codes
+        self._offsets = offsets
+
+    def __getitem__(self, word):
+        entry = self._words.find(word) if isinstance(word, str) else -1
+        if entry < 0:
+            raise KeyError(word)
+        return(bytes(self._codes[self._offsets[entry]:self._offsets[entry + 1]]).decode("utf-8"))
+
+    # spellcheck asks with get, mostly for words that aren't in the table - so without raising & catching a KeyError for each of them
+    def get(self, word, default = None):
+        entry = self._words.find(word) if isinstance(word, str) else -1
+        if entry < 0:
+            return(default)
+        return(bytes(self._codes[self._offsets[entry]:self._offsets[entry + 1]]).decode("utf-8"))
+
+    def __contains__(self, word):
+        return(word in self._words)
+
+    def __len__(self):
+        return(len(self._words))
+
+    def __iter__(self):
+        return(iter(self._words))
+
+
+class SymSpellIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not an OCRfixr index".format(path))
+        header_len = struct.unpack_from("<I", self._mm, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mm[start:start + header_len].decode("utf-8"))
+
+        view = memoryview(self._mm)
+        self._sections = {}
+        for name, (offset, length, fmt) in self.header["sections"].items():
+            section = view[offset:offset + length]
+            self._sections[name] = section.cast(fmt) if fmt != "B" else section
+
+    def is_current(self):
+        return(self.header.get("version") == INDEX_VERSION and self.header.get("source_hash") == source_hash())
+
+    def terms(self):
+        return(bytes(self._sections["terms"]).decode("utf-8").split("\n"))
+
+    # SymSpell object with the prebuilt index plugged in (read-only - don't add words to it)
+    def symspell(self):
+        from symspellpy import SymSpell
+        sym_spell = SymSpell(max_dictionary_edit_distance=self.header["max_edit_distance"], prefix_length=self.header["prefix_length"])
+        terms = self.terms()
+        sym_spell._words = dict(zip(terms, self._sections["counts"]))
+        sym_spell._max_length = self.header["max_length"]
+        sym_spell._deletes = _MappedDeletes(self._packed("deletes"), terms, self._sections["value_offsets"], self._sections["values"])
+        return(sym_spell)
+
+    def _packed(self, name):
+        return(PackedWordSet(self._mm, self.header["sections"][name + "_blob"][0], self._sections[name + "_offsets"], self._sections[name + "_table"]))
+
+    # SCOWL 70 & SCOWL 20 word lists, as PackedWordSets
+    def word_set(self):
+        return(self._packed("word_set"))
+
+    def common_words(self):
+        return(self._packed("common_words"))
+
+    # word --> primary double metaphone code, for every word in the word list & the symspell dictionary
+    def metaphone_codes(self):
+        return(_MappedCodes(self._packed("phonetic_words"), self._sections["phonetic_codes_blob"], self._sections["phonetic_codes_offsets"]))
+
+
+# Open the first up-to-date index found, or return None
+def open_index(paths = None):
+    for path in paths or index_paths():
+        if not os.path.exists(path):
+            continue
+        try:
+            index = SymSpellIndex(path)
+        except (OSError, ValueError):
+            continue
+        if index.is_current():
+            return(index)
+    return(None)
+
+
+
+# The process's own copy of the index (the symspell_index resource) - each loader below uses this, so the index is only mapped & hash-checked once, however many of them run
+def shared_index():
+    from . import resources
+    return(resources.get("symspell_index"))
+
+
+
+### Building
+# ------------------------------------------------------
+
+# Primary double metaphone code of each word, for spellcheck's homophone check. Encoding ~150k words takes a couple of seconds, so it is done once, here, rather than in every process.
+# Words metaphone can't encode are left out, and are worked out (and fail) again at lookup time
+def build_metaphone_codes(words):
+    from metaphone import doublemetaphone
+    codes = {}
+    for word in words:
+        try:
+            codes[word] = doublemetaphone(word)[0]
+        except Exception:
+            pass
+    return(codes)
+
+
+def build_symspell():
+    from symspellpy import SymSpell
+    sym_spell = SymSpell(max_dictionary_edit_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH)
+    # term_index is the column of the term and count_index is the
+    # column of the term frequency
+    with importlib_resources.as_file(dictionary_path()) as path:
+        sym_spell.load_dictionary(str(path), term_index=0, count_index=1)
+    return(sym_spell)
+
+
+# Serialize a freshly-built SymSpell object (plus the SCOWL 70 word list) to path. Written to a temp file then renamed, so other processes never see a half-written index.
+def build_index(path, sym_spell = None):
+    sym_spell = sym_spell or build_symspell()
+
+    terms = list(sym_spell._words)
+    term_ids = {t: n for n, t in enumerate(terms)}
+    counts = array("q", (sym_spell._words[t] for t in terms))
+    word_set = sorted(set(word_list_path().read_text(encoding="utf-8").split()))
+    common_words = sorted(set(common_list_path().read_text(encoding="utf-8").split()))
+    phonetic = build_metaphone_codes(sorted(set(terms) | set(word_set)))
+    packed = {"word_set": pack_words(word_set), "common_words": pack_words(common_words), "deletes": pack_words(sym_spell._deletes), "phonetic_words": pack_words(phonetic)}
+
+    # the dictionary words for each delete, in the same order as the deletes' keys
+    value_offsets = array("I", [0])
+    values = array("I")
+    for suggestions in sym_spell._deletes.values():
+        values.extend(term_ids[s] for s in suggestions)
+        value_offsets.append(len(values))
+
+    # the metaphone codes, in the same order as their words
+    codes = bytearray()
+    code_offsets = array("I", [0])
+    for code in phonetic.values():
+        codes += code.encode("utf-8")
+        code_offsets.append(len(codes))
+
+    blobs = {"terms": ("\n".join(terms).encode("utf-8"), "B"),
+             "counts": (counts.tobytes(), "q"),
+             "value_offsets": (value_offsets.tobytes(), "I"),
+             "values": (values.tobytes(), "I"),
+             "phonetic_codes_blob": (bytes(codes), "B"),
+             "phonetic_codes_offsets": (code_offsets.tobytes(), "I")}
+    for name, (blob, offsets, table) in packed.items():
+        blobs[name + "_blob"] = (blob, "B")
+        blobs[name + "_offsets"] = (offsets.tobytes(), "I")
+        blobs[name + "_table"] = (table.tobytes(), "I")
+
+    header = {"version": INDEX_VERSION, "source_hash": source_hash(), "max_edit_distance": MAX_EDIT_DISTANCE,
+              "prefix_length": PREFIX_LENGTH, "max_length": sym_spell._max_length, "sections": {}}
+    # section offsets depend on the header length, so reserve room for the offsets before laying them out
+    header_len = len(json.dumps(header)) + 64 * len(SECTIONS) + 64
+    offset = _align(len(MAGIC) + 4 + header_len)
+    for name in SECTIONS:
+        data, fmt = blobs[name]
+        header["sections"][name] = [offset, len(data), fmt]
+        offset = _align(offset + len(data))
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_len)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", header_len) + header_bytes)
+            for name in SECTIONS:
+                f.seek(header["sections"][name][0])
+                f.write(blobs[name][0])
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return(path)
+
+
+def _align(n):
+    return((n + 7) // 8 * 8)
+
+
+# Used by resources.py - returns a ready-to-use SymSpell object, from a prebuilt index if there is an up-to-date one.
+# Otherwise the dictionary is built from source as before, and saved to the cache dir so the next process can just map it.
+def load_symspell():
+    from . import resources
+    index = shared_index()
+    if index is not None:
+        return(index.symspell())
+
+    sym_spell = build_symspell()
+    try:
+        build_index(index_paths()[-1], sym_spell)
+        # so anything loaded from now on picks up the new index
+        resources.reset("symspell_index")
+    except OSError:
+        # can't write the cache (ie. read-only home dir) - just carry on with the in-memory copy
+        pass
+    return(sym_spell)
+
+
+# Used by resources.py - only reads the word lists from an index that already exists, so asking for a word list never triggers an index build.
+# With no index, they are read into plain sets instead
+def load_word_set():
+    index = shared_index()
+    if index is not None:
+        return(index.word_set())
+    return(set(word_list_path().read_text(encoding="utf-8").split()))
+
+
+def load_common_words():
+    index = shared_index()
+    if index is not None:
+        return(index.common_words())
+    return(set(common_list_path().read_text(encoding="utf-8").split()))
+
+
+# Used by resources.py - the metaphone code table, from an index that already exists (like the word list, this never triggers an index build).
+# With no index, the table is empty, and every code is worked out as it is needed
+def load_metaphone_codes():
+    index = shared_index()
+    if index is not None:
+        return(index.metaphone_codes())
+    return({})
+
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'python -m ocrfixr.index',
+                                     description = 'Build the prebuilt SymSpell index that OCRfixr memory-maps at startup.')
+    parser.add_argument('output', nargs = '?', default = index_paths()[0],
+                        help = 'where to write the index (default: inside the installed package)')
+    args = parser.parse_args()
+
+    print("---- Building SymSpell index....")
+    build_index(args.output)
+    print("---- Index has been written to " + args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Memory-mapped books: the file is mapped rather than read in, and only decoded a block of lines at a time."""
+import re
+import mmap
+
+
+# Distributed Proofreaders' page dumps mark the start of each page with a line like "-----File: 0001.png---..."
+PAGE_SEPARATOR = b"-----File: "
+
+
+# Regex for up to n whole lines (the last line of the file may not end in a newline), so a block's lines are counted in one go rather than a line at a time
+_line_patterns = {}
+
+def _lines(n):
+    if n not in _line_patterns:
+        _line_patterns[n] = re.compile(b"(?:[^\n]*\n|[^\n]+\\Z){0,%d}" % n)
+    return(_line_patterns[n])
+
+
+# The book's file, mapped into memory. Nothing is read until it is used, and the pages of the file are shared with the OS cache (and between processes mapping the same file), so even a book several GB in size costs next to no memory of its own.
+# Text is only decoded a range at a time (text(start, end)), with line endings the same as open() gives ("\r\n" & "\r" --> "\n").
+#   with MappedBook("book.txt") as book:
+#       for block in book.blocks(128):
+#           ...
+class MappedBook:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+            # the book is read front to back, so the OS can read ahead, and let go of the pages already read
+            if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._map.madvise(mmap.MADV_SEQUENTIAL)
+        except ValueError:
+            # an empty file can't be mapped
+            self._map = b""
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return(len(self._map))
+
+    # Decode bytes start:end of the file (the whole file, by default)
+    def text(self, start = 0, end = None):
+        end = len(self._map) if end is None else end
+        with memoryview(self._map)[start:end] as view:
+            text = str(view, 'utf-8')
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return(text)
+
+    # Number of matches of a bytes regex in the file, counting no further than limit
+    def count(self, pattern, limit = None):
+        n = 0
+        for match in pattern.finditer(self._map):
+            n += 1
+            if n == limit:
+                break
+        return(n)
+
+    # Where the line that pos is in ends (just after its newline), in bytes
+    def _line_end(self, pos):
+        end = self._map.find(b"\n", pos)
+        return(len(self._map) if end == -1 else end + 1)
+
+    # Does the line ending at end run on to the next one, ie. with a word split across the lines?
+    def _ends_in_hyphen(self, end):
+        last = self._map[max(0, end - 3):end]
+        return(last.endswith(b"-\n") or last.endswith(b"-\r\n"))
+
+    # The file as text, in blocks of at most block_size whole lines (newlines kept), decoded one block at a time.
+    # A block ends early where a new page starts, so the work follows the pages of a page dump - except that a block never ends on a line ending in a hyphen, so a word split across lines (or pages) is always in one block.
+    def blocks(self, block_size):
+        m = self._map
+        size = len(m)
+        start = 0
+        while start < size:
+            end = _lines(block_size).match(m, start).end()
+            # end at the last page that starts in the block (and doesn't start in the middle of a split word)
+            page = m.rfind(b"\n" + PAGE_SEPARATOR, start, end)
+            while page != -1 and self._ends_in_hyphen(page + 1):
+                page = m.rfind(b"\n" + PAGE_SEPARATOR, start, page)
+            if page != -1:
+                end = page + 1
+            while end < size and self._ends_in_hyphen(end):
+                end = self._line_end(end)
+            yield(self.text(start, end))
+            start = end
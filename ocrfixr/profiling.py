@@ -0,0 +1,211 @@
+"""Opt-in timing of where a run's time goes: per-stage wall time & call counts, distributions and cache hit rates."""
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from . import resources
+
+
+# Profiling is off by default. Instrumented functions then only check one global on each call, so a normal run costs next to nothing extra.
+#   with profiling.profile() as report:
+#       spellcheck(text).fix()
+#   print(report.table())
+#   report.write("out.json")
+# A report holds:
+#   stages        - wall time & number of calls of each instrumented step (spellcheck.list_misreads, spellcheck.unmasker...). A stage's time includes any stages run inside it
+#   distributions - how a value was spread over a run, ie. the number of misreads in each paragraph, or the number of masked texts in each call to BERT
+#   caches        - hits & misses of the BERT, symspell & metaphone caches during the run
+# Only one report is collected at a time (per process). Worker processes each collect their own, and hand them back to be merged in (see run_ocrfixr).
+
+_report = None
+
+# Caches to report on, and the resource each one lives in
+CACHES = {"bert": "bert_cache", "symspell": "symspell_cache", "metaphone": "metaphone_cache"}
+
+
+# Current hit/miss counts of each cache that has been loaded - {"bert.memory": (hits, misses), "symspell": (hits, misses), ...}
+def _cache_counts():
+    counts = {}
+    for name, resource in CACHES.items():
+        if not resources.is_loaded(resource):
+            continue
+        stats = resources.get(resource).stats()
+        # the BERT cache reports its memory & disk layers separately
+        parts = {name + "." + k: v for k, v in stats.items()} if "hits" not in stats else {name: stats}
+        for key, value in parts.items():
+            counts[key] = (value["hits"], value["misses"])
+    return(counts)
+
+
+class Profile:
+    def __init__(self):
+        self.stages = {}
+        self.distributions = {}
+        self.caches = {}
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._cache_start = _cache_counts()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            calls = self.stages.setdefault(stage, [0, 0.0])
+            calls[0] += 1
+            calls[1] += seconds
+
+    def record(self, name, value):
+        with self._lock:
+            counts = self.distributions.setdefault(name, {})
+            counts[value] = counts.get(value, 0) + 1
+
+    # Everything collected so far (stages, distributions, cache hits & misses), as plain data that can be pickled over to another process and merged in there.
+    # With reset, starts over afterwards - ie. a worker hands back what it collected for each chunk of lines
+    def snapshot(self, reset = False):
+        now = time.perf_counter()
+        counts = _cache_counts()
+        with self._lock:
+            caches = {k: list(v) for k, v in self.caches.items()}
+            for key, (hits, misses) in counts.items():
+                h0, m0 = self._cache_start.get(key, (0, 0))
+                found = caches.setdefault(key, [0, 0])
+                found[0] += hits - h0
+                found[1] += misses - m0
+            data = {"seconds": self.seconds + now - self._started,
+                    "stages": {k: list(v) for k, v in self.stages.items()},
+                    "distributions": {k: dict(v) for k, v in self.distributions.items()},
+                    "caches": caches}
+            if reset:
+                self.stages = {}
+                self.distributions = {}
+                self.caches = {}
+                self.seconds = 0.0
+                self._started = now
+                self._cache_start = counts
+        return(data)
+
+    # Add in a snapshot from somewhere else (ie. a worker process). Its time is counted as part of this report's stages, not its wall time
+    def merge(self, data):
+        with self._lock:
+            for stage, (calls, seconds) in data["stages"].items():
+                found = self.stages.setdefault(stage, [0, 0.0])
+                found[0] += calls
+                found[1] += seconds
+            for name, counts in data["distributions"].items():
+                found = self.distributions.setdefault(name, {})
+                for value, n in counts.items():
+                    found[value] = found.get(value, 0) + n
+            for key, (hits, misses) in data["caches"].items():
+                found = self.caches.setdefault(key, [0, 0])
+                found[0] += hits
+                found[1] += misses
+
+    # The report as JSON-ready data
+    def summary(self):
+        data = self.snapshot()
+        stages = {}
+        for stage, (calls, seconds) in sorted(data["stages"].items(), key = lambda item: -item[1][1]):
+            stages[stage] = {"calls": calls, "seconds": round(seconds, 4), "ms_per_call": round(seconds / calls * 1000, 4)}
+        distributions = {}
+        for name, counts in sorted(data["distributions"].items()):
+            n = sum(counts.values())
+            distributions[name] = {"count": n, "mean": round(sum(k * v for k, v in counts.items()) / n, 2), "max": max(counts),
+                                   "histogram": {str(k): counts[k] for k in sorted(counts)}}
+        caches = {}
+        for key, (hits, misses) in sorted(data["caches"].items()):
+            caches[key] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4) if hits + misses > 0 else None}
+        return({"seconds": round(data["seconds"], 4), "stages": stages, "distributions": distributions, "caches": caches})
+
+    def write(self, path):
+        with open(path, 'w', encoding = 'utf-8') as f:
+            json.dump(self.summary(), f, indent = 2)
+
+    # Summary table, for printing at the end of a run
+    def table(self):
+        summary = self.summary()
+        rows = ["{:<32} {:>10} {:>12} {:>12}".format("stage", "calls", "seconds", "ms/call")]
+        for stage, s in summary["stages"].items():
+            rows.append("{:<32} {:>10,} {:>12.3f} {:>12.3f}".format(stage, s["calls"], s["seconds"], s["ms_per_call"]))
+        if summary["distributions"]:
+            rows.append("")
+            rows.append("{:<32} {:>10} {:>12} {:>12}".format("distribution", "count", "mean", "max"))
+            for name, d in summary["distributions"].items():
+                rows.append("{:<32} {:>10,} {:>12.2f} {:>12,}".format(name, d["count"], d["mean"], d["max"]))
+        if summary["caches"]:
+            rows.append("")
+            rows.append("{:<32} {:>10} {:>12} {:>12}".format("cache", "hits", "misses", "hit rate"))
+            for key, c in summary["caches"].items():
+                rate = "-" if c["hit_rate"] is None else "{:.1%}".format(c["hit_rate"])
+                rows.append("{:<32} {:>10,} {:>12,} {:>12}".format(key, c["hits"], c["misses"], rate))
+        rows.append("")
+        rows.append("wall time: {:.2f}s".format(summary["seconds"]))
+        return("\n".join(rows))
+
+
+
+# Turn profiling on (or hand in a report to add to), for everything run in this process until stop()
+def start(report = None):
+    global _report
+    _report = report or Profile()
+    return(_report)
+
+
+def stop():
+    global _report
+    report, _report = _report, None
+    return(report)
+
+
+def active():
+    return(_report)
+
+
+@contextmanager
+def profile(report = None):
+    report = start(report)
+    try:
+        yield(report)
+    finally:
+        stop()
+
+
+
+### Instrumentation
+# ------------------------------------------------------
+
+# Decorator: time every call of the function as a stage of the report
+def stage(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            report = _report
+            if report is None:
+                return(func(*args, **kwargs))
+            started = time.perf_counter()
+            try:
+                return(func(*args, **kwargs))
+            finally:
+                report.add_time(name, time.perf_counter() - started)
+        return(timed)
+    return(decorate)
+
+
+# Time a block of code as a stage of the report
+@contextmanager
+def timer(name):
+    report = _report
+    if report is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.add_time(name, time.perf_counter() - started)
+
+
+# Add a value to one of the report's distributions
+def record(name, value):
+    report = _report
+    if report is not None:
+        report.record(name, value)
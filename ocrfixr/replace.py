@@ -0,0 +1,65 @@
+"""Single-pass find-replace for a whole dict of fixes at once."""
+import re
+
+
+# Calling re.sub once per fix rescans the whole text for every fix (text x fixes), and lets an earlier replacement feed into a later one.
+# Instead, the keys are built into a trie, and the trie is written out as one regex: keys that share a prefix share a branch ("tbe", "tbey" --> tbe(?:y)?), so the regex engine walks it like an automaton.
+# The text is then scanned once, left to right. At each position the longest matching key wins, and replaced text is never looked at again.
+
+
+# Turn a trie node into a regex. Each node is a dict of next character --> child node, and "" marks the end of a key.
+def _node_pattern(node):
+    ends_here = "" in node
+    branches = [re.escape(ch) + _node_pattern(child) for ch, child in sorted(node.items()) if ch != ""]
+    if len(branches) == 0:
+        return("")
+    if len(branches) == 1 and not ends_here:
+        return(branches[0])
+    pattern = "(?:" + "|".join(branches) + ")"
+    # if a key also ends here, the rest is optional (greedy, so longer keys are tried first)
+    if ends_here:
+        pattern = pattern + "?"
+    return(pattern)
+
+
+# Regex that matches any of the keys
+def trie_pattern(keys):
+    trie = {}
+    for key in keys:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    return(_node_pattern(trie))
+
+
+class MultiReplacer:
+    # word_boundary: only match whole words, ie. \bkey\b (used by spellcheck)
+    # trailing_space: also swallow one whitespace character after the key (used by unsplit, where the replacement carries its own newline)
+    def __init__(self, fixes, word_boundary = False, trailing_space = False):
+        self.fixes = {k: v for k, v in fixes.items() if len(k) > 0}
+        pattern = "(" + trie_pattern(self.fixes) + ")"
+        if word_boundary:
+            pattern = "\\b" + pattern + "\\b"
+        if trailing_space:
+            pattern = pattern + "\\s?"
+        self.pattern = re.compile(pattern) if len(self.fixes) > 0 else None
+
+    def sub(self, text):
+        if self.pattern is None:
+            return(text)
+        fixes = self.fixes
+        return(self.pattern.sub(lambda m: fixes[m.group(1)], text))
+
+    # Every place sub() would make a replacement: (position, key), in order
+    def find(self, text):
+        if self.pattern is None:
+            return([])
+        return([(m.start(1), m.group(1)) for m in self.pattern.finditer(text)])
+
+
+# Replace every key of fixes found in text with its value, in one pass
+def multi_replace(text, fixes, word_boundary = False, trailing_space = False):
+    if len(fixes) == 0:
+        return(text)
+    return(MultiReplacer(fixes, word_boundary = word_boundary, trailing_space = trailing_space).sub(text))
@@ -0,0 +1,186 @@
+"""Lazily-loaded project resources (word lists, scanno dicts, SymSpell and BERT)."""
+import os
+import ast
+import threading
+import importlib_resources
+
+
+# Nothing is read from disk until it is first asked for, so "import ocrfixr" is cheap, and jobs that never touch BERT (unsplit, -misspells) never pay for loading it.
+# Each resource is loaded at most once per process, even when several threads ask for it at the same time.
+# Usage: resources.get("word_set")
+
+ocrfixr = importlib_resources.files("ocrfixr")
+
+# BERT model used for context suggestions, and how many suggestions it returns for each [MASK]
+BERT_MODEL = 'bert-base-uncased'
+BERT_TOP_K = 30
+
+_loaders = {}
+_loaded = {}
+_locks = {}
+
+
+# Register a function as the loader for the resource of the same name
+def resource(func):
+    _loaders[func.__name__] = func
+    _locks[func.__name__] = threading.Lock()
+    return(func)
+
+
+# Return a resource, loading it first if this is the first time it has been asked for
+def get(name):
+    try:
+        return(_loaded[name])
+    except KeyError:
+        pass
+
+    # Only one thread runs the loader - any others asking for the same resource wait here, then pick up the loaded copy
+    with _locks[name]:
+        if name not in _loaded:
+            _loaded[name] = _loaders[name]()
+    return(_loaded[name])
+
+
+# Load resources ahead of time (ie. in a server or worker process, so the first request doesn't pay for it). Loads everything if no names are given.
+def preload(*names):
+    for name in names or list(_loaders):
+        get(name)
+
+
+def is_loaded(name):
+    return(name in _loaded)
+
+
+# Swap in a different object for a resource (ie. a stub unmasker for testing)
+def override(name, value):
+    with _locks[name]:
+        _loaded[name] = value
+
+
+# Directory for files OCRfixr builds for itself (ie. the prebuilt symspell index). Set OCRFIXR_CACHE_DIR to move it.
+def cache_dir():
+    default = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "ocrfixr")
+    return(os.environ.get("OCRFIXR_CACHE_DIR") or default)
+
+
+# Drop loaded resources, so they are reloaded on next use. Drops everything if no names are given.
+def reset(*names):
+    for name in names or list(_loaders):
+        with _locks[name]:
+            _loaded.pop(name, None)
+
+
+
+### Project resources
+# ------------------------------------------------------
+
+# The prebuilt index (see index.py), opened & checked against its source files once per process, then shared by the word lists, metaphone codes & symspell below. None if there is no up-to-date index (yet)
+@resource
+def symspell_index():
+    from .index import open_index
+    return(open_index())
+
+
+# Full word list (SCOWL 70). Mapped straight from the prebuilt index if there is one, as a compact read-only set shared between processes - see index.PackedWordSet
+@resource
+def word_set():
+    from .index import load_word_set
+    return(load_word_set())
+
+
+# Smaller list of very common words (SCOWL 20, used by unsplit) - also from the prebuilt index if there is one
+@resource
+def common_words():
+    from .index import load_common_words
+    return(load_common_words())
+
+
+# List of words NOT in SCOWL 70 that we should ignore anyways
+@resource
+def ignore_set_from_pkg():
+    return(set((ocrfixr / "data" / "Ignore_These_Misspells.txt").read_text(encoding='utf-8').split()))
+
+
+# dict of common scannos to check for (bypasses the context check, since these are clear mappings)
+@resource
+def common_scannos():
+    return(ast.literal_eval((ocrfixr / "data" / "Scannos_Common.txt").read_text(encoding='utf-8')))
+
+
+@resource
+def common():
+    return(set(get("common_scannos")))
+
+
+# dict of specifically tricky scannos to check for - misspellings that create real words (arid - and)
+@resource
+def stealth_scannos():
+    return(ast.literal_eval((ocrfixr / "data" / "Scannos_Stealth.txt").read_text(encoding='utf-8')))
+
+
+@resource
+def stealth():
+    return(set(get("stealth_scannos")))
+
+
+# dict of OCRfixr suggestions that are known to be bad. This list prevents them from ever being suggested.
+@resource
+def ignore_suggestions():
+    return(ast.literal_eval((ocrfixr / "data" / "Ignore_These_Suggestions.txt").read_text(encoding='utf-8')))
+
+
+# Double metaphone code of every word in the word list & the symspell dictionary, for the homophone check in spellcheck (read from the prebuilt index - see index.py)
+@resource
+def metaphone_codes():
+    from .index import load_metaphone_codes
+    return(load_metaphone_codes())
+
+
+# setup symspell spellchecker parameters. This memory-maps the prebuilt index (see index.py), building it first if it is missing or out of date (~4 seconds, once)
+@resource
+def sym_spell():
+    from .index import load_symspell
+    return(load_symspell())
+
+
+# Set BERT to look for the 30 most likely words in position of the misspelled word (~7 seconds, most of which is importing transformers)
+# By default this is the transformers fill-mask pipeline - OCRFIXR_BACKEND & OCRFIXR_MODEL switch to another backend or model (see backends.py)
+@resource
+def unmasker():
+    from .backends import load_backend
+    return(load_backend(BERT_TOP_K))
+
+
+# The model's tokenizer, for measuring text in the model's own tokens rather than words (see chunker.py). Much quicker to load than the model itself
+@resource
+def tokenizer():
+    from .backends import load_tokenizer
+    return(load_tokenizer())
+
+
+# Cache of BERT predictions, keyed on the masked text (see cache.py). Kept in memory by default.
+# To also keep predictions on disk between runs, set OCRFIXR_BERT_CACHE to a file path (and optionally OCRFIXR_BERT_CACHE_MB, default 512). OCRFIXR_BERT_CACHE_SIZE sets how many predictions are kept in memory (0 turns this off).
+@resource
+def bert_cache():
+    from .cache import PredictionCache
+    from .backends import model_id
+    return(PredictionCache(model_id(), BERT_TOP_K,
+                           maxsize = int(os.environ.get("OCRFIXR_BERT_CACHE_SIZE", 4096)),
+                           path = os.environ.get("OCRFIXR_BERT_CACHE") or None,
+                           max_bytes = int(float(os.environ.get("OCRFIXR_BERT_CACHE_MB", 512)) * 1024 * 1024)))
+
+
+# Cache of symspell suggestions for each misread (see spellcheck.__SUGGEST_SPELLCHECK) - the same OCR garbage ("tbe", "aud") turns up hundreds of times in a book.
+# OCRFIXR_SYMSPELL_CACHE_SIZE sets how many misreads are kept (0 turns this off)
+@resource
+def symspell_cache():
+    from .cache import LRUCache
+    return(LRUCache(maxsize = int(os.environ.get("OCRFIXR_SYMSPELL_CACHE_SIZE", 65536))))
+
+
+# Metaphone codes for words that aren't in the metaphone_codes table (the odd misread, or everything if there is no prebuilt index).
+# OCRFIXR_METAPHONE_CACHE_SIZE sets how many words are kept (0 turns this off)
+@resource
+def metaphone_cache():
+    from .cache import LRUCache
+    return(LRUCache(maxsize = int(os.environ.get("OCRFIXR_METAPHONE_CACHE_SIZE", 65536))))
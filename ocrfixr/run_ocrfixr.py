@@ -2,12 +2,280 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-from transformers import logging
-logging.set_verbosity_error()
-import sys
+import os
 import re
 from tqdm import tqdm
-from collections import Counter
+from collections import deque
+from multiprocessing import Pool
+from ocrfixr import profiling
+from ocrfixr.mapped import MappedBook, PAGE_SEPARATOR
+from ocrfixr.replace import MultiReplacer
+from ocrfixr.suggestions import Suggestion, guiguts_lines, open_writer
+
+
+# Number of lines handed to spellcheck (and to each worker process) at a time
+CHUNK_SIZE = 128
+
+
+# Spellcheck a chunk of numbered lines ("12:  text"), and return the suggestions for them as Suggestion records (see suggestions.py), in line order.
+# Each record's offset is from the start of its line - check_book turns them into offsets in the book.
+# If pack_tokens is set, lines are checked together in packed chunks of up to that many model tokens (see check_packed_lines), rather than one line at a time
+# Pass the same index (spellcheck.MisreadIndex) for every chunk of a book, so each unique token & misread is only sorted out once for the whole book.
+# The CLI's indexes don't record positions, and only keep the most recently used tokens & misreads, so they stay the same size however long the book is
+@profiling.stage("run_ocrfixr.check_lines")
+def suggest_lines(lines, context_fl = "F", ignored_words = None, batch_size = None, pack_tokens = None, overlap = 0, index = None):
+    from ocrfixr.spellcheck import spellcheck, suggest_batch, MisreadIndex
+    
+    if index is None:
+        index = MisreadIndex(positions = False)
+    if pack_tokens:
+        return(check_packed_lines(lines, context_fl, ignored_words, batch_size, pack_tokens, overlap, index))
+    
+    if batch_size is None:
+        results = [spellcheck(i, return_context = context_fl, ignore_words = ignored_words, index = index).suggestions() for i in lines]
+    else:
+        # gather the masks from the whole chunk, so BERT can run them in batches
+        results = suggest_batch(lines, batch_size = batch_size, return_context = context_fl, ignore_words = ignored_words, index = index)
+    return([x for line, records in zip(lines, results) for x in _on_numbered_line(line, records)])
+
+
+# suggest_lines, as GuiGuts-formatted suggestions ("12:10 Suggest 'flew' for 'flevv'")
+def check_lines(lines, context_fl = "F", ignored_words = None, batch_size = None, pack_tokens = None, overlap = 0, index = None):
+    return(list(guiguts_lines(suggest_lines(lines, context_fl, ignored_words, batch_size, pack_tokens, overlap, index))))
+
+
+_NUMBERED_LINE = re.compile("^([0-9]+):  (.*)$", re.S)
+
+
+# spellcheck's records for a numbered line count from the start of the text it was given ("12:  text" is line 1) - move them onto the line's own number, with column & offset counted from after the "12:  "
+def _on_numbered_line(line, records):
+    match = _NUMBERED_LINE.match(line)
+    if match is not None:
+        # the number & its spaces are ASCII, so the same length in characters & bytes
+        body = match.start(2)
+        for s in records:
+            s.line = int(match.group(1))
+            s.column -= body
+            s.offset -= body
+    return(records)
+
+
+# Packed mode: rather than giving BERT a single line as context, pack the lines into chunks that fill up the model's input (measured with its tokenizer - see chunker.py), and spellcheck each chunk as one paragraph.
+# Each fix is then mapped back to the line (and column) it was found at, so the suggestions are the same kind as checking line by line.
+# As with any paragraph, a fix applies to every place the misread turns up in the chunk - each place gets its own suggestion.
+# Chunks don't reach across the blocks of lines handed to this (CHUNK_SIZE), so a block's first lines have no overlap.
+def check_packed_lines(lines, context_fl = "F", ignored_words = None, batch_size = None, max_tokens = 512, overlap = 0, index = None):
+    from ocrfixr import resources
+    from ocrfixr.chunker import pack_lines
+    from ocrfixr.spellcheck import check_paragraphs
+    
+    numbered = {}
+    for i in lines:
+        match = _NUMBERED_LINE.match(i)
+        if match is not None:
+            numbered[int(match.group(1))] = (match.group(2), i)
+    chunks = pack_lines([(number, text) for number, (text, line) in numbered.items()], resources.get("tokenizer"), max_tokens = max_tokens, overlap = overlap)
+    
+    results = check_paragraphs([c.text for c in chunks], batch_size = batch_size, ignore_words = ignored_words, index = index)
+    
+    suggestions = []
+    for chunk, checked in zip(chunks, results):
+        # each fix is reported where it is applied - found the same way as in spellcheck's own suggestion records
+        for position, key in MultiReplacer(checked.fixes, word_boundary = True).find(chunk.text):
+            if chunk.owns(position):
+                stage, confidence = checked.fix_sources.get(key, (None, None))
+                number, column = chunk.locate(position)
+                text, line = numbered[number]
+                suggestions.append(Suggestion(number, column, len(text[:column].encode('utf-8')), key, checked.fixes[key], stage, confidence, line if context_fl == "T" else None))
+    return(sorted(suggestions, key = lambda s: (s.line, s.column)))
+
+
+# Worker processes load the model & dictionaries once, when they start up, then take chunks of lines from the pool
+# Each keeps its own misread index for the chunks it is given
+# When the run is being profiled, each worker profiles itself too, and hands back what it collected along with each result, to be merged into the main report
+_worker_options = {}
+_worker_index = []
+
+def _init_worker(options, profile = False):
+    from ocrfixr import resources
+    from ocrfixr.spellcheck import MisreadIndex
+    _worker_options.update(options)
+    _worker_index[:] = [MisreadIndex(positions = False)]
+    if profile:
+        profiling.start()
+    resources.preload()
+
+
+def _worker_profile():
+    report = profiling.active()
+    return(report.snapshot(reset = True) if report is not None else None)
+
+
+def _check_lines_in_worker(lines):
+    return(suggest_lines(lines, index = _worker_index[0], **_worker_options), _worker_profile())
+
+
+# Unpack a worker's result, merging its profile into this process's report
+def _merge_worker_profile(result):
+    result, snapshot = result
+    report = profiling.active()
+    if snapshot is not None and report is not None:
+        report.merge(snapshot)
+    return(result)
+
+
+# Split the numbered lines into chunks of whole pages (see _page_chunks), and yield the suggestions (Suggestion records) for each chunk in line order (whether run here or across a pool of worker processes).
+# q can be a list or a lazy iterator - only a few chunks are read ahead of the results, so a whole book never has to sit in memory.
+def run_chunks(q, options, workers = 1):
+    for result in check_chunks(_page_chunks(q, CHUNK_SIZE), options, workers):
+        yield(result)
+
+
+# run_chunks, for lines that are already split into chunks
+def check_chunks(chunks, options, workers = 1):
+    from ocrfixr.spellcheck import MisreadIndex
+    if workers <= 1:
+        index = MisreadIndex(positions = False)
+        for chunk in chunks:
+            yield(len(chunk), suggest_lines(chunk, index = index, **options))
+    else:
+        with Pool(workers, initializer = _init_worker, initargs = (options, profiling.active() is not None)) as pool:
+            # results are handed back in the order the chunks went in, no matter which worker finishes first
+            pending = deque()
+            for chunk in chunks:
+                pending.append((len(chunk), pool.apply_async(_check_lines_in_worker, (chunk,))))
+                if len(pending) >= 2 * workers:
+                    n_lines, result = pending.popleft()
+                    yield(n_lines, _merge_worker_profile(result.get()))
+            while pending:
+                n_lines, result = pending.popleft()
+                yield(n_lines, _merge_worker_profile(result.get()))
+
+
+# a numbered line that starts a new page of a page dump ("12:  -----File: 0001.png---")
+_PAGE_START = re.compile("[0-9]+:  " + re.escape(PAGE_SEPARATOR.decode('ascii')))
+
+
+# Split the numbered lines into chunks of up to size lines, each holding as many whole pages of a page dump as fit - so the work is split between workers at page boundaries, and packed mode never packs the end of one chunk's page with the rest of it in the next.
+# A page longer than size lines (or a book with no page separators) is split every size lines.
+def _page_chunks(lines, size):
+    chunk = []
+    # where the last page to start in the chunk starts
+    start = 0
+    for line in lines:
+        new_page = _PAGE_START.match(line) is not None
+        if len(chunk) == size:
+            # unless its last page ends right here (or fills the chunk on its own), the chunk ends where that page starts, and the page is carried on into the next chunk
+            end = size if new_page or start == 0 else start
+            yield(chunk[:end])
+            chunk = chunk[end:]
+            start = 0
+        if new_page:
+            start = len(chunk)
+        chunk.append(line)
+    if len(chunk) > 0:
+        yield(chunk)
+
+
+
+### Reading the book
+# ------------------------------------------------------
+# The book is memory-mapped (see mapped.py) and decoded lazily, a block of lines at a time, and may be read more than once (once per stage), rather than loaded into memory whole
+
+# a line ending in a split word ("mid-"), in the book's bytes - with any of the line endings open() would turn into "\n"
+# (the hyphen comes first, so the regex engine can skip ahead to each hyphen)
+_SPLIT_WORD = re.compile(b"-(?<=[A-z]-)(?:\r\n|\r|\n)")
+
+
+# Count lines that end in a split word ("mid-"), stopping as soon as there are more than enough
+# This scans the mapped bytes, without decoding the book
+def has_split_words(path, threshold = 30):
+    with MappedBook(path) as book:
+        return(book.count(_SPLIT_WORD, limit = threshold + 1) > threshold)
+
+
+# Yield the book in blocks of whole lines (newlines kept). A block never ends on a line ending in a hyphen, so a word split across lines is always in one block.
+# In a page dump, blocks also end where a new page starts ("-----File: 0001.png---"), so they hold whole pages where they can.
+def read_blocks(path, block_size = CHUNK_SIZE):
+    with MappedBook(path) as book:
+        for block in book.blocks(block_size):
+            yield(block)
+
+
+# Turn blocks of text into lines, the same as "".join(blocks).split("\n") would - but one block at a time.
+# If fix is given, each block is run through it first (ie. merging split words)
+def split_lines(blocks, fix = None):
+    carry = ""
+    for block in blocks:
+        if fix is not None:
+            block = fix(block)
+        lines = (carry + block).split("\n")
+        # the last piece is an unfinished line - it continues in the next block
+        carry = lines.pop()
+        for line in lines:
+            yield(line)
+    yield(carry)
+
+
+def _unsplit_block(block):
+    from ocrfixr import unsplit
+    return(unsplit(block).fix())
+
+
+# Misspells counter, ranked by frequency
+# Used by both -Warp10 and -misspells flags
+def ct_misspells(path, min_len):
+    from ocrfixr.spellcheck import count_misreads
+    M = count_misreads(split_lines(read_blocks(path)))
+    counts = {word: n for word, n in M.items() if len(word) > min_len}
+    counts = dict(sorted(counts.items(), key=lambda item: -item[1]))
+    return(counts)
+
+
+# Words (>3 characters long) that pop up 10+ times in the book - these are likely correct, so -Warp10 leaves them alone
+def frequent_misspells(path):
+    counts = ct_misspells(path,3)
+    return({key:value for (key,value) in counts.items() if value >= 10})
+
+
+# The book's lines, numbered ("12:  text") as they are handed to spellcheck.
+# If the book has words split across lines, these are merged back together first (pass merge_split = False to skip the check)
+def numbered_lines(path, merge_split = None):
+    if merge_split is None:
+        merge_split = has_split_words(path)
+    fix_block = _unsplit_block if merge_split else None
+    lines = split_lines(read_blocks(path), fix = fix_block)
+    return('%d:  %s' % (number + 1, line) for (number, line) in enumerate(lines))
+
+
+# Pass the numbered lines through, noting where each one starts in the book (as checked, ie. with split words merged), in bytes
+def _line_offsets(q, starts):
+    offset = 0
+    for line in q:
+        starts.append(offset)
+        offset += len(_NUMBERED_LINE.match(line).group(2).encode('utf-8')) + 1
+        yield(line)
+
+
+# Spellcheck a whole book, writing the suggestions to outfile as each chunk of lines is checked, in one of the formats of suggestions.py (guiguts, jsonl or binary). Returns the number of lines & suggestions written.
+def check_book(path, outfile, options, workers = 1, progress = None, merge_split = None, format = "guiguts"):
+    starts = deque()
+    q = _line_offsets(numbered_lines(path, merge_split), starts)
+    
+    n_lines = 0
+    n_suggestions = 0
+    with open_writer(outfile, format) as out:
+        for n, result in run_chunks(q, options, workers = workers):
+            # offsets from the start of each line --> from the start of the book
+            for s in result:
+                s.offset += starts[s.line - n_lines - 1]
+            for x in range(n):
+                starts.popleft()
+            n_suggestions += out.write(result)
+            n_lines += n
+            if progress is not None:
+                progress.update(n)
+    return(n_lines, n_suggestions)
 
 
 def main():
@@ -29,54 +297,48 @@ def main():
     parser.add_argument('-misspells', action ='store_const', const = True,
                         default = False, dest ='misspells',
                          help ="option to return all of the words OCRfixr didn't recognize.")
+    parser.add_argument('--batch-size', type = int, default = None, dest ='batch_size',
+                         help ="option to run BERT over the masks from many lines at once, in batches of this size. Much faster on CPU-only machines.")
+    parser.add_argument('--workers', type = int, default = 1, dest ='workers',
+                         help ="option to spread the spellcheck across this many processes. Each one loads its own copy of the model.")
+    parser.add_argument('--cache', default = None, dest ='cache',
+                         help ="option to keep BERT predictions in this file, so repeated text (in this book, or the next one) skips the model.")
+    parser.add_argument('--pack-tokens', type = int, default = None, dest ='pack_tokens',
+                         help ="option to give BERT whole chunks of lines as context, packed up to this many model tokens (at most 512 for BERT), instead of one line at a time.")
+    parser.add_argument('--overlap', type = int, default = 0, dest ='overlap',
+                         help ="with --pack-tokens, how many tokens from the end of each chunk to repeat at the start of the next, as context.")
+    parser.add_argument('--profile', default = None, dest ='profile',
+                         help ="option to time each stage of the run (plus cache hit rates etc.), print a summary at the end, and write the full report to this JSON file.")
+    parser.add_argument('--format', default = 'guiguts', choices = ['guiguts', 'jsonl', 'binary'], dest ='format',
+                         help ="option to write the suggestions as GuiGuts text (the default), JSON lines, or compact binary records - every place each fix turns up, with its line, column, byte offset, the stage that found it & BERT's score (see ocrfixr/suggestions.py).")
+    parser.add_argument('--incremental', default = None, dest ='incremental',
+                         help ="option to keep each line's suggestions in this state file, so the next run (with the same file) only re-checks the lines that changed.")
     
 
     args = parser.parse_args()
     
     ### Read in file ============================================================
-    # read in full file to check if the text has split words (which will cause false misreads to show up)
+    # check if the text has split words (which will cause false misreads to show up)
     # -- do this first to throw error early if file is invalid
+    # The book is streamed from disk at every stage below, so even very large files never have to fit in memory
     print("---- Loading text....")
-    Full_Book = open(sys.argv[1], 'r',encoding='utf-8').read()
-    
-    if len(re.findall("[A-z]-\n", Full_Book)) > 30:
+    merge_split = has_split_words(args.text)
+    if merge_split:
         print("---- This file appears to have words split across lines, which can cause issues with the spellchecker")
         print("---- Merging split words back together...")
-        from ocrfixr import unsplit
-        fixed_text = unsplit(Full_Book).fix()
-        data = fixed_text.split("\n")
-    else:
-        data = Full_Book.split("\n")
-    
-        
-    from ocrfixr import spellcheck
     
-    # Add line numbers
-    q = []
-    for (number, line) in enumerate(data):
-        q.append('%d:  %s' % (number + 1, line))
-        
         
-    # Define misspells counter function
-    # Used by both -Warp10 and -misspells flags
-    def ct_misspells(text, min_len):
-        M = spellcheck(text)._LIST_MISREADS()
-        M = [word for word in M if len(word) > min_len]
-        counts = dict(Counter(M))
-        counts = dict(sorted(counts.items(), key=lambda item: -item[1]))
-        return(counts)
-
 
     ### Misspells Option ============================================================
     # Have OCRfixr just output a list of all the words it checked (ranked by frequency), rather than spellchecking
     # This is intended as a diagnostic measure to see if OCRfixr is missing a large number of suggestions for valid (fixable) words
 
     if args.misspells == True:
-        counts = ct_misspells(Full_Book,0)
+        counts = ct_misspells(args.text,0)
         with open(args.outfile,'w',encoding='utf-8') as f:  
             for key, value in counts.items():  
                 f.write('%s:%s\n' % (key, value))
-        print("---- File has been written to " + sys.argv[2])
+        print("---- File has been written to " + args.outfile)
 
         # for this path, don't continue any further
         exit()
@@ -89,8 +351,7 @@ def main():
     
     if args.Warp10 == True:
         print("---- Engaging Warp10!")
-        counts = ct_misspells(Full_Book,3)
-        over_ten = {key:value for (key,value) in counts.items() if value >= 10}
+        over_ten = frequent_misspells(args.text)
         
         print("---- To speed things up, OCRfixr will ignore the following unrecognized words that popped up 10 or more times in the text:")
         if len(over_ten) == 0:
@@ -113,21 +374,30 @@ def main():
     ### Run spellcheck on each line ==================================================
     print("---- Running spellcheck....")
     
-    suggestions = []
-    for i in tqdm(q):
-        fixes = spellcheck(i, changes_by_paragraph = "T", return_context = context_fl, ignore_words = ignored_words).fix()
-        if fixes == "NOTE: No changes made to text":
-            pass
+    if args.cache is not None:
+        # set before any spellcheck runs, so this process and every worker picks it up when the cache is first loaded
+        os.environ["OCRFIXR_BERT_CACHE"] = args.cache
+    
+    options = {"context_fl": context_fl, "ignored_words": ignored_words, "batch_size": args.batch_size, "pack_tokens": args.pack_tokens, "overlap": args.overlap}
+    
+    if args.profile is not None:
+        profiling.start()
+    
+    # suggestions are written out as soon as each chunk of lines is checked
+    with tqdm(unit = " lines") as progress:
+        if args.incremental is not None:
+            from ocrfixr.incremental import check_incremental
+            n_lines, n_suggestions, n_checked = check_incremental(numbered_lines(args.text, merge_split), args.outfile, options, args.incremental, workers = args.workers, progress = progress, format = args.format)
         else:
-            for x in fixes.split("\n"):
-                suggestions.append(''.join((' '.join(re.findall('^[0-9]+:', i)), x)))
+            check_book(args.text, args.outfile, options, workers = args.workers, progress = progress, merge_split = merge_split, format = args.format)
     
-
-   ### Output file =================================================================
-    file=open(args.outfile,'w',encoding='utf-8')
-    for items in suggestions:
-        file.writelines(items+'\n')
-    file.close()
+    if args.incremental is not None:
+        print("---- Re-checked {:,} of {:,} lines (the rest were unchanged since the last run)".format(n_checked, n_lines))
+        print("---- State has been written to " + args.incremental)
+    print("---- File has been written to " + args.outfile)
     
-    print("---- File has been written to " + sys.argv[2])
-
+    if args.profile is not None:
+        report = profiling.stop()
+        report.write(args.profile)
+        print(report.table())
+        print("---- Profile has been written to " + args.profile)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Long-running HTTP spellcheck service, with a warm model shared by every request."""
+import json
+import time
+import argparse
+import threading
+import http.client
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import resources
+from . import batcher
+
+
+# Starting the CLI for every page pays seconds of model load each time. The server loads BERT & the symspell index once, then answers requests for as long as it runs.
+# Requests are handled on their own threads, and their BERT calls are merged into shared batches by a MicroBatcher (see batcher.py).
+#
+# API (JSON in, JSON out):
+#   POST /spellcheck  {"text": "...", plus any of the spellcheck options below}  -->  {"result": <spellcheck(...).fix()>, "latency_ms": ...}
+#                     with return_fixes "T", the fixes come back as a list of [misread, fix, count] (see json_fixes)
+#   POST /unsplit     {"text": "...", "return_fixes": "T"|"F"}                   -->  {"result": <unsplit(...).fix()>, "latency_ms": ...}
+#   GET  /health      -->  {"status": "ok"}
+#   GET  /stats       -->  request latencies, batcher & cache stats
+# Every response also carries its latency in the X-OCRfixr-Latency-Ms header.
+
+# spellcheck options a request may set (interactive mode needs a terminal, so it is not offered)
+SPELLCHECK_OPTIONS = {"changes_by_paragraph", "return_fixes", "ignore_words", "common_scannos", "top_k", "return_context", "suggest_unsplit"}
+UNSPLIT_OPTIONS = {"return_fixes"}
+
+
+class RequestError(Exception):
+    pass
+
+
+# Rolling latency figures for the most recent requests to each endpoint
+class LatencyStats:
+    def __init__(self, keep = 1000):
+        self.keep = keep
+        self.counts = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, ms):
+        with self._lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            self._recent.setdefault(endpoint, deque(maxlen = self.keep)).append(ms)
+
+    def summary(self):
+        with self._lock:
+            recent = {k: sorted(v) for k, v in self._recent.items()}
+        summary = {}
+        for endpoint, ms in recent.items():
+            summary[endpoint] = {"requests": self.counts[endpoint],
+                                 "mean_ms": round(sum(ms) / len(ms), 2),
+                                 "p50_ms": round(ms[len(ms) // 2], 2),
+                                 "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+                                 "max_ms": round(ms[-1], 2)}
+        return(summary)
+
+
+
+def _options(body, allowed):
+    if not isinstance(body, dict) or not isinstance(body.get("text"), str):
+        raise RequestError('request body must be a JSON object with a "text" string')
+    unknown = set(body) - allowed - {"text"}
+    if unknown:
+        raise RequestError("unknown options: " + ", ".join(sorted(unknown)))
+    return({k: v for k, v in body.items() if k != "text"})
+
+
+# spellcheck's fixes are counted by (misread, fix) pairs, which can't be JSON object keys - so they are sent as a list of [misread, fix, count], most common first
+def json_fixes(result):
+    if isinstance(result, list) and len(result) == 2 and isinstance(result[1], dict):
+        return([result[0], [[misread, fix, count] for (misread, fix), count in result[1].items()]])
+    return(result)
+
+
+def run_spellcheck(body):
+    from .spellcheck import spellcheck
+    options = _options(body, SPELLCHECK_OPTIONS)
+    return(json_fixes(spellcheck(body["text"], **options).fix()))
+
+
+def run_unsplit(body):
+    from .unsplit import unsplit
+    options = _options(body, UNSPLIT_OPTIONS)
+    return(unsplit(body["text"], **options).fix())
+
+
+ENDPOINTS = {"/spellcheck": run_spellcheck, "/unsplit": run_unsplit}
+
+
+
+class OCRfixrHandler(BaseHTTPRequestHandler):
+    server_version = "OCRfixr"
+    protocol_version = "HTTP/1.1"
+
+    def _encode(self, status, payload, started):
+        ms = (time.perf_counter() - started) * 1000
+        timed = isinstance(payload, dict) and status == 200 and self.path in ENDPOINTS
+        if timed:
+            payload["latency_ms"] = round(ms, 2)
+        data = json.dumps(payload).encode("utf-8")
+        if timed:
+            self.server.latency.add(self.path, ms)
+        return(data, ms)
+
+    def _send(self, status, payload, started):
+        self._write(status, *self._encode(status, payload, started))
+
+    def _write(self, status, data, ms):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("X-OCRfixr-Latency-Ms", "%.2f" % ms)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        if self.path == "/health":
+            self._send(200, {"status": "ok"}, started)
+        elif self.path == "/stats":
+            self._send(200, self.server.stats(), started)
+        else:
+            self._send(404, {"error": "not found: " + self.path}, started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        endpoint = ENDPOINTS.get(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if endpoint is None:
+            self._send(404, {"error": "not found: " + self.path}, started)
+            return
+        # only a body that isn't JSON, or asks for something spellcheck doesn't offer, is the request's fault - anything else that goes wrong is the server's (ie. a bad OCRFIXR_BACKEND)
+        try:
+            body = json.loads(raw.decode("utf-8"))
+            result = endpoint(body)
+        except (json.JSONDecodeError, UnicodeDecodeError, RequestError) as e:
+            self._send(400, {"error": str(e)}, started)
+            return
+        except Exception as e:
+            self._send(500, {"error": "{}: {}".format(type(e).__name__, e)}, started)
+            return
+        # a result that can't be sent as JSON is the server's fault, not the request's
+        try:
+            data, ms = self._encode(200, {"result": result}, started)
+        except Exception as e:
+            self._send(500, {"error": "{}: {}".format(type(e).__name__, e)}, started)
+            return
+        self._write(200, data, ms)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+
+class OCRfixrServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, batch_window = 0.01, max_batch = 32, preload = True, quiet = False):
+        super().__init__(address, OCRfixrHandler)
+        self.quiet = quiet
+        self.latency = LatencyStats()
+        # load everything up front, so the first request doesn't pay for it
+        if preload:
+            resources.preload()
+        self.batcher = batcher.install(max_batch = max_batch, max_wait = batch_window)
+
+    def stats(self):
+        from .spellcheck import cache_stats
+        return({"requests": self.latency.summary(), "batcher": self.batcher.stats(), "caches": cache_stats()})
+
+    def server_close(self):
+        super().server_close()
+        # hand the plain unmasker back, for anything else running in this process
+        batcher.uninstall(self.batcher)
+
+
+
+# In-process client, for trying the server out (or testing it) without a separate process: runs the server on a background thread, on a free local port
+#   with TestClient() as client:
+#       client.post("/spellcheck", {"text": "The birds flevv down"})
+class TestClient:
+    __test__ = False
+
+    def __init__(self, server = None, **kwargs):
+        self.server = server or OCRfixrServer(("127.0.0.1", 0), quiet = True, **kwargs)
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(target = self.server.serve_forever, daemon = True)
+        self._thread.start()
+
+    def request(self, method, path, body = None):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout = 300)
+        try:
+            data = json.dumps(body).encode("utf-8") if body is not None else None
+            conn.request(method, path, body = data, headers = {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return(response.status, json.loads(response.read().decode("utf-8")))
+        finally:
+            conn.close()
+
+    def post(self, path, body):
+        return(self.request("POST", path, body))
+
+    def get(self, path):
+        return(self.request("GET", path))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(prog = 'ocrfixr-server',
+                                     description = 'Runs OCRfixr as a local JSON spellcheck service, with the model kept loaded between requests.')
+    parser.add_argument('--host', default = '127.0.0.1', dest = 'host',
+                        help = 'address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type = int, default = 8080, dest = 'port',
+                        help = 'port to listen on (default: 8080)')
+    parser.add_argument('--batch-window-ms', type = float, default = 10, dest = 'batch_window',
+                        help = 'how long to wait for other requests to share a BERT batch with (default: 10ms). 0 turns batching across requests off.')
+    parser.add_argument('--max-batch', type = int, default = 32, dest = 'max_batch',
+                        help = 'largest BERT batch to run at once (default: 32)')
+    parser.add_argument('--quiet', action = 'store_const', const = True, default = False, dest = 'quiet',
+                        help = 'option to not log each request')
+    args = parser.parse_args()
+
+    print("---- Loading model & dictionaries....")
+    server = OCRfixrServer((args.host, args.port), batch_window = args.batch_window / 1000, max_batch = args.max_batch, quiet = args.quiet)
+    print("---- Listening on http://{}:{}".format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
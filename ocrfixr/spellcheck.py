@@ -1,57 +1,45 @@
 """Main module."""
-from transformers import logging
-logging.set_verbosity_error()
 import re
 import string
-import ast
-import importlib_resources
-from collections import Counter
-from transformers import pipeline
-from symspellpy import SymSpell, Verbosity
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from symspellpy import Verbosity
 from metaphone import doublemetaphone
-import pkg_resources
+from . import resources, profiling
+from .replace import multi_replace, MultiReplacer
+from .chunker import split_text
+from .suggestions import Suggestion
 
 
-### Load in project resources
-# Full word list
-ocrfixr = importlib_resources.files("ocrfixr")
-word_set = (ocrfixr / "data" / "SCOWL_70.txt").read_text(encoding='utf-8').split()
-word_set = set(word_set)
+# Project resources (word lists, scanno dicts, symspell & BERT) are loaded on first use - see resources.py
+# These names are kept so that ocrfixr.spellcheck.word_set etc. still work
+_RESOURCE_NAMES = {"word_set", "ignore_set_from_pkg", "common_scannos", "common", "stealth_scannos", "stealth", "ignore_suggestions", "sym_spell", "unmasker"}
 
-# List of words NOT in SCOWL 70 that we should ignore anyways
-ignore_misreads = (ocrfixr / "data" / "Ignore_These_Misspells.txt").read_text(encoding='utf-8').split()
-ignore_set_from_pkg = set(ignore_misreads)
+def __getattr__(name):
+    if name in _RESOURCE_NAMES:
+        return(resources.get(name))
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
-# dict of common scannos to check for (bypasses the context check, since these are clear mappings)
-common_scannos = (ocrfixr / "data" / "Scannos_Common.txt").read_text(encoding='utf-8')
-common_scannos = ast.literal_eval(common_scannos)
-common = set(common_scannos)
 
-# dict of specifically tricky scannos to check for - misspellings that create real words (arid - and)
-stealth_scannos = (ocrfixr / "data" / "Scannos_Stealth.txt").read_text(encoding='utf-8')
-stealth_scannos = ast.literal_eval(stealth_scannos)
-stealth = set(stealth_scannos)
-
-# dict of OCRfixr suggestions that are known to be bad. This list prevents them from ever being suggested.
-ignore_suggestions = (ocrfixr / "data" / "Ignore_These_Suggestions.txt").read_text(encoding='utf-8')
-ignore_suggestions = ast.literal_eval(ignore_suggestions)
-#ignore_suggestions = set(ignore_suggestions)
-
-# setup symspell spellchecker parameters
-sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
-dictionary_path = pkg_resources.resource_filename(
-    "symspellpy", "frequency_dictionary_en_82_765.txt")
-# term_index is the column of the term and count_index is the
-# column of the term frequency
-sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
-
-
-# Set BERT to look for the 30 most likely words in position of the misspelled word
-unmasker = pipeline('fill-mask', model='bert-base-uncased', top_k=30)
+# Filters for _LIST_MISREADS, compiled into one pattern so that each token is classified with a single match:
+# Drop hyphenated words, those with apostrophes (which may be intentional slang), words that are just numbers, and words broken across lines. Note: This does risk missing valid misreads, but our goal is to avoid making "bad" corrections above all else
+# Also, drop all items with leading caps (ie. proper nouns)
+# Also, drop all words with trailing numbers flanked by punctuation, indicating a footnote reference (money.4, item[1]) rather than a misspelling
+# Also, drop any 1-character "words" 
+_KEEP_TOKEN = re.compile(r"(?!.*-|.*'|.*\.{3,}|.*’|[0-9])"  # no hyphens, apostrophes, ellipses, or leading numbers
+                         r"(?=[^A-Z]{2,})"                   # no leading caps
+                         r"(?!.*[0-9]{1,}[^A-z]?$)"          # no footnotes
+                         r"(?![xlcviXLCVI.:,-;]+$)"          # no roman numerals
+                         r"(?!.*eth|.*est$)"                 # no archaic -eth/-est endings
+                         r"(?!.*</?[a-z]>)"                  # no formatting tags
+                         r"(?!.*\)|.*\])")                   # no list items
+_ALL_NUMS = re.compile('^[0-9]{1,}$')
+_TOKEN_SPLIT = re.compile("[ \n]")
+_PUNCTUATION = string.punctuation+"”“’‘"
 
 
 class spellcheck:                       
-    def __init__(self, text, changes_by_paragraph = "F", return_fixes = "F", ignore_words = None, interactive = "F", common_scannos = "T", top_k = 15, return_context = "F", suggest_unsplit = "T"):
+    def __init__(self, text, changes_by_paragraph = "F", return_fixes = "F", ignore_words = None, interactive = "F", common_scannos = "T", top_k = 15, return_context = "F", suggest_unsplit = "T", batch_size = None, score_candidates = "F", context_window = None, multi_mask = None, index = None):
         self.text = text
         self.changes_by_paragraph = changes_by_paragraph
         self.return_fixes = return_fixes
@@ -61,6 +49,22 @@ class spellcheck:
         self.top_k = top_k
         self.return_context = return_context
         self.suggest_unsplit = suggest_unsplit
+        # None = run BERT paragraph by paragraph. Set to an int to gather every mask in the text first, and run them through BERT in batches of that size
+        self.batch_size = batch_size
+        # "T" = instead of ranking BERT's top words over the whole vocab, read off the rank & score of just the symspell candidates (see _SCORE_CANDIDATES). Same fixes, plus candidate_scores
+        self.score_candidates = score_candidates
+        self.candidate_scores = {}
+        # None = BERT sees the whole paragraph around each [MASK]. Set to an int to only send that many words either side of it (see _WINDOW)
+        self.context_window = context_window
+        # None = one [MASK] per BERT input. Set to an int to [MASK] several misreads in the same input, as long as there are at least that many words between them (see _GROUP_MASKS)
+        self.multi_mask = multi_mask
+        # MisreadIndex shared by every paragraph of the document (fix() makes one if none is given), so each unique token & misread is only sorted out once
+        self.index = index
+        # once checked: the {misread: fix} dict, and where each fix came from - {misread: (stage, confidence)}, see suggestions.py
+        self.fixes = {}
+        self.fix_sources = {}
+        # where this paragraph starts in the text it was split from
+        self.start = 0
 
 
         
@@ -69,46 +73,17 @@ class spellcheck:
     
     def _SPLIT_PARAGRAPHS(self, text):
         # Separate string into paragraphs - this keeps local context for BERT, just in smaller chunks 
-        # If needed, split up excessively long paragraphs - BERT model errors out when >512 words, so break long paragraphs at 500 words
         tokens = re.findall('[^\n]+\n{0,}|(?:\w+\s+[^\n]){500}',text)
-        return(tokens)
+        # If needed, split up excessively long paragraphs between words - BERT errors out past 512 tokens (WordPiece pieces, not words, so OCR junk uses up the limit much faster), see chunker.py
+        return([piece for paragraph in tokens for piece in split_text(paragraph)])
 
     # Find all mispelled words in a passage.
     # Note: OCRfixr ignores all words with leading uppercasing (including ALL CAPS), as these are assumed to be proper nouns, which fall outside of the scope of what a dictionary-based approach can accomplish.
+    @profiling.stage("spellcheck.list_misreads")
     def _LIST_MISREADS(self):
-        tokens = re.split("[ \n]", self.text)
-        tokens = [l.strip() for l in tokens] 
-        
-        # Drop hyphenated words, those with apostrophes (which may be intentional slang), words that are just numbers, and words broken across lines. Note: This does risk missing valid misreads, but our goal is to avoid making "bad" corrections above all else
-        # Also, drop all items with leading caps (ie. proper nouns)
-        # Also, drop all words with trailing numbers flanked by punctuation, indicating a footnote reference (money.4, item[1]) rather than a misspelling
-        # Also, drop any 1-character "words" 
-
-        no_hyphens = re.compile(".*-.*|.*'.*|.*\.{3,}.*|.*’.*|[0-9]+")
-        no_caps = re.compile('[^A-Z]{2,}')
-        no_footnotes = re.compile('.*[0-9]{1,}[^A-z]?$')
-        no_roman_nums = re.compile('[xlcviXLCVI.:,-;]+$')
-        no_eth_endings = re.compile('.*eth|.*est$')
-        no_format_tags = re.compile('</?[a-z]>.*|.*</?[a-z]>')
-        no_list_items = re.compile('.*\\)|.*\\]')
-        all_nums = re.compile('^[0-9]{1,}$')
-
-        words = [x for x in tokens if not no_hyphens.match(x) and no_caps.match(x) and not no_footnotes.match(x) and not no_roman_nums.match(x) and not no_eth_endings.match(x) and not no_format_tags.match(x) and not no_list_items.match(x)]
-
-        # then, remove punct from each remaining token (such as trailing commas, periods, quotations ('' & ""), but KEEPING contractions). 
-        no_punctuation = [l.strip(string.punctuation+"”“’‘") for l in words]
-        words_to_check = [x for x in no_punctuation if len(x) > 1 and not all_nums.match(x)]
-        
-        
-        # if a word is not in the SCOWL 70 word list, it is assumed to be a misspelling.
-        unrecognized = []
-        for i in words_to_check:
-            if i not in word_set:
-                unrecognized.append(i)
-        
+        unrecognized, scannos, L1 = self._SCAN_TOKENS()
         
         # throw away any paragraphs where > 30% of the words are unrecognized - this makes context-generation spotty AND likely indicates a messy post-script/footnote, or even another language. This limits trigger-happy changes to messy text.
-        L1 = len(tokens)
         L0 = len(unrecognized)
         if L0/L1 > 0.30 and L1 > 10:
             unrecognized = []
@@ -121,23 +96,59 @@ class spellcheck:
         # this contains a small set of problematic terms that aren't "words" (example: th, as in "7 th")
         # as well as the 2,000 most-common words in the following languages: Latin, Greek, French, German, Spanish
         ignore_set_from_user = set(self.ignore_words)
+        ignore_set_from_pkg = resources.get("ignore_set_from_pkg")
         
         misread = []
         for i in unrecognized:
             if i not in ignore_set_from_pkg and i not in ignore_set_from_user:
                 misread.append(i)
 
-        # add scannos to misreads, if option is selected        
+        # add scannos to misreads, if option is selected
+        # common scannos are only added once (unless already flagged above), stealth scannos are added every time they appear
         if self.common_scannos == "T":
-            # add in common_scannos with leading caps (which were dropped in the token processing step)
-            # add in stealth_scanno candidates (correctly spelled words that match entries in the stealth_scanno dict) - these were also dropped in the token processing step
-            for i in tokens:
-                if i not in misread and i in common or i in stealth:
+            stealth = resources.get("stealth")
+            seen = set(misread)
+            for i in scannos:
+                if i in stealth or i not in seen:
                     misread.append(i)
-            
+                    seen.add(i)
+        
+        profiling.record("misreads_per_paragraph", len(misread))
         return(misread)
 
 
+    # Single pass over the tokens of the passage (split on spaces & newlines). Returns:
+    # - words that pass all of the filters (_KEEP_TOKEN), have their punctuation stripped, and are not in the SCOWL 70 word list
+    # - common/stealth scanno candidates, in order - these are checked against every token, filtered or not, so leading caps are kept (Tlie --> The)
+    # - the number of tokens
+    def _SCAN_TOKENS(self):
+        if self.index is not None:
+            return(self.index.scan(self.text, self.common_scannos == "T"))
+        word_set = resources.get("word_set")
+        check_scannos = self.common_scannos == "T"
+        if check_scannos:
+            common = resources.get("common")
+            stealth = resources.get("stealth")
+        keep_token = _KEEP_TOKEN.match
+        all_nums = _ALL_NUMS.match
+        
+        unrecognized = []
+        scannos = []
+        L1 = 0
+        for token in _TOKEN_SPLIT.split(self.text):
+            token = token.strip()
+            L1 += 1
+            if check_scannos and (token in common or token in stealth):
+                scannos.append(token)
+            if keep_token(token):
+                # remove punct from each remaining token (such as trailing commas, periods, quotations ('' & ""), but KEEPING contractions). 
+                word = token.strip(_PUNCTUATION)
+                # if a word is not in the SCOWL 70 word list, it is assumed to be a misspelling.
+                if len(word) > 1 and word not in word_set and not all_nums(word):
+                    unrecognized.append(word)
+        return(unrecognized, scannos, L1)
+
+
     def _CT_MISREADS(self):
         all_misreads = Counter(self._LIST_MISREADS())
         multi_misreads = { k: v for k, v in all_misreads.items() if v > 2 }
@@ -145,8 +156,16 @@ class spellcheck:
         
     
     # Return the list of possible spell-check options. These will be used to look for matches against BERT context suggestions
+    # Suggestions only depend on the misread itself, so they are cached across the whole process - symspell only runs once per unique misread
+    @profiling.stage("spellcheck.symspell")
     def __SUGGEST_SPELLCHECK(self, text):
+        cache = resources.get("symspell_cache")
+        cached = cache.get(text)
+        if cached is not None:
+            return(list(cached))
+        
         suggested_words = []
+        sym_spell = resources.get("sym_spell")
         
         # Confirm word isn't a mashup ("anhour" --> "an hour")
         Num_spaces = []
@@ -168,15 +187,103 @@ class spellcheck:
             if "," in text:
                 mw = re.sub(" ", ", ", mw)
             suggested_words.append(mw)
-            
+        
+        cache.put(text, tuple(suggested_words))
         return(suggested_words)
         
     
-    # Suggest a set of the 15 words that best fit given the context of the misread    
-    def __SUGGEST_BERT(self, text, number_to_return = 15):
-        context_suggest = unmasker(text)
-        suggested_words = [x.get("token_str") for x in context_suggest][:number_to_return]
-        return(suggested_words)
+    # Suggest a set of the 15 words that best fit given the context of each misread.
+    # Takes the entries built by _PREPARE_MASKS and fills in their "bert" suggestions. All masked texts are sent to the unmasker in one call, which pads and runs them through BERT in groups of batch_size.
+    # Predictions are cached by masked text (see cache.py), so repeated lines (running headers, the same scanno in the same phrase) only go through BERT once
+    @profiling.stage("spellcheck.bert")
+    def _SUGGEST_BERT(self, to_check):
+        texts = [x.get("group_text", x["masked_text"]) for x in to_check]
+        if len(texts) == 0:
+            return(to_check)
+        if self.score_candidates == "T":
+            return(self._SCORE_CANDIDATES(to_check))
+        
+        cache = resources.get("bert_cache")
+        found = cache.get_many(texts)
+        missing = list(dict.fromkeys(x for x in texts if x not in found))
+        
+        if len(missing) > 0:
+            profiling.record("bert_texts_per_call", len(missing))
+            with profiling.timer("spellcheck.unmasker"):
+                context_suggest = resources.get("unmasker")(missing, batch_size = self.batch_size or 1)
+            # the pipeline unwraps single-item lists, so wrap it back up
+            if len(missing) == 1:
+                context_suggest = [context_suggest]
+            
+            predicted = {}
+            for text, suggest in zip(missing, context_suggest):
+                # texts with several [MASK]s get back one list of suggestions per mask
+                if len(suggest) > 0 and isinstance(suggest[0], list):
+                    predicted[text] = [[x.get("token_str") for x in mask] for mask in suggest]
+                else:
+                    predicted[text] = [x.get("token_str") for x in suggest]
+            cache.put_many(predicted)
+            found.update(predicted)
+            
+        for entry in to_check:
+            if "group_text" in entry:
+                entry["bert"] = found[entry["group_text"]][entry["mask_index"]][:self.top_k]
+            else:
+                entry["bert"] = found[entry["masked_text"]][:self.top_k]
+        return(to_check)
+    
+    
+    # The overlap check in _FIND_REPLACEMENTS only asks whether each symspell candidate is among BERT's top_k words. So rather than ranking the whole vocab & decoding the top 30, have the model score just the words that can matter, straight from the [MASK] logits (see backends.py):
+    # - the symspell candidates, plus the second word of a mashup ("an hour" --> "hour"), plus a stealth scanno itself (arid)
+    # "bert" is then filled in with the candidates that rank inside the top_k, best first, so every decision downstream is the same as with the full top_k list
+    # Each entry also keeps its {word: (rank, score)}, so callers can set their own confidence thresholds without running the model again
+    def _SCORE_CANDIDATES(self, to_check):
+        top_k = min(self.top_k, resources.BERT_TOP_K)
+        words = []
+        for entry in to_check:
+            w = list(entry["SC"])
+            if entry["type"] == "stealth":
+                w.append(entry["misread"])
+            elif entry["type"] == "mashup":
+                w.extend(x[len(entry["prefix"]) + 1:] for x in entry["SC"] if x.startswith(entry["prefix"] + " "))
+            words.append(set(w))
+        
+        # masks that share an input (see _GROUP_MASKS) are all scored against every word wanted for that input
+        group_words = {}
+        for entry, w in zip(to_check, words):
+            if "group_text" in entry:
+                group_words.setdefault(entry["group_text"], set()).update(w)
+        words = [sorted(group_words[x["group_text"]] if "group_text" in x else w) for x, w in zip(to_check, words)]
+        texts = [x.get("group_text", x["masked_text"]) for x in to_check]
+        
+        # keyed on the masked text & the words scored, in the same cache as the top_k predictions
+        keys = [t + "\x00" + "\x00".join(w) for t, w in zip(texts, words)]
+        cache = resources.get("bert_cache")
+        found = cache.get_many(keys)
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        
+        if len(missing) > 0:
+            to_score = {k: (t, w) for k, t, w in zip(keys, texts, words) if k in missing}
+            profiling.record("bert_texts_per_call", len(missing))
+            with profiling.timer("spellcheck.unmasker"):
+                scored = resources.get("unmasker").score([to_score[k][0] for k in missing], [to_score[k][1] for k in missing], batch_size = self.batch_size or 1)
+            predicted = {}
+            for k, s in zip(missing, scored):
+                if isinstance(s, list):
+                    predicted[k] = [{w: list(v) for w, v in mask.items()} for mask in s]
+                else:
+                    predicted[k] = {w: list(v) for w, v in s.items()}
+            cache.put_many(predicted)
+            found.update(predicted)
+        
+        for entry, key in zip(to_check, keys):
+            scores = found[key]
+            if "group_text" in entry:
+                scores = scores[entry["mask_index"]]
+            entry["scores"] = scores
+            ranked = sorted((v[0], w) for w, v in scores.items() if v[0] is not None and v[0] < top_k)
+            entry["bert"] = [w for rank, w in ranked]
+        return(to_check)
     
     
     # Ensure that list items are correctly converted down without the [] 
@@ -192,18 +299,15 @@ class spellcheck:
     
     
     # note that multi-replace will replace ALL instances of a mispell, not just the first one (ie. spell-check is NOT instance-specific to each mispell, it is misspell-specific). Therefore, it should be run on small batches of larger texts to limit potential issues.
+    # All fixes are applied in a single pass over the text (see replace.py)
+    @profiling.stage("spellcheck.replace")
     def _MULTI_REPLACE(self, fixes):
         # if there are no fixes, just return the original text
         if len(fixes) == 0 :
             return(self.text)
         else:
-        # otherwise, replace all dict entries with the approved replacement word
-            text_corrected = self.text
-            for i, j in fixes.items():
-                # Only match and replace whole words
-                pattern = "\\b" + re.escape(i) + "\\b"
-                text_corrected = re.sub(pattern, j, text_corrected)
-            return(text_corrected)
+        # otherwise, replace all dict entries with the approved replacement word. Only match and replace whole words
+            return(multi_replace(self.text, fixes, word_boundary = True))
     
     
     def ___INSERT_NEWLINES(self, string):
@@ -264,86 +368,198 @@ class spellcheck:
         root.mainloop()
 
         
-    # Creates a dict of valid replacements for misspellings. If bert and symspell do not have a match for a given misspelling, it makes no changes to the word.
-    # When common_scannos is activated, that limited list of words bypass the spellcheck/context check
-    # Note: find-replace is not instance-specific, it is paragraph specific..."yov" will be replaced with "you" in all instances found in that section of text. It would be rare, but this may cause issues when a repeated scanno is valid & not valid within the same paragraph
-    def _FIND_REPLACEMENTS(self, misreads):
-        SC = [] 
-        bert = []
+    # How a misread is handled, which only depends on the misread itself (and the common_scannos & suggest_unsplit settings):
+    #   ("common", fix) / ("split", fix)       - fixed without a BERT check
+    #   ("stealth", SC) / ("mask", SC)          - [MASK] the word, and compare BERT's suggestions to SC
+    #   ("mashup", SC, first word)              - put in the first word of the phrase, and [MASK] the second
+    #   ("skip",)                               - nothing to suggest
+    def _PLAN_MISREAD(self, i):
+        word_set = resources.get("word_set")
+        
+        # if misread is a common scanno, then add that entry to a separate dict that will be merged back in later. This bypasses the BERT check step.
+        if self.common_scannos == "T" and i in resources.get("common"):
+            return(("common", resources.get("common_scannos")[i]))
+        
+        # for stealth scannos - these are valid (yet incorrect) words. So, instead of SUGGEST_SPELLCHECK (which would return the same word supplied), take the value from the stealth_scanno dict, which is the desired word to check for in BERT context (arid --> and)
+        if self.common_scannos == "T" and i in resources.get("stealth"):
+            return(("stealth", tuple(resources.get("stealth_scannos").get(i).split(" "))))
+        
+        # for all other unrecognized words, get all spellcheck suggestions from symspell
+        spellcheck = self.__SUGGEST_SPELLCHECK(i)
+        # Make sure there is a valid spellcheck suggestion (symspell returns the original string if not)
+        if spellcheck == i:
+            # if no spellcheck suggestion given, don't bother checking BERT context - it won't get used
+            return(("skip",))
+        
+        # For multi-word phrases....
+        if self.suggest_unsplit == "T" and len(spellcheck) == 1 and str(spellcheck).count(' ') == 1:
+            
+            # if the phrase was already separated by a comma or period ("shall.cultivate"), skip the BERT context check
+            # just confirm that both word halves are valid
+            if "." in i or "," in i:
+                mw = ''.join(spellcheck)                           
+                fw = re.findall("^[^\s,]+", mw).pop()
+                sw = re.findall("[^\s]+$", mw).pop()
+                
+                if fw in word_set and sw in word_set:
+                    # if first letter after period split is uppercased, retain it and add a period ('ended.He' --> 'ended. He')
+                    if len(re.findall("\.{1,}([A-Z][a-z]+)", i)) > 0:
+                        fw = fw + '. '
+                        sw = str.title(sw)
+                        mw = fw + sw
+                    return(("split", mw))
+                return(("skip",))
+            
+            # If symspell has to pick an arbitrary cutoff between the words ("anhour"), check the suggestion using BERT context
+            # If the second word fits, the two word phrase will be accepted as a valid correction
+            else:
+                mw = ''.join(spellcheck)
+                fw = re.findall("^[^\s]+", mw).pop()
+                return(("mashup", tuple(spellcheck), fw))
+        
+        # otherwise, just mask the misspelled word for BERT context check, which will be compared against symspell
+        return(("mask", tuple(spellcheck)))
+    
+    
+    # Sort each misread into the path it will take, and collect its symspell suggestions. No BERT calls are made here.
+    # Every misread that needs a context check gets an entry holding its [MASK]ed text, so that the masks for a whole document can be gathered up and run through BERT together (see _SUGGEST_BERT)
+    @profiling.stage("spellcheck.prepare_masks")
+    def _PREPARE_MASKS(self, misreads):
+        to_check = []
         punct_split_fixes = {}
         common_scanno_fixes = {}
         
-        # for each misread, get all spellcheck suggestions
         for i in misreads:
-            # if misread is a common scanno, then add that entry to a separate dict that will be merged back in later. This bypasses the BERT check step.
-            if self.common_scannos == "T" and i in common:
-                add_scanno = dict((k, v) for k, v in common_scannos.items() if k == i)
-                common_scanno_fixes.update(add_scanno)
+            # what to do with a misread doesn't depend on where it is - with a document index, that is only worked out once per unique misread
+            if self.index is None:
+                plan = self._PLAN_MISREAD(i)
+            else:
+                plan = self.index.plan(i, self)
+            kind = plan[0]
             
-            # for stealth scannos - these are valid (yet incorrect) words. So, instead of SUGGEST_SPELLCHECK (which would return the same word supplied), take the value from the stealth_scanno dict, which is the desired word to check for in BERT context (arid --> and)
-            elif self.common_scannos == "T" and i in stealth:
-                SC.append(stealth_scannos.get(i).split(" "))
-                SB = self.__SUGGEST_BERT(text = self.__SET_MASK(i,'[MASK]', self.text), 
-                                                number_to_return = self.top_k)
-                
-                # if the original stealth scanno also makes sense in context, then don't record the suggestion
-                if i not in SB:
+            # common scannos are merged back in later, bypassing the BERT check step
+            if kind == "common":
+                common_scanno_fixes[i] = plan[1]
+            elif kind == "split":
+                punct_split_fixes[i] = plan[1]
+            elif kind == "stealth":
+                to_check.append({"misread": i, "type": "stealth", "SC": list(plan[1]),
+                                 "masked_text": self.__SET_MASK(i,'[MASK]', self.text), "prefix": "", "bert": None})
+            # Feed in the first word into the text, then confirm whether second word fits the context of the sentence using BERT
+            elif kind == "mashup":
+                to_check.append({"misread": i, "type": "mashup", "SC": list(plan[1]),
+                                 "masked_text": self.__SET_MASK(i, plan[2] + ' [MASK]', self.text), "prefix": plan[2], "bert": None})
+            elif kind == "mask":
+                to_check.append({"misread": i, "type": "mask", "SC": list(plan[1]),
+                                 "masked_text": self.__SET_MASK(i,'[MASK]', self.text), "prefix": "", "bert": None})
+        
+        if self.multi_mask is not None:
+            self._GROUP_MASKS(to_check)
+        if self.context_window is not None:
+            for entry in to_check:
+                entry["masked_text"] = self._WINDOW(entry["masked_text"])
+                if "group_text" in entry:
+                    entry["group_text"] = self._WINDOW(entry["group_text"])
+                        
+        return([to_check, common_scanno_fixes, punct_split_fixes])
+    
+    
+    # Cut a masked text down to the context_window words either side of its [MASK]
+    # BERT's attention cost grows with the square of the input length, so long paragraphs are much cheaper to check this way - at the cost of some context
+    # With several [MASK]s (see _GROUP_MASKS), each gets its own window: windows that overlap are merged, and the rest are joined up into one input
+    def _WINDOW(self, text):
+        n = self.context_window
+        spans = []
+        for mask in re.finditer(re.escape("[MASK]"), text):
+            # the partial word touching the [MASK] ('"[MASK],') counts as part of it
+            start = re.search("(?:\\S+\\s+){0,%d}\\S*$" % n, text[:mask.start()]).start()
+            end = mask.end() + re.match("\\S*(?:\\s+\\S+){0,%d}" % n, text[mask.end():]).end()
+            if spans and start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+            else:
+                spans.append([start, end])
+        if len(spans) == 0:
+            return(text)
+        return(" ".join(text[start:end] for start, end in spans))
+    
+    
+    # Put the masks for several misreads into one BERT input, so that one forward pass predicts all of them.
+    # Masks go in the same input only if there are at least multi_mask words between them - BERT sees the other masks as [MASK] rather than the misread, so masks that are close together lose some context
+    # Entries that share an input get its "group_text", and which of its masks is theirs ("mask_index"). Entries with the same masked text share a mask.
+    def _GROUP_MASKS(self, to_check):
+        slots = {}
+        for entry in to_check:
+            if entry["masked_text"] in slots:
+                continue
+            start = self.text.find(entry["misread"])
+            if start < 0:
+                continue
+            replacement = entry["prefix"] + " [MASK]" if entry["type"] == "mashup" else "[MASK]"
+            slots[entry["masked_text"]] = (start, start + len(entry["misread"]), replacement)
+        
+        # greedily fill each group with the earliest masks that are far enough from the group's last one
+        groups = []
+        for key, slot in sorted(slots.items(), key=lambda item: item[1][0]):
+            for group in groups:
+                last = group[-1][1]
+                if slot[0] >= last[1] and len(self.text[last[1]:slot[0]].split()) >= self.multi_mask:
+                    group.append((key, slot))
+                    break
+            else:
+                groups.append([(key, slot)])
+        
+        assigned = {}
+        for group in groups:
+            if len(group) < 2:
+                continue
+            text = self.text
+            for key, (start, end, replacement) in reversed(group):
+                text = text[:start] + replacement + text[end:]
+            for n, (key, slot) in enumerate(group):
+                assigned[key] = (text, n)
+        
+        for entry in to_check:
+            if entry["masked_text"] in assigned:
+                entry["group_text"], entry["mask_index"] = assigned[entry["masked_text"]]
+        return(to_check)
+    
+    
+    # Creates a dict of valid replacements for misspellings. If bert and symspell do not have a match for a given misspelling, it makes no changes to the word.
+    # When common_scannos is activated, that limited list of words bypass the spellcheck/context check
+    # Note: find-replace is not instance-specific, it is paragraph specific..."yov" will be replaced with "you" in all instances found in that section of text. It would be rare, but this may cause issues when a repeated scanno is valid & not valid within the same paragraph
+    # If the masks have already been prepared & run through BERT (ie. in batched mode), pass them in as "prepared" to skip straight to the overlap check
+    @profiling.stage("spellcheck.find_replacements")
+    def _FIND_REPLACEMENTS(self, misreads, prepared = None):
+        if prepared is None:
+            prepared = self._PREPARE_MASKS(misreads)
+            self._SUGGEST_BERT(prepared[0])
+        to_check, common_scanno_fixes, punct_split_fixes = prepared
+        
+        bert = []
+        # the entry behind each of BERT's results
+        origins = []
+        for entry in to_check:
+            if "scores" in entry:
+                self.candidate_scores[entry["misread"]] = {w: {"rank": v[0], "score": v[1]} for w, v in entry["scores"].items()}
+            SB = entry["bert"]
+            
+            # if the original stealth scanno also makes sense in context, then don't record the suggestion
+            if entry["type"] == "stealth":
+                if entry["misread"] not in SB:
                     bert.append(SB)
+                    origins.append(entry)
+            
+            # Tack the first word onto the results for each BERT context suggestion. These are compared against the multi-word phrase provided by sympell
+            elif entry["type"] == "mashup":
+                SBi = []
+                for x in SB:
+                    SBi.append(entry["prefix"] + ' ' + x)
+                bert.append(SBi)
+                origins.append(entry)
             
-            # for all other unrecognized words, get all spellcheck suggestions from symspell
             else:
-                spellcheck = self.__SUGGEST_SPELLCHECK(i)
-                # Make sure there is a valid spellcheck suggestion (symspell returns the original string if not)
-                if spellcheck == i:
-                    # if no spellcheck suggestion given, remove from misreads (ie. dont bother checking BERT context - it won't get used)
-                    misreads.delete(i)
-                else: 
-                   # For multi-word phrases....
-                    if self.suggest_unsplit == "T" and len(spellcheck) == 1 and str(spellcheck).count(' ') == 1:
-                        
-                        # if the phrase was already separated by a comma or period ("shall.cultivate"), skip the BERT context check
-                        # just confirm that both word halves are valid
-                        if "." in i or "," in i:
-                            mw = ''.join(spellcheck)                           
-                            fw = re.findall("^[^\s,]+", mw).pop()
-                            sw = re.findall("[^\s]+$", mw).pop()
-                            
-                            if fw in word_set and sw in word_set:
-                                # if first letter after period split is uppercased, retain it and add a period ('ended.He' --> 'ended. He')
-                                if len(re.findall("\.{1,}([A-Z][a-z]+)", i)) > 0:
-                                    fw = fw + '. '
-                                    sw = str.title(sw)
-                                    mw = fw + sw
-
-                                add_splitto = {i:mw}
-                                punct_split_fixes.update(add_splitto)
-
-                    
-                        # If symspell has to pick an arbitrary cutoff between the words ("anhour"), check the suggestion using BERT context
-                        # Feed in the first word into the text, then confirm whether second word fits the context of the sentence using BERT. If so, the two word phrase will be accepted as a valid correction
-                        else:
-                            # tee up symspell suggestion for comparison to BERT suggestion
-                            SC.append(spellcheck)  
-                            
-                            mw = ''.join(spellcheck)
-                            fw = re.findall("^[^\s]+", mw).pop()
-                            SB = self.__SUGGEST_BERT(text = self.__SET_MASK(i, fw + ' [MASK]', self.text), 
-                                                            number_to_return = self.top_k)   
-                            
-                            # Tack the first word onto the results for each BERT context suggestion. These are compared against the multi-word phrase provided by sympell
-                            SBi = []
-                            for x in SB:
-                                SBi.append(fw + ' ' + x)
-                            
-                            bert.append(SBi)
-                              
-
-                    else:    
-                        SC.append(spellcheck)  
-
-                        # otherwise, just mask the misspelled word for BERT context check, which will be compared against symspell
-                        bert.append(self.__SUGGEST_BERT(text = self.__SET_MASK(i,'[MASK]', self.text), 
-                                                        number_to_return = self.top_k))
+                bert.append(SB)
+                origins.append(entry)
     
         # then, see if spellcheck & bert overlap
         # if they do, set that value for the find-replace dict
@@ -354,7 +570,8 @@ class spellcheck:
         fixes = []
         x = 0
         while x < len(bert):
-            overlap = set(bert[x]) & set(SC[x])
+            # compare against the symspell suggestions for that same misread
+            overlap = set(bert[x]) & set(origins[x]["SC"])
             corr.append(overlap)
             # if there is a single word that is both in context and symspellpy - update with that word
             if len(overlap) == 1:
@@ -364,27 +581,37 @@ class spellcheck:
                 corr[x] = ""
             x = x+1
             
-            
-        fixes = dict(zip(misreads, corr))
+        # each of BERT's results goes with the misread it was masked for - common scannos, punct splits & stealth scannos that made sense in context have no entry in corr
+        fixes = {entry["misread"]: value for entry, value in zip(origins, corr)}
         
-        try:
-            for key, value in fixes.copy().items():
-                # if it's a simple "remove an 's' from the end", (kissings --> kissing) then delete that fix
-                if value + "s" == key:
-                    del fixes[key]
-                # if it's an o -> e ending fix (bo --> be), ignore the soundex check
-                elif key[len(key)-1] == "o" and value[len(value)-1] == "e":
-                    pass
-                # ignore soundex check for mashups (anhour --> an hour). Found by looking for a space (' ') in the replacement suggestion                
-                elif value.count(' ') == 1:
-                    pass
-                # Check whether the find-replace candidate is a homophone - these suggestions are ignored, to avoid flagging intentional (stylistic) homophones (ie. without / widout)
-                # soundex check = double metaphone
-                elif doublemetaphone(key)[0] == doublemetaphone(value)[0]:
-                    del fixes[key]
-        # If soundex can't parse the character, just skip the check
-        except Exception:
-            pass
+        # where each fix came from: the path its misread took (see _PLAN_MISREAD), plus BERT's score for the fix, if the model scored it (score_candidates = "T")
+        sources = {}
+        for entry, value in zip(origins, corr):
+            key = entry["misread"]
+            word = value[len(entry["prefix"]) + 1:] if entry["type"] == "mashup" else value
+            score = entry.get("scores", {}).get(word)
+            sources[key] = (entry["type"], score[1] if score is not None and score[0] is not None else None)
+        sources.update((key, ("common", None)) for key in common_scanno_fixes)
+        sources.update((key, ("split", None)) for key in punct_split_fixes)
+        self.fix_sources = sources
+        
+        for key, value in fixes.copy().items():
+            # no fix for this misread (dropped further down)
+            if value == "":
+                continue
+            # if it's a simple "remove an 's' from the end", (kissings --> kissing) then delete that fix
+            if value + "s" == key:
+                del fixes[key]
+            # if it's an o -> e ending fix (bo --> be), ignore the soundex check
+            elif key[-1] == "o" and value[-1] == "e":
+                pass
+            # ignore soundex check for mashups (anhour --> an hour). Found by looking for a space (' ') in the replacement suggestion                
+            elif value.count(' ') == 1:
+                pass
+            # Check whether the find-replace candidate is a homophone - these suggestions are ignored, to avoid flagging intentional (stylistic) homophones (ie. without / widout)
+            # soundex check = double metaphone. If soundex can't parse either word, just skip the check for this fix
+            elif _same_sound(key, value):
+                del fixes[key]
           
         # Add the common scannos to the mix
         fixes.update(common_scanno_fixes)
@@ -397,7 +624,7 @@ class spellcheck:
             del fixes[x]
                 
         # Remove all dict entries that are in the list of known bad suggestions
-        overlap = dict(fixes.items() & ignore_suggestions.items())
+        overlap = dict(fixes.items() & resources.get("ignore_suggestions").items())
         for x in overlap:
             del fixes[x]
         
@@ -429,8 +656,10 @@ class spellcheck:
     
     
     # Define method for fixing a single string - note: the final function will fragment long strings into paragraphs
-    def SINGLE_STRING_FIX(self):
-        misreads = self._LIST_MISREADS()
+    # In batched mode, fix() has already listed the misreads and run their masks through BERT, so those get passed in here
+    def SINGLE_STRING_FIX(self, misreads = None, prepared = None):
+        if misreads is None:
+            misreads = self._LIST_MISREADS()
         
         # if no misreads, just return the original text
         if len(misreads) == 0:
@@ -443,7 +672,8 @@ class spellcheck:
         # otherwise, look for candidates for replacement and update text where plausible matches are found
         # Based on user input, either outputs just the full corrected text, or also itemizes the changes
         else:
-            fixes = self._FIND_REPLACEMENTS(misreads)
+            fixes = self._FIND_REPLACEMENTS(misreads, prepared)
+            self.fixes = fixes
             correction = self._MULTI_REPLACE(fixes)
             # for any text that has no updates, remove from changes_by_paragraph output
             if self.changes_by_paragraph == "T":
@@ -464,16 +694,21 @@ class spellcheck:
             return(full_results)
 
 
-    # Final OCR contextual spellchecker
-    def fix(self):
-            
-        open_list = []
-        
-        # run spellcheck against each paragraph separately
+    # Split the text into paragraph-level spellcheck objects, which share all of this object's settings
+    def _PARAGRAPHS(self):
+        index = self.index if self.index is not None else MisreadIndex()
+        paragraphs = []
+        start = 0
         for i in self._SPLIT_PARAGRAPHS(self.text):
-            open_list.append(spellcheck(i,changes_by_paragraph= self.changes_by_paragraph, interactive = self.interactive, common_scannos = self.common_scannos, top_k = self.top_k, return_context = self.return_context, suggest_unsplit = self.suggest_unsplit).SINGLE_STRING_FIX())          
-
-        
+            paragraph = spellcheck(i,changes_by_paragraph= self.changes_by_paragraph, interactive = self.interactive, common_scannos = self.common_scannos, top_k = self.top_k, return_context = self.return_context, suggest_unsplit = self.suggest_unsplit, batch_size = self.batch_size, score_candidates = self.score_candidates, context_window = self.context_window, multi_mask = self.multi_mask, index = index)
+            paragraph.start = start = self.text.find(i, start)
+            start += len(i)
+            paragraphs.append(paragraph)
+        return(paragraphs)
+    
+    
+    # Collapse the results from each paragraph back into a single output
+    def _COMBINE(self, open_list):
         if self.changes_by_paragraph == "T":
             open_list = list(filter(None, open_list))
             if len(open_list) == 0:
@@ -501,6 +736,292 @@ class spellcheck:
                 return(final_text)
 
 
+    # Every fix as Suggestion records (see suggestions.py): one for each place the fix applies in its paragraph, ie. each place _MULTI_REPLACE changes
+    def _SUGGESTIONS(self, paragraphs):
+        lines = None
+        records = []
+        for i in paragraphs:
+            if len(i.fixes) == 0:
+                continue
+            if lines is None:
+                lines = _Lines(self.text)
+            # a fix is reported where its misread stands as a whole word (as _MULTI_REPLACE applies it) - one that can't be found there changes nothing, so isn't reported
+            found = MultiReplacer(i.fixes, word_boundary = True).find(i.text)
+            order = {key: n for n, key in enumerate(i.fixes)}
+            for position, key in sorted(found, key = lambda x: (order[x[1]], x[0])):
+                stage, confidence = i.fix_sources.get(key, (None, None))
+                line, column, offset, text = lines.locate(i.start + position)
+                records.append(Suggestion(line, column, offset, key, i.fixes[key], stage, confidence, text if self.return_context == "T" else None))
+        return(records)
+    
+    
+    # Run spellcheck against each paragraph separately
+    def _RUN(self, paragraphs):
+        if self.batch_size is None:
+            open_list = []
+            for i in paragraphs:
+                open_list.append(i.SINGLE_STRING_FIX())
+        else:
+            open_list = _BATCH_SINGLE_STRING_FIX(paragraphs)
+        
+        # in score_candidates mode, gather up the scores for every misread that went through BERT
+        for i in paragraphs:
+            self.candidate_scores.update(i.candidate_scores)
+        return(open_list)
+    
+    
+    # Final OCR contextual spellchecker
+    @profiling.stage("spellcheck.fix")
+    def fix(self):
+        paragraphs = self._PARAGRAPHS()
+        return(self._COMBINE(self._RUN(paragraphs)))
+    
+    
+    # Same check as fix(), with the results as Suggestion records: every place each fix turns up, with where it came from (see suggestions.py)
+    @profiling.stage("spellcheck.suggestions")
+    def suggestions(self):
+        paragraphs = self._PARAGRAPHS()
+        self._RUN(paragraphs)
+        return(self._SUGGESTIONS(paragraphs))
+
+
+
+# Document-level index of the misreads in a text, shared by all of its paragraphs (or all the lines of a book).
+# The same tokens & misreads turn up again and again across a document, and most of the work on them doesn't depend on where they are:
+# - each unique token is only run through the filters of _SCAN_TOKENS once
+# - each unique misread is only sorted into its path (common scanno, symspell suggestions, mashup...) once - see _PLAN_MISREAD
+# leaving only the BERT check (and the find-replace) to run for each paragraph the misread is in. The results are the same as without the index.
+# It also records where each misread was found: positions[misread] = [(paragraph, offset in that paragraph), ...], with paragraphs numbered in the order they were scanned
+# Tokens & plans are each kept to the maxsize most recently used, so an index shared by a whole book (which is streamed, see run_ocrfixr.py) stays the same size however long the book is. Positions grow with the text - pass positions = False when they aren't needed
+# (an index is only used by one thread at a time, so these are plain OrderedDicts rather than the locked LRUCache of cache.py - a token lookup is on the hot path)
+class MisreadIndex:
+    def __init__(self, positions = True, maxsize = 65536):
+        self.record_positions = positions
+        self.maxsize = maxsize
+        self.positions = {}
+        self.paragraphs = 0
+        self.tokens = 0
+        self._tokens = OrderedDict()
+        self._plans = OrderedDict()
+    
+    # Same as the filters in spellcheck._SCAN_TOKENS, for one token: (stripped token, whether it is a common/stealth scanno, the misread word or None)
+    def _classify(self, token):
+        stripped = token.strip()
+        scanno = stripped in resources.get("common") or stripped in resources.get("stealth")
+        word = None
+        if _KEEP_TOKEN.match(stripped):
+            w = stripped.strip(_PUNCTUATION)
+            if len(w) > 1 and w not in resources.get("word_set") and not _ALL_NUMS.match(w):
+                word = w
+        found = self._tokens[token] = (stripped, scanno, word)
+        if len(self._tokens) > self.maxsize:
+            self._tokens.popitem(last = False)
+        return(found)
+    
+    # Same results as spellcheck(text)._SCAN_TOKENS(), recording where each misread is along the way
+    def scan(self, text, check_scannos = True):
+        paragraph = self.paragraphs
+        self.paragraphs += 1
+        classes = self._tokens
+        unrecognized = []
+        scannos = []
+        L1 = 0
+        offset = 0
+        for token in _TOKEN_SPLIT.split(text):
+            L1 += 1
+            found = classes.get(token)
+            if found is None:
+                found = self._classify(token)
+            else:
+                classes.move_to_end(token)
+            stripped, scanno, word = found
+            if check_scannos and scanno:
+                scannos.append(stripped)
+                if self.record_positions:
+                    self.positions.setdefault(stripped, []).append((paragraph, offset + token.find(stripped)))
+            if word is not None:
+                unrecognized.append(word)
+                if self.record_positions:
+                    self.positions.setdefault(word, []).append((paragraph, offset + token.find(word)))
+            offset += len(token) + 1
+        self.tokens += L1
+        return(unrecognized, scannos, L1)
+    
+    # The _PLAN_MISREAD for a misread, worked out the first time it is asked for
+    def plan(self, misread, checker):
+        key = (misread, checker.common_scannos, checker.suggest_unsplit)
+        found = self._plans.get(key)
+        if found is None:
+            found = self._plans[key] = checker._PLAN_MISREAD(misread)
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last = False)
+        else:
+            self._plans.move_to_end(key)
+        return(found)
+    
+    def occurrences(self, misread):
+        return(list(self.positions.get(misread, [])))
+    
+    def stats(self):
+        return({"paragraphs": self.paragraphs, "tokens": self.tokens, "unique_tokens": len(self._tokens),
+                "misreads": sum(len(v) for v in self.positions.values()), "unique_misreads": len(self.positions), "plans": len(self._plans)})
+
+
+
+# Finds the line, column & byte offset of positions in a text (see suggestions.py for what each one means)
+class _Lines:
+    def __init__(self, text):
+        self.text = text
+        self.starts = [0]
+        self.byte_starts = [0]
+        for line in text.split("\n"):
+            self.starts.append(self.starts[-1] + len(line) + 1)
+            self.byte_starts.append(self.byte_starts[-1] + len(line.encode('utf-8')) + 1)
+    
+    # (line number, column, byte offset, the line itself) of a position in the text
+    def locate(self, position):
+        n = bisect_right(self.starts, position) - 1
+        start = self.starts[n]
+        line = self.text[start:self.starts[n + 1] - 1]
+        return(n + 1, position - start, self.byte_starts[n] + len(self.text[start:position].encode('utf-8')), line)
+
+
+_NO_CODE = object()
+
+
+# Primary double metaphone code of a word: from the prebuilt table for dictionary words (see index.py), worked out & cached for anything else. None if metaphone can't parse the word
+@profiling.stage("spellcheck.metaphone")
+def metaphone_code(word):
+    code = resources.get("metaphone_codes").get(word)
+    if code is not None:
+        return(code)
+    cache = resources.get("metaphone_cache")
+    code = cache.get(word, _NO_CODE)
+    if code is _NO_CODE:
+        try:
+            code = doublemetaphone(word)[0]
+        except Exception:
+            code = None
+        cache.put(word, code)
+    return(code)
+
+
+def _same_sound(a, b):
+    code = metaphone_code(a)
+    return(code is not None and code == metaphone_code(b))
+
+
+# Hit/miss counts for the BERT prediction, symspell suggestion & metaphone code caches
+def cache_stats():
+    return({"bert": resources.get("bert_cache").stats(), "symspell": resources.get("symspell_cache").stats(), "metaphone": resources.get("metaphone_cache").stats()})
+
+
+# Batched mode: gather up the masks from every paragraph first, run them all through BERT together, then hand each paragraph back its own results
+def _BATCH_SINGLE_STRING_FIX(paragraphs):
+    if len(paragraphs) == 0:
+        return([])
+    
+    misreads = [i._LIST_MISREADS() for i in paragraphs]
+    prepared = []
+    to_check = []
+    for i, m in zip(paragraphs, misreads):
+        if len(m) == 0:
+            prepared.append(None)
+        else:
+            prep = i._PREPARE_MASKS(m)
+            to_check.extend(prep[0])
+            prepared.append(prep)
+    paragraphs[0]._SUGGEST_BERT(to_check)
+    
+    open_list = []
+    for i, m, prep in zip(paragraphs, misreads, prepared):
+        open_list.append(i.SINGLE_STRING_FIX(m, prep))
+    return(open_list)
+
+
+# Spellcheck a list of separate texts (such as the numbered lines of a book) in one go, pooling all of their masks into shared BERT batches.
+# Returns the same results as calling spellcheck(text, ...).fix() on each text in turn.
+@profiling.stage("spellcheck.fix_batch")
+def fix_batch(texts, batch_size = 32, **kwargs):
+    kwargs.setdefault("index", MisreadIndex())
+    checkers = [spellcheck(i, batch_size = batch_size, **kwargs) for i in texts]
+    paragraphs = [i._PARAGRAPHS() for i in checkers]
+    
+    results = iter(_BATCH_SINGLE_STRING_FIX([p for ps in paragraphs for p in ps]))
+    return([c._COMBINE([next(results) for p in ps]) for c, ps in zip(checkers, paragraphs)])
+
+
+# fix_batch, with each text's results as Suggestion records - the same as calling spellcheck(text, ...).suggestions() on each text in turn
+@profiling.stage("spellcheck.fix_batch")
+def suggest_batch(texts, batch_size = 32, **kwargs):
+    kwargs.setdefault("index", MisreadIndex())
+    checkers = [spellcheck(i, batch_size = batch_size, **kwargs) for i in texts]
+    paragraphs = [i._PARAGRAPHS() for i in checkers]
+    _BATCH_SINGLE_STRING_FIX([p for ps in paragraphs for p in ps])
+    return([c._SUGGESTIONS(ps) for c, ps in zip(checkers, paragraphs)])
+
+
+# The {misread: fix} dict for each of a list of paragraphs, with all of their masks run through BERT together (in batches of batch_size).
+def paragraph_fixes(texts, batch_size = None, **kwargs):
+    return([i.fixes for i in check_paragraphs(texts, batch_size, **kwargs)])
+
+
+# paragraph_fixes, handing back the checked spellcheck objects - each with its .fixes, and where each fix came from (.fix_sources)
+@profiling.stage("spellcheck.paragraph_fixes")
+def check_paragraphs(texts, batch_size = None, **kwargs):
+    kwargs.setdefault("index", MisreadIndex())
+    paragraphs = [spellcheck(i, batch_size = batch_size, **kwargs) for i in texts]
+    misreads = [i._LIST_MISREADS() for i in paragraphs]
+    prepared = [i._PREPARE_MASKS(m) if len(m) > 0 else None for i, m in zip(paragraphs, misreads)]
+    if len(paragraphs) > 0:
+        paragraphs[0]._SUGGEST_BERT([x for prep in prepared if prep is not None for x in prep[0]])
+    
+    for i, m, prep in zip(paragraphs, misreads, prepared):
+        if prep is not None:
+            i.fixes = i._FIND_REPLACEMENTS(m, prep)
+    return(paragraphs)
+
+
+# Streaming version of Counter(spellcheck(text)._LIST_MISREADS()), for a whole book that shouldn't be held in memory at once.
+# lines is any iterable of lines (without their newlines) - ie. text.split("\n"), but read lazily from a file. The counts come back in the same order, with the same values.
+def count_misreads(lines, ignore_words = None, common_scannos = "T", block_size = 1024):
+    unrecognized = Counter()
+    scannos = Counter()
+    L1 = 0
+    block = []
+    index = MisreadIndex(positions = False)
+
+    def scan(block):
+        u, s, n = spellcheck("\n".join(block), common_scannos = common_scannos, index = index)._SCAN_TOKENS()
+        unrecognized.update(u)
+        scannos.update(s)
+        return(n)
+
+    for line in lines:
+        block.append(line)
+        if len(block) >= block_size:
+            L1 += scan(block)
+            block = []
+    if len(block) > 0 or L1 == 0:
+        L1 += scan(block)
+
+    # same rules as _LIST_MISREADS, applied to the totals for the whole text
+    if sum(unrecognized.values())/L1 > 0.30 and L1 > 10:
+        unrecognized = Counter()
+    ignore_set_from_user = set(ignore_words or [])
+    ignore_set_from_pkg = resources.get("ignore_set_from_pkg")
+    counts = Counter({k: v for k, v in unrecognized.items() if k not in ignore_set_from_pkg and k not in ignore_set_from_user})
+
+    # stealth scannos count every time they appear, common scannos only once (unless already flagged above)
+    stealth = resources.get("stealth") if common_scannos == "T" else set()
+    for k, v in scannos.items():
+        if k in stealth:
+            counts[k] += v
+        elif k not in counts:
+            counts[k] = 1
+    return(counts)
+
+
 
 # TODO - (ADD_DICTS) Need to add selectable foreign language dictionaries 
 # TODO - (IGNORE_SPLIT_WORDS) need to ignore the first word of a new page, since these can be split words across pages (this may also just be tied up in the unsplit functionality, where this word should have a leading * to denote a split word)
@@ -512,6 +1033,7 @@ class spellcheck:
 # TODO - (WARM_UP) can we somehow negate the warm-up time for the transformers unmasker?
     # pipelines = 7 secs
     # symspellpy dictionary load = 3 seconds
+    # > these are now only loaded on first use (see resources.py), so jobs that don't need them don't pay for them. Long-running callers can resources.preload() up front.
 
 
        
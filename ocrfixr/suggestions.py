@@ -0,0 +1,165 @@
+"""Suggestions as records - where each fix goes, what it changes & where it came from - and the formats they can be written out in."""
+import json
+import math
+import struct
+from contextlib import contextmanager
+
+
+# One Suggestion for every place a fix turns up (a fix applies to each place its misread is found in the paragraph):
+#   line         - line number in the text checked, from 1. The CLI's records use the book's own line numbers ("12:  text" is line 12)
+#   column       - character column in the line, from 0. In the CLI's records, counted from after the "12:  "
+#   offset       - UTF-8 byte offset from the start of the text checked. In the CLI's records, from the start of the line's text (run_ocrfixr.check_book turns these into offsets in the book)
+#   original     - the misread, as found in the text
+#   replacement  - the suggested fix
+#   stage        - how the fix was found: "common" (common scanno list), "split" (words run together at punctuation), "stealth" (stealth scanno, checked by BERT), "mask" (symspell & BERT), "mashup" (words run together, checked by BERT)
+#   confidence   - BERT's score for the fix, when the model scored it (spellcheck's score_candidates = "T"), else None
+#   context      - the whole line the fix is in, if context was asked for (return_context = "T"), else None
+class Suggestion:
+    __slots__ = ("line", "column", "offset", "original", "replacement", "stage", "confidence", "context")
+
+    def __init__(self, line, column, offset, original, replacement, stage = None, confidence = None, context = None):
+        self.line = line
+        self.column = column
+        self.offset = offset
+        self.original = original
+        self.replacement = replacement
+        self.stage = stage
+        self.confidence = confidence
+        self.context = context
+
+    def to_dict(self):
+        return({name: getattr(self, name) for name in self.__slots__})
+
+    @classmethod
+    def from_dict(cls, data):
+        return(cls(**data))
+
+    def __eq__(self, other):
+        return(isinstance(other, Suggestion) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return("Suggestion({})".format(", ".join("{}={!r}".format(name, getattr(self, name)) for name in self.__slots__)))
+
+
+
+### Formats
+# ------------------------------------------------------
+# Writers take the suggestions a block of lines at a time, in line order, and return how many entries they wrote.
+# The CLI writes any of them (--format); guiguts is the default.
+
+# GuiGuts' own format: "12:10 Suggest 'flew' for 'flevv'" (plus " | <the line>" with context).
+# GuiGuts takes one suggestion per misread per line, so only the first place each misread turns up in a line is listed
+def guiguts_lines(suggestions):
+    seen = set()
+    for s in suggestions:
+        if (s.line, s.original) in seen:
+            continue
+        seen.add((s.line, s.original))
+        text = "{}:{} Suggest '{}' for '{}'".format(s.line, s.column, s.replacement, s.original)
+        if s.context is not None:
+            text = text + " | " + s.context
+        yield(text)
+
+
+class GuiGutsWriter:
+    mode = 'w'
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, suggestions):
+        n = 0
+        for text in guiguts_lines(suggestions):
+            self.file.write(text + '\n')
+            n += 1
+        return(n)
+
+
+# JSON lines: one object per suggestion (every place each fix turns up), with all of its fields
+class JsonLinesWriter:
+    mode = 'w'
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, suggestions):
+        n = 0
+        for s in suggestions:
+            self.file.write(json.dumps(s.to_dict(), ensure_ascii = False) + '\n')
+            n += 1
+        return(n)
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip() != "":
+            yield(Suggestion.from_dict(json.loads(line)))
+
+
+# Compact binary: BINARY_MAGIC, then one record per suggestion -
+#   line (uint32, 0 = none), column (uint32), offset (uint64), confidence (float32, NaN = none), stage (uint8, index into STAGES + 1, 0 = none),
+#   then original & replacement (uint16 length + UTF-8), context (uint32 length + UTF-8, 0xFFFFFFFF = none). All little-endian.
+BINARY_MAGIC = b"OCRS\x01"
+STAGES = ("common", "split", "stealth", "mask", "mashup")
+_RECORD = struct.Struct("<IIQfB")
+_SHORT = struct.Struct("<H")
+_LONG = struct.Struct("<I")
+_NO_CONTEXT = 0xFFFFFFFF
+
+
+class BinaryWriter:
+    mode = 'wb'
+
+    def __init__(self, file):
+        self.file = file
+        self.file.write(BINARY_MAGIC)
+
+    def write(self, suggestions):
+        n = 0
+        for s in suggestions:
+            confidence = float("nan") if s.confidence is None else s.confidence
+            stage = 0 if s.stage is None else STAGES.index(s.stage) + 1
+            parts = [_RECORD.pack(s.line or 0, s.column, s.offset, confidence, stage)]
+            for text in (s.original, s.replacement):
+                data = text.encode('utf-8')
+                parts.append(_SHORT.pack(len(data)) + data)
+            if s.context is None:
+                parts.append(_LONG.pack(_NO_CONTEXT))
+            else:
+                data = s.context.encode('utf-8')
+                parts.append(_LONG.pack(len(data)) + data)
+            self.file.write(b"".join(parts))
+            n += 1
+        return(n)
+
+
+def read_binary(file):
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("not an OCRfixr suggestions file")
+    while True:
+        head = file.read(_RECORD.size)
+        if len(head) == 0:
+            return
+        line, column, offset, confidence, stage = _RECORD.unpack(head)
+        texts = []
+        for size in (_SHORT, _SHORT):
+            n = size.unpack(file.read(size.size))[0]
+            texts.append(file.read(n).decode('utf-8'))
+        n = _LONG.unpack(file.read(_LONG.size))[0]
+        context = None if n == _NO_CONTEXT else file.read(n).decode('utf-8')
+        yield(Suggestion(line or None, column, offset, texts[0], texts[1], STAGES[stage - 1] if stage else None,
+                         None if math.isnan(confidence) else confidence, context))
+
+
+FORMATS = {"guiguts": GuiGutsWriter, "jsonl": JsonLinesWriter, "binary": BinaryWriter}
+
+
+# with open_writer("out.jsonl", "jsonl") as out:
+#     out.write(suggestions)
+@contextmanager
+def open_writer(path, format = "guiguts"):
+    cls = FORMATS[format]
+    with open(path, cls.mode, encoding = None if 'b' in cls.mode else 'utf-8') as f:
+        yield(cls(f))
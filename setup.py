@@ -13,17 +13,18 @@ setuptools.setup(
     description="A contextual spellchecker for OCR output",
     long_description=long_description,
     long_description_content_type="text/markdown",
-    entry_points ={'console_scripts': ['ocrfixr = ocrfixr.run_ocrfixr:main']},
-    packages=setuptools.find_packages(),
+    entry_points ={'console_scripts': ['ocrfixr = ocrfixr.run_ocrfixr:main', 'ocrfixr-batch = ocrfixr.batch:main', 'ocrfixr-server = ocrfixr.server:main']},
+    packages=setuptools.find_packages(exclude=['benchmarks']),
     package_dir={'OCRfixr': 'ocrfixr'},
-    package_data={'OCRfixr': ['data/*.txt']},
+    package_data={'OCRfixr': ['data/*.txt', 'data/*.bin']},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
-    install_requires=['transformers', 'tensorflow>=2.0', 'numpy>=1.20.0', 'symspellpy', 'importlib_resources', 'metaphone', 'tqdm'],
+    python_requires='>=3.7',
+    install_requires=['transformers', 'tensorflow>=2.0', 'torch', 'numpy>=1.20.0', 'symspellpy', 'importlib_resources', 'metaphone', 'tqdm'],
+    extras_require={'onnx': ['onnxruntime', 'onnx']},
     license="GNU General Public License v3",
     keywords=['ocrfixr','spellcheck', 'OCR', 'contextual', 'BERT'],
     url='https://github.com/ja-mcm/ocrfixr',
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import unittest
+from ocrfixr import aio, spellcheck, unsplit
+
+
+texts = ["The birds flevv down\n south, but wefe quickly apprehended\n by border patrol agents",
+         "I hope yov will f1nd all the rnistakes in this sentence.",
+         "the fox arid the hound ran round and round",
+         "The ex-\nample was dis-\nplayed"]
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def tearDown(self):
+        aio.shutdown()
+
+
+    def test_afix_matches_fix(self):
+        async def run():
+            return(await asyncio.gather(*(aio.afix(t, return_fixes = "T") for t in texts)))
+        self.assertEqual(asyncio.run(run()), [spellcheck(t, return_fixes = "T").fix() for t in texts])
+
+
+    def test_aunsplit_matches_fix(self):
+        self.assertEqual(asyncio.run(aio.aunsplit(texts[3])), unsplit(texts[3]).fix())
+
+
+    def test_cancel_waiting_caller(self):
+        aio.configure(max_concurrency = 1)
+        async def run():
+            tasks = [asyncio.ensure_future(aio.afix(t)) for t in texts]
+            await asyncio.sleep(0)
+            tasks[2].cancel()
+            return(await asyncio.gather(*tasks, return_exceptions = True))
+        results = asyncio.run(run())
+        self.assertIsInstance(results[2], asyncio.CancelledError)
+        self.assertEqual(results[0], spellcheck(texts[0]).fix())
+        self.assertEqual(results[3], spellcheck(texts[3]).fix())
+
+
+
+if __name__ == '__main__':
+    unittest.main()
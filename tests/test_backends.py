@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import importlib.util
+import unittest
+from unittest import mock
+from ocrfixr import resources, backends
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_default_backend_keeps_cache_keys(self):
+        with mock.patch.dict(os.environ, {"OCRFIXR_BACKEND": "", "OCRFIXR_MODEL": ""}):
+            self.assertEqual(backends.model_id(), resources.BERT_MODEL)
+
+
+    def test_model_id_depends_on_backend_and_model(self):
+        with mock.patch.dict(os.environ, {"OCRFIXR_BACKEND": "onnx", "OCRFIXR_MODEL": "/models/bert", "OCRFIXR_ONNX_QUANTIZED": "1"}):
+            quantized = backends.model_id()
+        with mock.patch.dict(os.environ, {"OCRFIXR_BACKEND": "onnx", "OCRFIXR_MODEL": "/models/bert", "OCRFIXR_ONNX_QUANTIZED": "0"}):
+            full = backends.model_id()
+        self.assertNotEqual(quantized, full)
+        self.assertNotEqual(quantized, resources.BERT_MODEL)
+
+
+    def test_unknown_backend(self):
+        with mock.patch.dict(os.environ, {"OCRFIXR_BACKEND": "tensorrt"}):
+            with self.assertRaises(ValueError):
+                backends.model_id()
+
+
+    def test_mask_token(self):
+        self.assertEqual(backends._with_mask_token(["the [MASK] flew"], "[MASK]"), ["the [MASK] flew"])
+        self.assertEqual(backends._with_mask_token(["the [MASK] flew"], "<mask>"), ["the <mask> flew"])
+
+
+    @unittest.skipIf(importlib.util.find_spec("onnxruntime") is None, "onnxruntime is not installed")
+    def test_onnx_needs_exported_model(self):
+        with tempfile.TemporaryDirectory() as path:
+            with self.assertRaises(FileNotFoundError):
+                backends.OnnxBackend(path)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from ocrfixr.run_ocrfixr import check_book
+from ocrfixr.batch import list_inputs, output_paths, run_batch, write_summary
+
+
+books = {"one.txt": "The birds flevv down\nby border patrol agents\n",
+         "two.txt": "I hope yov will f1nd all the rnistakes in this sentence.\nthe fox arid the hound\n",
+         "three.txt": "Nothing to see here.\n"}
+options = {"context_fl": "F", "ignored_words": [], "batch_size": None}
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.books = os.path.join(self.dir, "books")
+        self.out = os.path.join(self.dir, "out")
+        os.makedirs(self.books)
+        for name, text in books.items():
+            with open(os.path.join(self.books, name), 'w', encoding = 'utf-8') as f:
+                f.write(text)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+    def test_manifest_matches_directory(self):
+        manifest = os.path.join(self.dir, "manifest.txt")
+        with open(manifest, 'w', encoding = 'utf-8') as f:
+            f.write("# books to check\nbooks/one.txt\n\nbooks/three.txt\nbooks/two.txt\n")
+        self.assertEqual(sorted(list_inputs(manifest)), list_inputs(self.books))
+
+
+    def test_duplicate_output_names(self):
+        with self.assertRaises(ValueError):
+            output_paths(["a/one.txt", "b/one.txt"], self.out)
+
+
+    def test_batch_matches_single_book(self):
+        inputs = list_inputs(self.books)
+        records = list(run_batch(inputs, self.out, options))
+        self.assertEqual([r["status"] for r in records], ["done"] * 3)
+
+        for path, outfile in zip(inputs, output_paths(inputs, self.out)):
+            single = os.path.join(self.dir, "single.txt")
+            check_book(path, single, options)
+            with open(single, encoding = 'utf-8') as a, open(outfile, encoding = 'utf-8') as b:
+                self.assertEqual(a.read(), b.read())
+
+
+    def test_resume_skips_finished_books(self):
+        inputs = list_inputs(self.books)
+        first = list(run_batch(inputs, self.out, options))
+        os.remove(output_paths(inputs, self.out)[0])
+        second = list(run_batch(inputs, self.out, options))
+        self.assertEqual(sorted(r["status"] for r in second), ["done", "skipped", "skipped"])
+
+        summary = write_summary(second, self.out, inputs)
+        self.assertEqual(summary["totals"]["suggestions"], sum(r["suggestions"] for r in first))
+        with open(os.path.join(self.out, "summary.json"), encoding = 'utf-8') as f:
+            self.assertEqual(json.load(f)["books"], 3)
+
+
+    def test_resume_checks_the_format(self):
+        inputs = list_inputs(self.books)
+        list(run_batch(inputs, self.out, options))
+        # each format has its own output files
+        self.assertEqual([r["status"] for r in run_batch(inputs, self.out, options, format = "jsonl")], ["done"] * 3)
+        self.assertTrue(os.path.exists(output_paths(inputs, self.out, "_suggestions.jsonl")[0]))
+        # and an output in another format isn't taken as done
+        self.assertEqual([r["status"] for r in run_batch(inputs, self.out, options, suffix = "_suggestions.txt", format = "binary")], ["done"] * 3)
+        self.assertEqual(sorted(r["status"] for r in run_batch(inputs, self.out, options, suffix = "_suggestions.txt", format = "binary")), ["skipped"] * 3)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import tempfile
+from ocrfixr.cache import LRUCache, DiskCache, PredictionCache
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize = 2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        self.assertEqual(lru.get("a"), 1)
+        lru.put("c", 3)
+        self.assertNotIn("b", lru)
+        self.assertIn("a", lru)
+        self.assertEqual(lru.get("b"), None)
+        self.assertEqual(lru.stats()["hits"], 1)
+        self.assertEqual(lru.stats()["misses"], 1)
+
+
+    def test_disk_cache_persists(self):
+        disk = DiskCache(self.path)
+        disk.put_many({"k1": ["and", "the"], "k2": ["store"]})
+        disk.close()
+        disk = DiskCache(self.path)
+        self.assertEqual(disk.get_many(["k1", "k2", "k3"]), {"k1": ["and", "the"], "k2": ["store"]})
+        self.assertEqual(disk.stats()["misses"], 1)
+
+
+    def test_disk_cache_evicts_by_size(self):
+        disk = DiskCache(self.path, max_bytes = 2000)
+        for i in range(100):
+            disk.put_many({"key%d" % i: ["word"] * 10})
+        self.assertLessEqual(disk.stats()["bytes"], 2000)
+        # the most recent entries survive
+        self.assertIn("key99", disk.get_many(["key99"]))
+        self.assertNotIn("key0", disk.get_many(["key0"]))
+
+
+    def test_prediction_cache_tiers(self):
+        cache = PredictionCache("bert-base-uncased", 30, maxsize = 10, path = self.path)
+        cache.put_many({"the fox [MASK] the hound": ["and", "or"]})
+        self.assertEqual(cache.get_many(["the fox [MASK] the hound", "unseen [MASK]"]), {"the fox [MASK] the hound": ["and", "or"]})
+
+        # a fresh process only has the disk tier to go on
+        fresh = PredictionCache("bert-base-uncased", 30, maxsize = 10, path = self.path)
+        self.assertEqual(fresh.get_many(["the fox [MASK] the hound"]), {"the fox [MASK] the hound": ["and", "or"]})
+        self.assertEqual(fresh.stats()["disk"]["hits"], 1)
+        self.assertEqual(len(fresh.memory), 1)
+
+        # other models & top_k settings don't see these predictions
+        self.assertEqual(PredictionCache("distilbert-base-uncased", 30, path = self.path).get_many(["the fox [MASK] the hound"]), {})
+        self.assertEqual(PredictionCache("bert-base-uncased", 15, path = self.path).get_many(["the fox [MASK] the hound"]), {})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+from ocrfixr import resources, spellcheck
+from ocrfixr.chunker import pack_lines, split_text
+
+
+lines = ["The birds flevv down south, but were quickly apprehended", "by border patrol agents who vv^hether or not", "",
+         "I hope yov will f1nd all the rnistakes in this sentence.", "the fox arid the hound ran round and round"] * 40
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_chunks_fit_the_model(self):
+        tokenizer = resources.get("tokenizer")
+        chunks = pack_lines(list(enumerate(lines, 1)), tokenizer, max_tokens = 64)
+        self.assertGreater(len(chunks), 1)
+        for c in chunks:
+            self.assertLessEqual(len(tokenizer(c.text)["input_ids"]), 64)
+        # every non-blank line is in exactly one chunk, in order
+        numbers = [n for c in chunks for n in c.lines()]
+        self.assertEqual(numbers, [n for n, line in enumerate(lines, 1) if line != ""])
+
+
+    def test_offsets_map_back_to_lines(self):
+        chunks = pack_lines(list(enumerate(lines, 1)), resources.get("tokenizer"), max_tokens = 64)
+        for c in chunks:
+            for offset in range(len(c.text)):
+                number, column = c.locate(offset)
+                if c.text[offset] != " ":
+                    self.assertEqual(lines[number - 1][column], c.text[offset])
+
+
+    def test_overlap_is_context_only(self):
+        tokenizer = resources.get("tokenizer")
+        chunks = pack_lines(list(enumerate(lines, 1)), tokenizer, max_tokens = 128, overlap = 40)
+        self.assertTrue(any(c.owned > 0 for c in chunks[1:]))
+        self.assertEqual([n for c in chunks for n in c.lines()], [n for n, line in enumerate(lines, 1) if line != ""])
+        for c in chunks:
+            self.assertFalse(c.owns(0) and c.owned > 0)
+            self.assertLessEqual(len(tokenizer(c.text)["input_ids"]), 128)
+
+
+    def test_long_lines_are_split(self):
+        tokenizer = resources.get("tokenizer")
+        long = " ".join(x for x in lines if x != "")
+        chunks = pack_lines([(1, long)], tokenizer, max_tokens = 64)
+        self.assertEqual(set(n for c in chunks for n in c.lines()), {1})
+        for c in chunks:
+            number, column = c.locate(0)
+            self.assertEqual(long[column:column + len(c.text)], c.text)
+        pieces = split_text(long, tokenizer, max_tokens = 64)
+        self.assertEqual("".join(pieces), long)
+        self.assertTrue(all(len(tokenizer(p)["input_ids"]) <= 64 for p in pieces))
+
+
+    def test_paragraphs_respect_token_limit(self):
+        self.assertEqual(spellcheck("short line\nanother one\n")._SPLIT_PARAGRAPHS("short line\nanother one\n"), ["short line\n", "another one\n"])
+        long = " ".join(["vv^hether c0llege"] * 300) + "\n"
+        paragraphs = spellcheck(long)._SPLIT_PARAGRAPHS(long)
+        self.assertGreater(len(paragraphs), 1)
+        self.assertEqual("".join(paragraphs), long)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
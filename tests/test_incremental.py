@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from ocrfixr.incremental import check_incremental
+from ocrfixr.run_ocrfixr import run_chunks
+from ocrfixr.suggestions import guiguts_lines
+
+
+text = ["The birds flevv down", "by border patrol agents", "I onlv want to go home.", "the fox arid the hound"] * 70
+options = {"context_fl": "F", "ignored_words": [], "batch_size": None}
+
+
+def numbered(lines):
+    return(['%d:  %s' % (number + 1, line) for (number, line) in enumerate(lines)])
+
+
+def full_run(lines, options = options):
+    return(list(guiguts_lines(x for n, result in run_chunks(numbered(lines), options) for x in result)))
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state = os.path.join(self.tmp.name, "book.state")
+        self.out = os.path.join(self.tmp.name, "suggestions.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_incremental(self, lines, options = options):
+        n_lines, n_suggestions, n_checked = check_incremental(numbered(lines), self.out, options, self.state)
+        with open(self.out, encoding = 'utf-8') as f:
+            suggestions = f.read().splitlines()
+        self.assertEqual(n_lines, len(lines))
+        self.assertEqual(n_suggestions, len(suggestions))
+        return(suggestions, n_checked)
+
+
+    def test_only_changed_lines_are_checked(self):
+        suggestions, n_checked = self.run_incremental(text)
+        self.assertEqual(n_checked, len(text))
+        self.assertEqual(suggestions, full_run(text))
+
+        edited = list(text)
+        edited[2] = "I only want to go home."
+        edited[201] = "by border patrol agents, who flevv"
+        suggestions, n_checked = self.run_incremental(edited)
+        self.assertEqual(n_checked, 2)
+        self.assertEqual(suggestions, full_run(edited))
+
+        # nothing changed since the last run
+        self.assertEqual(self.run_incremental(edited), (suggestions, 0))
+
+
+    def test_moved_lines_are_checked_again(self):
+        self.run_incremental(text)
+        edited = text[:100] + ["A new line, with a rnistake"] + text[100:]
+        suggestions, n_checked = self.run_incremental(edited)
+        self.assertEqual(n_checked, len(edited) - 100)
+        self.assertEqual(suggestions, full_run(edited))
+
+
+    def test_new_setup_starts_over(self):
+        self.run_incremental(text)
+        context = dict(options, context_fl = "T")
+        suggestions, n_checked = self.run_incremental(text, context)
+        self.assertEqual(n_checked, len(text))
+        self.assertEqual(suggestions, full_run(text, context))
+
+        with open(self.state, 'w', encoding = 'utf-8') as f:
+            f.write("not a state file")
+        self.assertEqual(self.run_incremental(text, context)[1], len(text))
+
+
+    def test_packed_blocks_are_checked_whole(self):
+        packed = dict(options, pack_tokens = 512)
+        self.run_incremental(text, packed)
+        edited = list(text)
+        edited[130] = "I onlv want to go home, arid stay."
+        suggestions, n_checked = self.run_incremental(edited, packed)
+        self.assertEqual(n_checked, 128)
+        self.assertEqual(suggestions, full_run(edited, packed))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import tempfile
+from symspellpy import Verbosity
+from ocrfixr import index
+
+
+class TestStringMethods(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmp.name, index.INDEX_NAME)
+        cls.reference = index.build_symspell()
+        index.build_index(cls.path, cls.reference)
+        cls.mapped = index.SymSpellIndex(cls.path).symspell()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+
+    def test_lookups_match_freshly_built_dictionary(self):
+        for word in ["tbe", "aud", "flevv", "stoie", "rnistakes", "wlll", "f1nd", "the", "particular", "zzzzzzzz"]:
+            self.assertEqual([(x.term, x.distance, x.count) for x in self.mapped.lookup(word, Verbosity.CLOSEST, max_edit_distance=2)],
+                             [(x.term, x.distance, x.count) for x in self.reference.lookup(word, Verbosity.CLOSEST, max_edit_distance=2)])
+        for word in ["anhour", "itspread", "circuit,which"]:
+            self.assertEqual([x.term for x in self.mapped.lookup_compound(word, max_edit_distance=0)],
+                             [x.term for x in self.reference.lookup_compound(word, max_edit_distance=0)])
+
+
+    def test_deletes_mapping(self):
+        deletes = self.mapped._deletes
+        self.assertEqual(len(deletes), len(self.reference._deletes))
+        key = next(iter(self.reference._deletes))
+        self.assertIn(key, deletes)
+        self.assertEqual(deletes[key], self.reference._deletes[key])
+        self.assertNotIn("not a real delete!", deletes)
+        with self.assertRaises(KeyError):
+            deletes["not a real delete!"]
+
+
+    def test_word_set(self):
+        self.assertEqual(index.SymSpellIndex(self.path).word_set(), set(index.word_list_path().read_text(encoding='utf-8').split()))
+        self.assertEqual(index.SymSpellIndex(self.path).common_words(), set(index.common_list_path().read_text(encoding='utf-8').split()))
+
+
+    def test_packed_word_set(self):
+        words = ["the", "night", "café", "flew", "a"]
+        blob, offsets, table = index.pack_words(words)
+        packed = index.PackedWordSet(blob, 0, offsets, table)
+        self.assertEqual(len(packed), 5)
+        self.assertEqual(list(packed), words)
+        for w in words:
+            self.assertIn(w, packed)
+            self.assertEqual(packed.word(packed.find(w)), w)
+        for w in ["", "th", "thee", "cafe", "nite", "\udcff", 5, None]:
+            self.assertNotIn(w, packed)
+        self.assertEqual(packed.find("nite"), -1)
+        self.assertEqual(packed | {"nite"}, set(words) | {"nite"})
+        self.assertEqual(packed & {"the", "nite"}, {"the"})
+
+
+    def test_metaphone_codes(self):
+        from metaphone import doublemetaphone
+        codes = index.SymSpellIndex(self.path).metaphone_codes()
+        words = set(index.word_list_path().read_text(encoding='utf-8').split()) | set(self.reference._words)
+        self.assertEqual(set(codes), words)
+        for word in ["the", "night", "without", "particular", "colour", "apprehended"]:
+            self.assertEqual(codes[word], doublemetaphone(word)[0])
+        # looked up in the mapped table, not a dict of it
+        self.assertNotIsInstance(codes, dict)
+        self.assertIsNone(codes.get("nite"))
+        self.assertNotIn("nite", codes)
+        with self.assertRaises(KeyError):
+            codes["nite"]
+
+
+    def test_stale_index_is_ignored(self):
+        self.assertIsNotNone(index.open_index([self.path]))
+        stale = os.path.join(self.tmp.name, "stale.bin")
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(stale, "wb") as f:
+            f.write(data.replace(index.source_hash().encode(), b"0" * 64, 1))
+        self.assertFalse(index.SymSpellIndex(stale).is_current())
+        self.assertIsNone(index.open_index([stale]))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
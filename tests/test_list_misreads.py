@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Regression suite for the single-pass _LIST_MISREADS: it must return exactly what the original multi-regex version did.
+
+import re
+import string
+import random
+import unittest
+from ocrfixr import spellcheck, resources
+
+
+# The original implementation of _LIST_MISREADS, kept here as the reference
+def reference_list_misreads(text, ignore_words = None, common_scannos = "T"):
+    word_set = resources.get("word_set")
+    ignore_set_from_pkg = resources.get("ignore_set_from_pkg")
+    common = resources.get("common")
+    stealth = resources.get("stealth")
+
+    tokens = re.split("[ \n]", text)
+    tokens = [l.strip() for l in tokens]
+
+    no_hyphens = re.compile(".*-.*|.*'.*|.*\\.{3,}.*|.*’.*|[0-9]+")
+    no_caps = re.compile('[^A-Z]{2,}')
+    no_footnotes = re.compile('.*[0-9]{1,}[^A-z]?$')
+    no_roman_nums = re.compile('[xlcviXLCVI.:,-;]+$')
+    no_eth_endings = re.compile('.*eth|.*est$')
+    no_format_tags = re.compile('</?[a-z]>.*|.*</?[a-z]>')
+    no_list_items = re.compile('.*\\)|.*\\]')
+    all_nums = re.compile('^[0-9]{1,}$')
+
+    words = [x for x in tokens if not no_hyphens.match(x) and no_caps.match(x) and not no_footnotes.match(x) and not no_roman_nums.match(x) and not no_eth_endings.match(x) and not no_format_tags.match(x) and not no_list_items.match(x)]
+    no_punctuation = [l.strip(string.punctuation+"”“’‘") for l in words]
+    words_to_check = [x for x in no_punctuation if len(x) > 1 and not all_nums.match(x)]
+
+    unrecognized = [i for i in words_to_check if i not in word_set]
+    L1 = len(tokens)
+    L0 = len(unrecognized)
+    if L0/L1 > 0.30 and L1 > 10:
+        unrecognized = []
+
+    ignore_set_from_user = set(ignore_words or [])
+    misread = [i for i in unrecognized if i not in ignore_set_from_pkg and i not in ignore_set_from_user]
+    if common_scannos == "T":
+        for i in tokens:
+            if i not in misread and i in common or i in stealth:
+                misread.append(i)
+    return(misread)
+
+
+# Deterministic sample of OCR-ish text: real words, misreads, scannos, and tokens aimed at each of the filters
+def noisy_corpus(n_lines, seed = 7):
+    r = random.Random(seed)
+    words = sorted(resources.get("word_set"))
+    common = sorted(resources.get("common"))
+    stealth = sorted(resources.get("stealth"))
+    odd = ["wind-n\\ow", "can't", "...", "and...", "’tis", "1853,", "(16)", "(18,)", "work8.", "capital.1", "item[1]", "xlv.,", "III.", "vii.,",
+           "maketh", "greatest", "<i>vice", "versa</i>", "a)", "b]", "&c.", "“The", "tender.”", "24-28;", "—", "", "  ", "\t", "$1.50,·", "ee)",
+           "Ä", "éclair", "naïve", "x", "I", "TO", "St.", "th", "’", "‘quoted’", "shall.cultivate", "circuit,which", "anhour"]
+    subs = [("m", "rn"), ("l", "1"), ("e", "c"), ("w", "vv"), ("h", "li"), ("u", "v"), ("i", "l"), ("o", "0")]
+    lines = []
+    for n in range(n_lines):
+        tokens = []
+        for k in range(r.randint(0, 16)):
+            x = r.random()
+            w = r.choice(words)
+            if x < 0.10:
+                a, b = r.choice(subs)
+                w = w.replace(a, b, 1)
+            elif x < 0.14:
+                w = r.choice(common)
+            elif x < 0.17:
+                w = r.choice(stealth)
+            elif x < 0.30:
+                w = r.choice(odd)
+            elif x < 0.35:
+                w = w.title()
+            elif x < 0.45:
+                w = r.choice(['"', "'", "“", "(", ""]) + w + r.choice([",", ".", ";", "!", "?", "”", "’", ":", ""])
+            tokens.append(w)
+        lines.append(" ".join(tokens))
+    return(lines)
+
+
+class TestStringMethods(unittest.TestCase):
+
+    # the cases from test_spellcheck.py
+    cases = ["Hello, I'm a maile model.",
+             "'I'm not sure', Adam said. 'I can't see it. The wind-n\\ow is half-shut.'",
+             "income which represented the capital.1 And the",
+             "the nature both of the plan and purpose of his work8.",
+             "iron, &c. As I could not detect",
+             "571. (16) If lighted by a spiritual sun",
+             "been, that it violates certain axioms above stated, (18,) which have been",
+             "been, that it violates certain axioms above stated, (ee) which have been",
+             '333.   “The Journal du Magnetisme of the 10th of March, 1853, had',
+             'Be kept open, soft, and tender.” She talked',
+             'of the missionaries to do this.1',
+             "51, vii., 44; Coac. iii., 91, 92; II. Morb. xlv., 24-28; III. Morb.",
+             "And in another place he maketh mention of the",
+             "direct progression from F to B or <i>vice versa</i> (the tritone) was ruled out",
+             "I don't understand your aceent",
+             "The birds flevv down\n south, bvt wefe quickly apprehended\n by border patrol agents",
+             "tle", "Tlie", "the fox arid the hound ran round and round arid dry", "", "\n\n", "   "]
+
+
+    def test_matches_reference_on_unit_cases(self):
+        for text in self.cases:
+            for common_scannos in ["T", "F"]:
+                self.assertEqual(spellcheck(text, common_scannos = common_scannos)._LIST_MISREADS(), reference_list_misreads(text, common_scannos = common_scannos), text)
+        self.assertEqual(spellcheck("I don't understand your aceent", ignore_words = ['aceent'])._LIST_MISREADS(), reference_list_misreads("I don't understand your aceent", ignore_words = ['aceent']))
+
+
+    def test_matches_reference_line_by_line(self):
+        for line in noisy_corpus(5000):
+            self.assertEqual(spellcheck(line)._LIST_MISREADS(), reference_list_misreads(line), line)
+
+
+    def test_matches_reference_on_whole_book(self):
+        # whole-book runs drive -misspells and -Warp10
+        book = "\n".join(noisy_corpus(6000, seed = 11))
+        self.assertEqual(spellcheck(book)._LIST_MISREADS(), reference_list_misreads(book))
+        self.assertEqual(spellcheck(book, common_scannos = "F", ignore_words = ["anhour", "th"])._LIST_MISREADS(), reference_list_misreads(book, ignore_words = ["anhour", "th"], common_scannos = "F"))
+
+
+    def test_ratio_rule_matches_reference(self):
+        messy = "Quelle est la raison de cette folie mon ami zxq qqv brrm flevv"
+        self.assertEqual(spellcheck(messy)._LIST_MISREADS(), reference_list_misreads(messy))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from ocrfixr.run_ocrfixr import read_blocks, split_lines, has_split_words
+
+
+pages = ["The café was dis-\nplayed\non the sign\n", "-----File: 0002.png-----------\n", "found a by-\n", "-----File: 0003.png---\n", "stander\nend"]
+book = "".join(pages)
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, data):
+        path = os.path.join(self.tmp.name, "book.txt")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return(path)
+
+
+    def test_blocks_match_reading_the_file(self):
+        for data in (book.encode('utf-8'), book.replace("\n", "\r\n").encode('utf-8'), b""):
+            path = self.write(data)
+            with open(path, 'r', encoding = 'utf-8') as f:
+                text = f.read()
+            for block_size in (1, 2, 3, 100):
+                blocks = list(read_blocks(path, block_size))
+                self.assertEqual("".join(blocks), text)
+                self.assertEqual(list(split_lines(blocks)), text.split("\n"))
+
+
+    def test_blocks_end_at_pages(self):
+        path = self.write(book.encode('utf-8'))
+        # a word split across pages stays in one block with both its halves
+        self.assertEqual(list(read_blocks(path, 100)), [pages[0], "".join(pages[1:])])
+        self.assertEqual(list(read_blocks(path, 2)), ["The café was dis-\nplayed\n", "on the sign\n", "".join(pages[1:4]) + "stander\n", "end"])
+
+
+    def test_has_split_words(self):
+        lines = "the ex-\nample was dis-\nplayed\n" * 20
+        self.assertTrue(has_split_words(self.write(lines.encode('utf-8'))))
+        self.assertTrue(has_split_words(self.write(lines.replace("\n", "\r\n").encode('utf-8'))))
+        self.assertFalse(has_split_words(self.write(lines.encode('utf-8')), threshold = 40))
+        self.assertFalse(has_split_words(self.write(b"")))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import tempfile
+import unittest
+from ocrfixr import profiling, resources, spellcheck, unsplit
+from ocrfixr.run_ocrfixr import run_chunks
+
+
+text = ["The birds flevv down", "by border patrol agents", "I onlv want to go home.", "the fox arid the hound"] * 70
+q = ['%d:  %s' % (number + 1, line) for (number, line) in enumerate(text)]
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_off_by_default(self):
+        self.assertIsNone(profiling.active())
+        with profiling.profile() as report:
+            self.assertIs(profiling.active(), report)
+        self.assertIsNone(profiling.active())
+        # nothing is collected once it is off
+        spellcheck("I onlv want to go home.").fix()
+        self.assertEqual(report.stages, {})
+
+
+    def test_stages_and_distributions(self):
+        with profiling.profile() as report:
+            # common scannos skip BERT, so this never loads the model
+            spellcheck("I onlv want to go home.\nThe dog is here.\n").fix()
+            unsplit("The birds were dis-\nplayed on the wall").fix()
+        summary = report.summary()
+        for stage in ["spellcheck.fix", "spellcheck.list_misreads", "spellcheck.find_replacements", "spellcheck.replace", "unsplit.fix", "unsplit.list_split_words"]:
+            self.assertIn(stage, summary["stages"])
+        self.assertEqual(summary["stages"]["spellcheck.fix"]["calls"], 1)
+        self.assertEqual(summary["stages"]["spellcheck.list_misreads"]["calls"], 2)
+        self.assertEqual(summary["distributions"]["misreads_per_paragraph"]["histogram"], {"0": 1, "1": 1})
+        self.assertNotIn("spellcheck.unmasker", summary["stages"])
+
+
+    def test_cache_hit_rates(self):
+        cache = resources.get("symspell_cache")
+        cache.put("profiling-test", ("x",))
+        with profiling.profile() as report:
+            cache.get("profiling-test")
+            cache.get("profiling-test")
+            cache.get("not cached")
+        self.assertEqual(report.summary()["caches"]["symspell"], {"hits": 2, "misses": 1, "hit_rate": 0.6667})
+
+
+    def test_snapshots_merge(self):
+        a = profiling.Profile()
+        b = profiling.Profile()
+        a.add_time("stage", 1.0)
+        b.add_time("stage", 2.0)
+        b.add_time("other", 0.5)
+        b.record("batch", 4)
+        a.merge(b.snapshot(reset = True))
+        self.assertEqual(a.stages, {"stage": [2, 3.0], "other": [1, 0.5]})
+        self.assertEqual(a.distributions, {"batch": {4: 1}})
+        self.assertEqual(b.stages, {})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            a.write(path)
+            with open(path, encoding = 'utf-8') as f:
+                self.assertEqual(json.load(f)["stages"]["stage"], {"calls": 2, "seconds": 3.0, "ms_per_call": 1500.0})
+        self.assertIn("stage", a.table())
+
+
+    def test_workers_hand_back_their_profiles(self):
+        options = {"context_fl": "F", "ignored_words": [], "batch_size": None}
+        with profiling.profile() as serial:
+            list(run_chunks(q, options))
+        with profiling.profile() as parallel:
+            list(run_chunks(q, options, workers = 2))
+        for report in (serial, parallel):
+            self.assertEqual(report.stages["run_ocrfixr.check_lines"][0], 3)
+            self.assertEqual(sum(report.distributions["misreads_per_paragraph"].values()), len(q))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import random
+import unittest
+from ocrfixr.replace import multi_replace, trie_pattern
+
+
+# The original one-re.sub-per-fix loop from spellcheck._MULTI_REPLACE
+def sequential_replace(text, fixes):
+    for i, j in fixes.items():
+        text = re.sub("\\b" + re.escape(i) + "\\b", j, text)
+    return(text)
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_replaces_all_fixes(self):
+        self.assertEqual(multi_replace("tbe birds flevv south, tbe end", {"tbe": "the", "flevv": "flew"}, word_boundary = True), "the birds flew south, the end")
+        self.assertEqual(multi_replace("no fixes here", {}), "no fixes here")
+
+
+    def test_only_whole_words_with_word_boundary(self):
+        self.assertEqual(multi_replace("tbe tbey tbe.", {"tbe": "the"}, word_boundary = True), "the tbey the.")
+        self.assertEqual(multi_replace("tbe tbey", {"tbe": "the"}), "the they")
+
+
+    def test_longest_key_wins(self):
+        self.assertEqual(multi_replace("anhour an", {"an": "a", "anhour": "an hour"}, word_boundary = True), "an hour a")
+        # falls back to the shorter key when the longer one isn't a whole word
+        self.assertEqual(multi_replace("ab abc abcd", {"ab": "X", "abcd": "Y"}, word_boundary = True), "X abc Y")
+
+
+    def test_replacements_do_not_feed_into_each_other(self):
+        self.assertEqual(multi_replace("bo aud", {"bo": "aud", "aud": "and"}, word_boundary = True), "aud and")
+
+
+    def test_special_characters_in_keys(self):
+        self.assertEqual(multi_replace("went by.order of", {"by.order": "by order"}, word_boundary = True), "went by order of")
+        self.assertEqual(multi_replace("a (b) c", {"(b)": "[b]"}), "a [b] c")
+        self.assertEqual(multi_replace("x\\1 y", {"x\\1": "z"}), "z y")
+
+
+    def test_trailing_space(self):
+        self.assertEqual(multi_replace("the mid-\ndle of", {"mid-\ndle": "middle\n"}, trailing_space = True), "the middle\nof")
+        self.assertEqual(multi_replace("the mid-\ndle", {"mid-\ndle": "middle\n"}, trailing_space = True), "the middle\n")
+
+
+    def test_matches_sequential_replace_when_keys_do_not_overlap(self):
+        r = random.Random(3)
+        words = ["".join(r.choice("abcdefgh") for i in range(r.randint(2, 6))) for n in range(3000)]
+        text = " ".join(words)
+        keys = list(dict.fromkeys(words))[:400]
+        fixes = {k: k.upper() for k in keys}
+        self.assertEqual(multi_replace(text, fixes, word_boundary = True), sequential_replace(text, fixes))
+
+
+    def test_trie_pattern_matches_every_key(self):
+        keys = ["tbe", "tbey", "t", "flevv", "f1nd", "f", "by.order"]
+        pattern = re.compile("(?:" + trie_pattern(keys) + ")$")
+        for key in keys:
+            self.assertTrue(pattern.match(key), key)
+        self.assertFalse(pattern.match("tb"))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import unittest
+import threading
+from unittest import mock
+from ocrfixr import resources, unsplit, index
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_resources_load_on_first_use(self):
+        resources.reset("common_words")
+        self.assertFalse(resources.is_loaded("common_words"))
+        unsplit("with-\nin").fix()
+        self.assertTrue(resources.is_loaded("common_words"))
+
+
+    def test_unsplit_does_not_load_bert(self):
+        resources.reset("unmasker")
+        unsplit("par-\nticular").fix()
+        self.assertFalse(resources.is_loaded("unmasker"))
+
+
+    def test_resources_load_once_across_threads(self):
+        resources.reset("word_set")
+        found = []
+        threads = [threading.Thread(target = lambda: found.append(resources.get("word_set"))) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(id(x) for x in found)), 1)
+        self.assertIn("particular", found[0])
+
+
+    def test_index_is_opened_once(self):
+        resources.reset("symspell_index", "word_set", "common_words", "metaphone_codes")
+        with mock.patch.object(index, "open_index", wraps = index.open_index) as opened:
+            resources.preload("word_set", "common_words", "metaphone_codes")
+        self.assertEqual(opened.call_count, 1)
+
+
+    def test_override(self):
+        resources.override("ignore_suggestions", {"dere": "there"})
+        self.assertEqual(resources.get("ignore_suggestions"), {"dere": "there"})
+        resources.reset("ignore_suggestions")
+        self.assertNotEqual(resources.get("ignore_suggestions"), {"dere": "there"})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
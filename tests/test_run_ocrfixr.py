@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from collections import Counter
+from ocrfixr import unsplit, spellcheck, resources
+from ocrfixr.spellcheck import count_misreads
+from ocrfixr.run_ocrfixr import check_lines, check_packed_lines, run_chunks, read_blocks, split_lines, _unsplit_block, _page_chunks
+from benchmarks import stub_model
+from benchmarks.stub_model import WordTokenizer
+
+
+text = ["The birds flevv down", "by border patrol agents", "I hope yov will f1nd all the rnistakes in this sentence.", "the fox arid the hound"] * 70
+q = ['%d:  %s' % (number + 1, line) for (number, line) in enumerate(text)]
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_check_lines_output_format(self):
+        self.assertEqual(check_lines(q[:2]), ["1:10 Suggest 'flew' for 'flevv'"])
+
+
+    def test_packed_lines_map_to_source_lines(self):
+        # lines 1 & 5 both have the misread, and each gets its own suggestion at its own line number
+        packed = check_lines(q[:8], pack_tokens = 512)
+        self.assertIn("1:10 Suggest 'flew' for 'flevv'", packed)
+        self.assertIn("5:10 Suggest 'flew' for 'flevv'", packed)
+        self.assertEqual(packed, sorted(packed, key = lambda x: int(x.split(":")[0])))
+
+
+    def test_packed_fixes_are_found_where_they_apply(self):
+        # a misread ending in a non-word character (as some common scannos do) is only fixed where a word boundary follows it - and only reported there
+        resources.override("tokenizer", WordTokenizer())
+        self.addCleanup(resources.reset, "tokenizer")
+        line = "we allo\x0b it, allo\x0bx"
+        checked = SimpleNamespace(fixes = {"allo\x0b": "allow"}, fix_sources = {"allo\x0b": ("common", None)})
+        with mock.patch("ocrfixr.spellcheck.check_paragraphs", return_value = [checked]):
+            found = check_packed_lines(["3:  " + line])
+        self.assertEqual([(s.line, s.column, s.original) for s in found], [(3, line.rindex("allo"), "allo\x0b")])
+
+
+    def test_fixes_pair_up_with_their_own_misreads(self):
+        # 'tbe' is a common scanno & 'flevv' goes through the model: each fix goes with its own misread, whichever path the text is checked by
+        stub_model.install(["the birds flew south for the winter"])
+        self.addCleanup(resources.reset, "unmasker", "tokenizer", "bert_cache")
+        line = "tbe birds flevv south for the winter"
+        expected = {("tbe", "the"): 1, ("flevv", "flew"): 1}
+        self.assertEqual(spellcheck(line, return_fixes = "T").fix()[1], expected)
+        self.assertEqual(spellcheck(line, return_fixes = "T", batch_size = 4).fix()[1], expected)
+        lines = {"1:0 Suggest 'the' for 'tbe'", "1:10 Suggest 'flew' for 'flevv'"}
+        self.assertEqual(set(check_lines(["1:  " + line])), lines)
+        self.assertEqual(set(check_lines(["1:  " + line], pack_tokens = 128)), lines)
+
+
+    def test_workers_match_serial_run(self):
+        options = {"context_fl": "F", "ignored_words": [], "batch_size": None}
+        serial = sum((x[1] for x in run_chunks(q, options)), [])
+        parallel = sum((x[1] for x in run_chunks(q, options, workers = 2)), [])
+        self.assertEqual(parallel, serial)
+        self.assertEqual(sum(x[0] for x in run_chunks(q, options, workers = 2)), len(q))
+
+
+    def test_chunks_hold_whole_pages(self):
+        book = ["-----File: 001.png---", "a", "b", "-----File: 002.png---", "c", "-----File: 003.png---", "d", "e", "f", "g", "h", "i"]
+        lines = ['%d:  %s' % (number + 1, line) for (number, line) in enumerate(book)]
+        # as many whole pages as fit in a chunk, and a page too long for one is split up
+        self.assertEqual(list(_page_chunks(lines, 5)), [lines[:5], lines[5:10], lines[10:]])
+        self.assertEqual(list(_page_chunks(lines, 6)), [lines[:5], lines[5:11], lines[11:]])
+        # with no pages, chunks are all the same size
+        self.assertEqual([len(x) for x in _page_chunks(q[:10], 4)], [4, 4, 2])
+
+
+    def test_streamed_unsplit_matches_whole_text(self):
+        book = "The ex-\nample was dis-\nplayed on the well-\nmeaning sign\n" * 5 + "found a by-\n-----File: 224.png---\nstander\nend\n"
+        with tempfile.NamedTemporaryFile('w', suffix = '.txt', delete = False, encoding = 'utf-8') as f:
+            f.write(book)
+        try:
+            for block_size in (1, 2, 5):
+                streamed = list(split_lines(read_blocks(f.name, block_size), fix = _unsplit_block))
+                self.assertEqual(streamed, unsplit(book).fix().split("\n"))
+        finally:
+            os.unlink(f.name)
+
+
+    def test_streamed_misread_counts_match_whole_text(self):
+        book = "\n".join(text)
+        counts = count_misreads(book.split("\n"), block_size = 7)
+        self.assertEqual(list(counts.items()), list(Counter(spellcheck(book)._LIST_MISREADS()).items()))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import http.client
+import unittest
+from unittest import mock
+from ocrfixr import spellcheck, unsplit, resources
+from ocrfixr.batcher import MicroBatcher
+from ocrfixr.server import TestClient, json_fixes, ENDPOINTS
+# the benchmarks' stand-in for BERT, so the server can be tested offline
+from benchmarks import corpus, stub_model
+
+
+# stands in for the fill-mask pipeline - records the batches it is sent
+class RecordingUnmasker:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size = 1):
+        self.calls.append(list(texts))
+        out = [[{"token_str": t.upper()}] for t in texts]
+        return(out[0] if len(out) == 1 else out)
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_batcher_merges_concurrent_calls(self):
+        unmasker = RecordingUnmasker()
+        batcher = MicroBatcher(unmasker, max_batch = 64, max_wait = 0.2)
+        results = {}
+        def call(n):
+            results[n] = batcher(["text %d" % n, "shared"])
+        threads = [threading.Thread(target = call, args = (n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        batcher.close()
+
+        self.assertEqual(results[3], [[{"token_str": "TEXT 3"}], [{"token_str": "SHARED"}]])
+        self.assertLess(len(unmasker.calls), 8)
+        self.assertEqual(sum(len(c) for c in unmasker.calls), 9)
+
+
+    def test_batcher_unwraps_single_text(self):
+        batcher = MicroBatcher(RecordingUnmasker())
+        self.assertEqual(batcher(["one"]), [{"token_str": "ONE"}])
+        batcher.close()
+
+
+    def test_server_matches_direct_calls(self):
+        book = corpus.make_corpus(300, seed = 0)
+        stub_model.install(book.clean)
+        self.addCleanup(resources.reset, "unmasker", "tokenizer", "bert_cache")
+        text = book.book
+        with TestClient() as client:
+            self.assertEqual(client.get("/health"), (200, {"status": "ok"}))
+
+            status, body = client.post("/spellcheck", {"text": text, "return_fixes": "T"})
+            self.assertEqual(status, 200)
+            direct = spellcheck(text, return_fixes = "T").fix()
+            self.assertGreater(len(direct[1]), 0)
+            self.assertEqual(body["result"], json_fixes(direct))
+            self.assertIn(["popnlar", "popular", 1], body["result"][1])
+            self.assertIn("latency_ms", body)
+
+            status, body = client.post("/unsplit", {"text": "The ex-\nample was dis-\nplayed"})
+            self.assertEqual(body["result"], unsplit("The ex-\nample was dis-\nplayed").fix())
+
+            self.assertEqual(client.post("/spellcheck", {"text": text, "interactive": "T"})[0], 400)
+            self.assertEqual(client.post("/spellcheck", ["not", "an", "object"])[0], 400)
+            self.assertEqual(client.get("/nowhere")[0], 404)
+            self.assertEqual(client.get("/stats")[1]["requests"]["/spellcheck"]["requests"], 1)
+
+            # a result that can't be sent as JSON is answered with a 500, not a dropped connection
+            with mock.patch.dict(ENDPOINTS, {"/unsplit": lambda body: {("tuple", "key"): 1}}):
+                status, body = client.post("/unsplit", {"text": "text"})
+            self.assertEqual(status, 500)
+            self.assertIn("TypeError", body["error"])
+
+            # as is an error inside spellcheck, even a ValueError
+            def misconfigured(body):
+                raise ValueError("unknown OCRFIXR_BACKEND")
+            with mock.patch.dict(ENDPOINTS, {"/unsplit": misconfigured}):
+                self.assertEqual(client.post("/unsplit", {"text": "text"}), (500, {"error": "ValueError: unknown OCRFIXR_BACKEND"}))
+            conn = http.client.HTTPConnection(client.host, client.port)
+            conn.request("POST", "/unsplit", body = b"{not json")
+            self.assertEqual(conn.getresponse().status, 400)
+            conn.close()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
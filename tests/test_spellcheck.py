@@ -4,6 +4,8 @@
 import unittest
 import time
 from ocrfixr import spellcheck
+from ocrfixr import resources
+from ocrfixr.spellcheck import fix_batch, cache_stats
 
 # Define timing function
 def time_func(func, *args): #*args can take 0 or more 
@@ -121,6 +123,98 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(spellcheck('Here is sentence one.Here is sentence two', changes_by_paragraph = "T").fix(), "16 Suggest 'one. Here' for 'one.Here'")
         self.assertEqual(spellcheck("The Adopted Heir. One volume, paper, $1.50,· or cloth, $2.00.", changes_by_paragraph = "T").fix(),  'NOTE: No changes made to text')
 
+    def test_batched_mode_matches_default(self):
+        text = "The birds flevv down\n south, bvt wefe quickly apprehended\n by border patrol agents. I hope yov will f1nd all the rnistakes. the fox arid the hound. less than half anhour."
+        self.assertEqual(spellcheck(text, batch_size = 4).fix(), spellcheck(text).fix())
+        self.assertEqual(spellcheck(text, changes_by_paragraph = "T", batch_size = 4).fix(), spellcheck(text, changes_by_paragraph = "T").fix())
+        self.assertEqual(spellcheck(text, return_fixes = "T", batch_size = 1).fix(), spellcheck(text, return_fixes = "T").fix())
+        self.assertEqual(spellcheck("", batch_size = 4).fix(), "")
+
+
+    def test_fix_batch(self):
+        texts = ["The birds flevv south", "this text has no issues", "", "cut the sh1t"]
+        self.assertEqual(fix_batch(texts, batch_size = 8), [spellcheck(i).fix() for i in texts])
+        self.assertEqual(fix_batch(texts, batch_size = 8, changes_by_paragraph = "T"), [spellcheck(i, changes_by_paragraph = "T").fix() for i in texts])
+
+
+    def test_symspell_suggestions_are_cached(self):
+        cache = resources.get("symspell_cache")
+        cache.clear()
+        to_check = spellcheck("The birds flevv over the rnistakes")._PREPARE_MASKS(["flevv", "rnistakes"])[0]
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+        # same misreads in another paragraph are served from the cache, with the same suggestions
+        again = spellcheck("the rnistakes flevv south")._PREPARE_MASKS(["flevv", "rnistakes"])[0]
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual([x["SC"] for x in again], [x["SC"] for x in to_check])
+        self.assertEqual(cache_stats()["symspell"]["hits"], 2)
+
+
+    def test_score_candidates_matches_top_k(self):
+        text = "The birds flevv down\n south, but wefe quickly apprehended\n by border patrol agents\nthe fox arid the hound ran round and round\nI hope yov will f1nd all the rnistakes"
+        scored = spellcheck(text, return_fixes = "T", score_candidates = "T")
+        self.assertEqual(scored.fix(), spellcheck(text, return_fixes = "T").fix())
+        self.assertLess(scored.candidate_scores["flevv"]["flew"]["rank"], 15)
+        self.assertGreater(scored.candidate_scores["flevv"]["flew"]["score"], 0)
+
+
+    def test_context_window_and_multi_mask(self):
+        text = "The birds flevv down south for the winter, and came back again in the spring when the weather was warmer. But the farmer was not so happy, for they ate all the corn in his feld that year."
+        windowed = spellcheck(text, context_window = 3)._PREPARE_MASKS(["flevv", "feld"])[0]
+        self.assertEqual([x["masked_text"] for x in windowed], ["The birds [MASK] down south for", "corn in his [MASK] that year."])
+        grouped = spellcheck(text, multi_mask = 20)._PREPARE_MASKS(["flevv", "feld"])[0]
+        self.assertEqual([x["mask_index"] for x in grouped], [0, 1])
+        self.assertEqual(grouped[0]["group_text"], text.replace("flevv", "[MASK]").replace("feld", "[MASK]"))
+        # the windows around each mask are joined up into one input
+        both = spellcheck(text, context_window = 3, multi_mask = 20)._PREPARE_MASKS(["flevv", "feld"])[0]
+        self.assertEqual(both[1]["group_text"], "The birds [MASK] down south for corn in his [MASK] that year.")
+        # masks closer together than multi_mask words each get their own input
+        apart = spellcheck(text, multi_mask = 50)._PREPARE_MASKS(["flevv", "feld"])[0]
+        self.assertFalse(any("group_text" in x for x in apart))
+        self.assertEqual(spellcheck(text, return_fixes = "T", context_window = 8, multi_mask = 20).fix(), spellcheck(text, return_fixes = "T").fix())
+
+
+    def test_misread_index_matches_unindexed(self):
+        from ocrfixr.spellcheck import MisreadIndex
+        paragraphs = ["The birds flevv down south, and the birds flevv back.\n", "I hope yov will f1nd all the rnistakes, tbe rnistakes.\n", "The birds flevv down south\n"]
+        index = MisreadIndex()
+        for p in paragraphs:
+            self.assertEqual(index.scan(p), spellcheck(p)._SCAN_TOKENS())
+        self.assertEqual(index.occurrences("flevv"), [(0, 10), (0, 42), (2, 10)])
+        for misread, found in index.positions.items():
+            for paragraph, offset in found:
+                self.assertEqual(paragraphs[paragraph][offset:offset + len(misread)], misread)
+        stats = index.stats()
+        self.assertLess(stats["unique_misreads"], stats["misreads"])
+        self.assertLess(stats["unique_tokens"], stats["tokens"])
+        # one index shared across a whole document gives the same fixes as a separate one for each paragraph
+        self.assertEqual(spellcheck("".join(paragraphs), index = MisreadIndex()).fix(), "".join(spellcheck(p).fix() for p in paragraphs))
+
+
+    def test_misread_index_stays_bounded(self):
+        from ocrfixr.spellcheck import MisreadIndex
+        # every line's "N:" is a new token - a book-long index only keeps the most recently used ones
+        lines = ["%d:  The birds flevv down south, tbe birds" % n for n in range(1, 500)]
+        index = MisreadIndex(positions = False, maxsize = 20)
+        for line in lines:
+            self.assertEqual(index.scan(line), spellcheck(line)._SCAN_TOKENS())
+        self.assertEqual(len(index._tokens), 20)
+        self.assertEqual(index.positions, {})
+
+
+    def test_homophone_check_runs_for_every_fix(self):
+        from ocrfixr.spellcheck import metaphone_code
+        self.assertEqual(metaphone_code("night"), metaphone_code("nite"))
+        # words that aren't in the code table are worked out once, then cached
+        self.assertIn("nite", resources.get("metaphone_cache"))
+        # "hallo" has no fix - that used to stop the homophone check for every fix after it
+        to_check = [{"misread": "hallo", "type": "mask", "SC": ["hall"], "bert": ["house"]},
+                    {"misread": "nite", "type": "mask", "SC": ["night"], "bert": ["night"]},
+                    {"misread": "flevv", "type": "mask", "SC": ["flew"], "bert": ["flew"]}]
+        fixes = spellcheck("hallo, nite flevv")._FIND_REPLACEMENTS(["hallo", "nite", "flevv"], prepared = (to_check, {}, {}))
+        self.assertEqual(fixes, {"flevv": "flew"})
+
+
     def test_spellcheck_speed_acceptable(self):
         # GOALS
         # 0 misspells = < 0.01 seconds  [V1.4 = 0.002s]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tempfile
+import unittest
+from ocrfixr import spellcheck
+from ocrfixr.run_ocrfixr import suggest_lines, check_lines, check_book
+from ocrfixr.suggestions import Suggestion, guiguts_lines, open_writer, read_jsonl, read_binary, JsonLinesWriter, BinaryWriter
+
+
+# common scannos & words split at punctuation are fixed without BERT
+text = "I onlv want to go home, onlv today.\nThe café is onlv here, I shall.cultivate it"
+
+
+class TestStringMethods(unittest.TestCase):
+
+    def test_every_occurrence_is_reported(self):
+        found = spellcheck(text).suggestions()
+        self.assertEqual([(s.line, s.column, s.original, s.replacement, s.stage) for s in found],
+                         [(1, 2, "onlv", "only", "common"), (1, 24, "onlv", "only", "common"),
+                          (2, 12, "onlv", "only", "common"), (2, 25, "shall.cultivate", "shall cultivate", "split")])
+        for s in found:
+            self.assertTrue(text.encode('utf-8')[s.offset:].startswith(s.original.encode('utf-8')))
+            self.assertIsNone(s.confidence)
+            self.assertIsNone(s.context)
+
+
+    def test_whole_words_only(self):
+        # "tle" is reported where it stands as a word, not where it first turns up inside "little" (column 3), as the GuiGuts output did before suggestion records
+        self.assertEqual(check_lines(["5:  little tle thing"]), ["5:7 Suggest 'the' for 'tle'"])
+        # a fix whose misread isn't in the paragraph as a whole word changes nothing, so it isn't reported
+        paragraph = spellcheck("a little thing")
+        paragraph.start = 0
+        paragraph.fixes = {"tle": "the"}
+        self.assertEqual(spellcheck(paragraph.text)._SUGGESTIONS([paragraph]), [])
+
+
+    def test_plain_text_offsets(self):
+        # a line that only looks numbered is still counted from the start of the text - line numbers are the CLI's business
+        page = "Chapter one\n12: In tbe beginning"
+        found = spellcheck(page).suggestions()
+        self.assertEqual([(s.line, s.column, s.offset) for s in found], [(2, 7, page.encode('utf-8').find(b"tbe"))])
+
+
+    def test_numbered_lines(self):
+        lines = ["7:  I onlv want to go home, onlv today.", "8:  The café is onlv here"]
+        found = suggest_lines(lines, context_fl = "T")
+        self.assertEqual([(s.line, s.column, s.offset) for s in found], [(7, 2, 2), (7, 24, 24), (8, 12, 13)])
+        self.assertEqual(found[2].context, lines[1])
+        # GuiGuts lists each misread once per line, at the first place it turns up
+        self.assertEqual(check_lines(lines), ["7:2 Suggest 'only' for 'onlv'", "8:12 Suggest 'only' for 'onlv'"])
+        self.assertEqual(list(guiguts_lines(found))[1], "8:12 Suggest 'only' for 'onlv' | " + lines[1])
+
+
+    def test_writers_round_trip(self):
+        found = spellcheck(text).suggestions() + [Suggestion(3, 0, 99, "arid", "and", "stealth", 0.5, "arid ‘x’")]
+        out = io.StringIO()
+        self.assertEqual(JsonLinesWriter(out).write(found), len(found))
+        self.assertEqual(list(read_jsonl(io.StringIO(out.getvalue()))), found)
+        out = io.BytesIO()
+        BinaryWriter(out).write(found)
+        self.assertEqual(list(read_binary(io.BytesIO(out.getvalue()))), found)
+
+
+    def test_open_writer(self):
+        found = spellcheck(text).suggestions()
+        with tempfile.TemporaryDirectory() as tmp:
+            for format, read in (("jsonl", read_jsonl), ("binary", read_binary)):
+                path = os.path.join(tmp, "out." + format)
+                with open_writer(path, format) as out:
+                    self.assertEqual(out.write(found), len(found))
+                with open(path, 'rb' if format == "binary" else 'r', encoding = None if format == "binary" else 'utf-8') as f:
+                    self.assertEqual(list(read(f)), found)
+            with open_writer(os.path.join(tmp, "out.txt")) as out:
+                self.assertEqual(out.write(found), 3)
+
+
+    def test_book_offsets(self):
+        book = "The café is here\n\nI onlv want to go home.\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.txt")
+            out = os.path.join(tmp, "out.jsonl")
+            with open(path, 'w', encoding = 'utf-8') as f:
+                f.write(book)
+            options = {"context_fl": "F", "ignored_words": [], "batch_size": None}
+            self.assertEqual(check_book(path, out, options, format = "jsonl"), (4, 1))
+            with open(out, encoding = 'utf-8') as f:
+                found = list(read_jsonl(f))
+        self.assertEqual((found[0].line, found[0].column, found[0].offset), (3, 2, book.encode('utf-8').find(b"onlv")))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
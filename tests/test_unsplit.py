@@ -1,8 +1,47 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import re
+import random
 import unittest
-from ocrfixr import unsplit
+from ocrfixr import unsplit, resources
+from ocrfixr.replace import multi_replace
+
+
+# The original unsplit engine: split the text into words, regex-match every word, decide each split word on its own, then find-replace them all
+def word_by_word_unsplit(text):
+    word_set = resources.get("word_set")
+    common_words = resources.get("common_words")
+    tokens = [l.strip() for l in re.split(" |(?<!-)\n", text)]
+    fixes = {}
+    for i in [x for x in tokens if re.match(".+[^-](-\n).+", x)]:
+        W0 = i.replace("-\n", "")
+        W1 = re.findall(".*(?=-\n)", i)[0]
+        W2 = re.findall("(?<=-\n).*", i)[0]
+        if "--File" in W2 or W2.isdigit():
+            fixes[i] = i.replace("-\n", "-*\n") + " "
+        elif W0 in word_set and (W0 in common_words or not all([W1 in word_set, W2 in word_set])):
+            fixes[i] = W0 + "\n"
+        elif W0 in word_set:
+            fixes[i] = i.replace("-\n", "-*") + "\n"
+        elif all([W1 in word_set, W2 in word_set]) or any(filter(str.isdigit, W1)) or (W1.istitle() == False and W2.istitle() == True):
+            fixes[i] = i.replace("-\n", "-") + "\n"
+        else:
+            fixes[i] = W0 + "\n"
+    return([multi_replace(text, fixes, trailing_space = True), fixes])
+
+
+# The baseline's find-replace: one re.sub per split word, in the order they were found - so a split word that turns up inside another one (or inside an earlier fix) is replaced there too
+def sequential_unsplit(text):
+    fixes = word_by_word_unsplit(text)[1]
+    for i, j in fixes.items():
+        text = re.sub(re.escape(i) + "(\\s|\\n)?", j, text)
+    return([text, fixes])
+
+
+# Can the split words be replaced in any order? ie. none of them is part of another one, or of any fix
+def independent(fixes):
+    return(not any(i in j for i in fixes for j in list(fixes) + list(fixes.values()) if i != j) and not any(i in fixes[i] for i in fixes))
 
 
 class TestStringMethods(unittest.TestCase):
@@ -89,6 +128,43 @@ class TestStringMethods(unittest.TestCase):
     def test_stars_end_of_page_hyphens(self):
         self.assertEqual(unsplit("found a by-\n-----File: 224.png---------------------------------------------------------\nstander on the scene").fix(), "found a by-*\n-----File: 224.png---------------------------------------------------------\nstander on the scene")
 
+
+    def test_split_words_inside_hyphen_chains(self):
+        self.assertEqual(unsplit("a-\nmid-\ndle and the mid-\ndle of it").fix(), "a-\nmiddle\nand the middle\nof it")
+        # whitespace around a split word stays where it is, except the one character after it, which the newline of the fix takes the place of
+        self.assertEqual(unsplit("the \tmid-\ndle\t of it").fix(), "the \tmiddle\n of it")
+
+
+    def test_matches_word_by_word_engine(self):
+        r = random.Random(5)
+        words = ["mid", "dle", "with", "in", "sports", "man", "well", "meaning", "Mc", "Allister", "55", "56", "a", "I", "x", "-", "--", "224.png---", "--File:", "café", "'", ",", "\t", ""]
+        seps = [" ", "\n", "-\n", "-\n", "-\n", "--\n", "  ", "\n\n", "-", "\t", "\r\n", "-\n\n"]
+        for n in range(3000):
+            text = "".join(r.choice(words) + r.choice(seps) for i in range(r.randint(1, 12))) + r.choice(words)
+            self.assertEqual(unsplit(text, return_fixes = "T").fix(), word_by_word_unsplit(text), repr(text))
+
+
+    def test_matches_baseline_engine(self):
+        r = random.Random(7)
+        words = ["mid", "dle", "with", "in", "win", "side", "sports", "man", "manlike", "well", "meaning", "Mc", "Allister", "55", "56", "a", "x", "-", "224.png---", "--File:", "café", ",", ""]
+        seps = [" ", "\n", "-\n", "-\n", "-\n", "--\n", "  ", "\n\n", "-", "\t"]
+        compared = 0
+        for n in range(3000):
+            text = "".join(r.choice(words) + r.choice(seps) for i in range(r.randint(1, 12))) + r.choice(words)
+            baseline = sequential_unsplit(text)
+            if independent(baseline[1]):
+                compared += 1
+                self.assertEqual(unsplit(text, return_fixes = "T").fix(), baseline, repr(text))
+        self.assertGreater(compared, 2000)
+
+
+    # Where one split word is part of another, the baseline's replacements ran into each other - each split word is now replaced on its own
+    def test_differs_from_baseline_on_overlapping_split_words(self):
+        self.assertEqual(sequential_unsplit("in-\nside and win-\nside")[0], "inside\nand winside\n")
+        self.assertEqual(unsplit("in-\nside and win-\nside").fix(), "inside\nand win-side\n")
+        self.assertEqual(sequential_unsplit("sports-\nman is sports-\nmanlike")[0], "sports-*man\nis sports-*man\nlike")
+        self.assertEqual(unsplit("sports-\nman is sports-\nmanlike").fix(), "sports-*man\nis sports-*manlike\n")
+
 # TODO
 
 